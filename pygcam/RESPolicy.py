@@ -8,6 +8,7 @@ from lxml.etree import Element, SubElement
 from .config import pathjoin, getParam
 from .log import getLogger
 from .XMLFile import XMLFile
+from .xmlOutput import prettyPrint, writeXmlTree
 
 _logger = getLogger(__name__)
 
@@ -18,16 +19,14 @@ FIRST_MODELED_YEAR = LAST_HISTORICAL_YEAR + TIMESTEP
 END_YEAR = 2100
 GCAM_YEARS = [1975, 1990, 2005] + [year for year in range(LAST_HISTORICAL_YEAR, END_YEAR + 1, TIMESTEP)]
 
-# Oddly, we must re-parse the XML to get the formatting right.
 def write_xml(tree, filename):
-    from io import StringIO
+    if prettyPrint():
+        # Oddly, we must re-parse the XML to get the formatting right.
+        parser = ET.XMLParser(remove_blank_text=True)
+        xml = ET.tostring(tree.getroot())
+        tree = ET.ElementTree(ET.fromstring(xml, parser))
 
-    parser = ET.XMLParser(remove_blank_text=True)
-    xml = ET.tostring(tree.getroot())
-    file_obj = StringIO(xml.decode('utf-8'))
-    tree = ET.parse(file_obj, parser)
-
-    tree.write(filename, pretty_print=True, xml_declaration=True)
+    writeXmlTree(tree, filename)
 
 # Surface level (tag and attribute) comparison of elements
 def match_element(elt1, elt2):
@@ -1,8 +1,11 @@
 from __future__ import print_function
+import copy
 from lxml import etree as ET
 import os
 import pkg_resources as pkg
+import six
 
+from pygcam.cache import getCache
 from pygcam.config import getConfigDict, getParam, stringTrue
 from pygcam.log import getLogger
 from pygcam.error import XmlFormatError, PygcamException
@@ -53,12 +56,20 @@ class XMLFile(object):
     :param varDict: (dict) A dictionary to use in place of the configuration dictionary
        when processing Conditional XML.
     """
+    # Parsed and validated documents, keyed by (abspath, removeComments,
+    # conditionalXML, schemaPath), and bounded by GCAM.XmlDocCacheSizeMB.
+    # See read().
+    docCache = getCache('xmlfile', sizeParam='GCAM.XmlDocCacheSizeMB')
+
+    # Compiled schemas, keyed by schemaPath
+    schemaCache = {}
+
     def __init__(self, filename, load=True, schemaPath=None,
                  removeComments=True, conditionalXML=False, varDict=None):
         self.filename = filename
         self.tree = None
         self.conditionalXML = conditionalXML
-        self.varDict = varDict or getConfigDict(section=getParam('GCAM.DefaultProject'))
+        self._varDict = varDict or None
         self.removeComments = removeComments
 
         self.schemaPath   = schemaPath
@@ -67,6 +78,19 @@ class XMLFile(object):
         if filename and load:
             self.read()
 
+    @property
+    def varDict(self):
+        # The config dictionary is needed only to evaluate conditional XML
+        if self._varDict is None:
+            self._varDict = getConfigDict(section=getParam('GCAM.DefaultProject'))
+
+        return self._varDict
+
+    @classmethod
+    def decache(cls):
+        cls.docCache.clear()
+        cls.schemaCache = {}
+
     def getRoot(self):
         'Return the root node of the parse tree'
         return self.tree.getroot()
@@ -79,12 +103,72 @@ class XMLFile(object):
         'Return the filename for this ``XMLFile``'
         return self.filename
 
+    def _cacheKey(self):
+        """
+        Return the key for this file in the document cache and a stamp that
+        identifies the version of the file, or (None, None) if the file can't
+        be cached.
+        """
+        filename = self.filename
+        if not isinstance(filename, six.string_types):
+            return None, None
+
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None, None
+
+        key = (os.path.abspath(filename), self.removeComments, self.conditionalXML, self.schemaPath)
+        return key, (st.st_mtime, st.st_size)
+
+    def _varValues(self, varNames):
+        if not varNames:
+            return ()
+
+        varDict = self.varDict
+        return tuple([varDict.get(name) for name in varNames])
+
     def read(self):
         """
         Read the XML file, and if validate if ``self.schemaFile`` is not None.
+        Documents are cached after they are processed and validated, keyed by
+        the file's path, modification time and size, the options given to the
+        constructor, and the values of the variables tested by conditional XML,
+        so reading an unchanged file again just copies the cached tree.
         """
         filename = self.filename
 
+        key, stamp = self._cacheKey()
+        cached = self.docCache.get(key) if key else None
+        if cached and cached[0] == stamp:
+            _, varNames, trees = cached
+            tree = trees.get(self._varValues(varNames))
+            if tree is not None:
+                _logger.debug("Found '%s' in XMLFile cache", filename)
+                self.tree = copy.deepcopy(tree)
+                return self.tree
+        else:
+            cached = None
+
+        tree = self._read()
+
+        if key:
+            if cached is None:
+                # The variables tested by conditional XML determine the result
+                varNames = tuple(sorted(self.testedVars)) if self.conditionalXML else ()
+                cached = (stamp, varNames, {})
+
+            _, varNames, trees = cached
+            trees[self._varValues(varNames)] = copy.deepcopy(tree)
+
+            # The size of the file approximates the size of each tree
+            self.docCache.put(key, cached, size=stamp[1] * len(trees))
+
+        return tree
+
+    def _read(self):
+        filename = self.filename
+
         _logger.debug("Reading '%s'", filename)
         parser = ET.XMLParser(remove_blank_text=True, remove_comments=self.removeComments)
 
@@ -95,6 +179,7 @@ class XMLFile(object):
             raise XmlFormatError("Can't read XML file '%s': %s" % (filename, e))
 
         if self.conditionalXML:
+            self.testedVars = set([node.get('var') for node in tree.iter(TEST)])
             self.evaluateConditionals(tree.getroot())
 
         if self.removeComments:
@@ -117,13 +202,7 @@ class XMLFile(object):
             return True
 
         tree = self.tree
-
-        # ensure that the entire directory has been extracted so that 'xs:include' works
-        pkg.resource_filename('pygcam', os.path.dirname(self.schemaPath))
-        abspath = pkg.resource_filename('pygcam', self.schemaPath)
-
-        xsd = ET.parse(abspath)
-        schema = ET.XMLSchema(xsd)
+        schema = self.getSchema(self.schemaPath)
 
         if raiseOnError:
             try:
@@ -135,6 +214,23 @@ class XMLFile(object):
             valid = schema.validate(tree)
             return valid
 
+    @classmethod
+    def getSchema(cls, schemaPath):
+        """
+        Return the compiled schema for `schemaPath`, a path relative to the
+        root of the package, compiling it on first use.
+        """
+        schema = cls.schemaCache.get(schemaPath)
+        if schema is None:
+            # ensure that the entire directory has been extracted so that 'xs:include' works
+            pkg.resource_filename('pygcam', os.path.dirname(schemaPath))
+            abspath = pkg.resource_filename('pygcam', schemaPath)
+
+            xsd = ET.parse(abspath)
+            schema = cls.schemaCache[schemaPath] = ET.XMLSchema(xsd)
+
+        return schema
+
     def evalTest(self, node):
         tag = node.tag
 
@@ -198,6 +198,10 @@ class ChartCommand(SubcommandABC):
                             be a floating point number or the name of any variable in pygcam.unitConversion.py.
                             See also -F.''')
 
+        parser.add_argument('-w', '--workers', type=int, default=None,
+                            help='''The number of processes to use to render charts. Use 0 to run one
+                            process per CPU. Default is the value of config variable "GCAM.ChartWorkers".''')
+
         parser.add_argument('-x', '--suffix',
                             help='''A suffix to append to the basename of the input csv file to create the
                             name for the output file. For example, if processing my_data.csv, indicating
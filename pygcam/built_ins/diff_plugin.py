@@ -42,8 +42,8 @@ class DiffCommand(SubcommandABC):
                             holding a list of queries to run, with optional mappings specified to rewrite output.
                             This file has the same structure as the <queries> element in project.xml. If the file
                             doesn't end in ".xml", it must be a text file listing the names of queries to process,
-                            one per line. NOTE: When --queryFile is specified, the two positional arguments are
-                            required: the names of the baseline and policy scenarios, in that order.''')
+                            one per line. NOTE: When --queryFile is specified, the positional arguments are
+                            the names of the baseline scenario and one or more policy scenarios, in that order.''')
 
         parser.add_argument('-r', '--rewriteSetsFile',
                             help='''An XML file defining query maps by name (default taken from
@@ -63,9 +63,19 @@ class DiffCommand(SubcommandABC):
         parser.add_argument('-Y', '--startYear', type=int, default=0,
                             help='''The year at which to begin interpolation''')
 
+        parser.add_argument('-w', '--workers', type=int, default=None,
+                            help='''When --queryFile is specified, the number of processes to use to compute
+                            differences for the queries in parallel. Use 0 to run one process per CPU. Default
+                            is the value of config variable "GCAM.DiffWorkers", except in Monte Carlo trials,
+                            which are already run in parallel, where the default is 1.''')
+
         return parser   # for auto-doc generation
 
 
     def run(self, args, tool):
         from ..diff import diffMain
+
+        if args.workers is None and tool.getMcsMode() == 'trial':
+            args.workers = 1
+
         diffMain(args)
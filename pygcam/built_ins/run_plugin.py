@@ -61,6 +61,14 @@ class RunCommand(SubcommandABC):
         parser.add_argument('-n', '--noRun', action='store_true',
                             help='''Display the commands that would be run, but don't run them.''')
 
+        parser.add_argument('-p', '--parallel', action='store_true',
+                            help='''Run the steps for the given scenarios in separate processes on this
+                            computer, running steps concurrently when they don't depend on one another. The
+                            steps for each scenario are run in order, and each step for a policy scenario
+                            waits until the baseline has completed the same step. Concurrency is limited by
+                            config variables GCAM.ParallelMaxCores, GCAM.ParallelMaxMemoryGB, and
+                            GCAM.ParallelStepMemoryGB. Ignored if --distribute or --noRun are specified.''')
+
         parser.add_argument('-q', '--noQuit', action='store_true',
                             help='''Don't quit if an error occurs when processing a scenario, just
                             move on to processing the next scenario, if any.''')
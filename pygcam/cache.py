@@ -0,0 +1,231 @@
+'''
+.. Bounded, memory-aware caches for query results and other data that
+   are read repeatedly by long-running processes.
+
+.. Copyright (c) 2016 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import sys
+from collections import OrderedDict
+from threading import RLock
+
+from .config import getParam
+from .log import getLogger
+
+_logger = getLogger(__name__)
+
+_MB = 1024 * 1024
+
+def sizeOf(value, _seen=None):
+    """
+    Estimate the memory used by `value`, in bytes. DataFrames and Series
+    are measured with ``memory_usage(deep=True)``, numpy arrays by ``nbytes``,
+    and objects holding a DataFrame in a ``df`` attribute (e.g., the MCS
+    ``QueryResult`` class) by the size of the DataFrame. Dicts, lists, tuples,
+    and sets are measured recursively, counting shared objects once. Other
+    objects are measured by ``sys.getsizeof``, which doesn't follow their
+    attributes, so callers caching such objects should pass an explicit size
+    to :py:meth:`LRUCache.put`.
+
+    :param value: any object
+    :return: (int) the estimated size of `value` in bytes
+    """
+    import pandas as pd
+
+    if _seen is None:
+        _seen = set()
+
+    if id(value) in _seen:
+        return 0
+
+    _seen.add(id(value))
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+
+    nbytes = getattr(value, 'nbytes', None)     # numpy arrays
+    if isinstance(nbytes, int):
+        return nbytes
+
+    size = sys.getsizeof(value)
+
+    df = getattr(value, 'df', None)
+    if isinstance(df, pd.DataFrame):
+        return size + sizeOf(df, _seen)
+
+    if isinstance(value, dict):
+        size += sum([sizeOf(k, _seen) + sizeOf(v, _seen) for k, v in value.items()])
+
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum([sizeOf(item, _seen) for item in value])
+
+    return size
+
+
+class LRUCache(object):
+    """
+    A least-recently-used cache whose capacity is given as the total
+    estimated size (in bytes) of the values stored, rather than the number
+    of entries. The capacity is read from a config variable (in MB) when the
+    cache is first used, so caches can be created at import time. Hit, miss,
+    and eviction counts are kept to allow cache effectiveness to be measured.
+    """
+    Instances = OrderedDict()   # all named caches, for reporting statistics
+
+    def __init__(self, name, sizeParam=None, maxBytes=None, onEvict=None):
+        """
+        :param name: (str) the name of the cache, used in log messages
+        :param sizeParam: (str) the name of a config variable holding the
+            capacity of the cache in MB. An empty value or 0 means no limit.
+        :param maxBytes: (int) the capacity in bytes, which if given,
+            overrides `sizeParam`.
+        :param onEvict: (callable) if not None, a function called with the
+            key and value of each entry evicted to make room for another.
+        """
+        self.name = name
+        self.sizeParam = sizeParam
+        self._maxBytes = maxBytes
+        self.onEvict = onEvict
+        self.lock = RLock()     # the explorer may call from multiple threads
+        self.clear()
+
+        self.Instances[name] = self
+
+    @property
+    def maxBytes(self):
+        if self._maxBytes is None:
+            value = getParam(self.sizeParam, raiseError=False) if self.sizeParam else None
+            self._maxBytes = int(float(value) * _MB) if value else 0
+
+        return self._maxBytes
+
+    def clear(self):
+        """
+        Remove all entries from the cache and reset statistics.
+        """
+        with self.lock:
+            self.entries = OrderedDict()   # key -> (value, size), in LRU order
+            self.currentBytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        """
+        Return the value stored under `key`, marking it most-recently used,
+        or `default` if the key isn't in the cache.
+        """
+        with self.lock:
+            try:
+                value, size = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.entries[key] = (value, size)    # re-insert as most recent
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size=None):
+        """
+        Store `value` under `key`, evicting least-recently-used entries as
+        needed to stay within the cache's capacity. Values larger than the
+        capacity are not stored.
+
+        :param key: any hashable value
+        :param value: the value to store
+        :param size: (int) the size of `value` in bytes, if known; otherwise
+           it's estimated using :py:func:`sizeOf`.
+        :return: `value`
+        """
+        size = sizeOf(value) if size is None else size
+        maxBytes = self.maxBytes
+
+        with self.lock:
+            self.remove(key)
+
+            if maxBytes and size > maxBytes:
+                _logger.debug("%s cache: not caching %s (%d bytes exceeds capacity)", self.name, key, size)
+                return value
+
+            self.entries[key] = (value, size)
+            self.currentBytes += size
+
+            while maxBytes and self.currentBytes > maxBytes:
+                oldKey, (oldValue, oldSize) = self.entries.popitem(last=False)
+                self.currentBytes -= oldSize
+                self.evictions += 1
+                _logger.debug("%s cache: evicted %s", self.name, oldKey)
+
+                if self.onEvict:
+                    self.onEvict(oldKey, oldValue)
+
+        return value
+
+    def remove(self, key):
+        """
+        Remove `key` from the cache, if present.
+        """
+        with self.lock:
+            item = self.entries.pop(key, None)
+            if item:
+                self.currentBytes -= item[1]
+
+    def stats(self):
+        """
+        Return a dict with the cache's statistics.
+        """
+        lookups = self.hits + self.misses
+        return {'name'     : self.name,
+                'entries'  : len(self.entries),
+                'bytes'    : self.currentBytes,
+                'maxBytes' : self.maxBytes,
+                'hits'     : self.hits,
+                'misses'   : self.misses,
+                'evictions': self.evictions,
+                'hitRate'  : float(self.hits) / lookups if lookups else 0.0}
+
+    def __str__(self):
+        d = self.stats()
+        return "<LRUCache %s: %d entries, %.1f of %.1f MB, %d hits, %d misses (%.0f%%), %d evictions>" % \
+               (d['name'], d['entries'], d['bytes'] / float(_MB), d['maxBytes'] / float(_MB),
+                d['hits'], d['misses'], 100 * d['hitRate'], d['evictions'])
+
+
+def getCache(name, sizeParam=None, onEvict=None):
+    """
+    Return the named cache, creating it if needed.
+
+    :param name: (str) the name of the cache
+    :param sizeParam: (str) the config variable holding the capacity of the
+       cache in MB, used only if the cache is created.
+    :param onEvict: (callable) a function called with the key and value of
+       each evicted entry, used only if the cache is created.
+    :return: (LRUCache) the cache
+    """
+    cache = LRUCache.Instances.get(name)    # an empty cache is "falsy", so test for None
+    if cache is None:
+        cache = LRUCache(name, sizeParam=sizeParam, onEvict=onEvict)
+
+    return cache
+
+def logCacheStats(level='debug'):
+    """
+    Log the statistics for all caches that have been used.
+
+    :param level: (str) the name of the logger method to call, e.g., 'info'
+    :return: none
+    """
+    log = getattr(_logger, level)
+    for cache in LRUCache.Instances.values():
+        if cache.hits or cache.misses:
+            log(str(cache))
@@ -3,29 +3,7 @@
    See the https://opensource.org/licenses/MIT for license details.
 '''
 from pygcam.constants import GCAM_32_REGIONS
-
-fixedTaxTemplate = '                <fixedTax year="{year}">{tax}</fixedTax>'
-
-regionTemplate = '''        <region name="{region}">
-            <ghgpolicy name="CO2">
-                <market>{market}</market>
-            </ghgpolicy>
-        </region>'''
-
-ctaxTemplate = '''<?xml version="1.0" encoding="UTF-8"?>
-<scenario name="ctax">
-    <world>
-        <region name="{region}">
-            <ghgpolicy name="CO2">
-                <market>{market}</market>
-                <isFixedTax>1</isFixedTax>
-{taxes}
-            </ghgpolicy>
-        </region>
-{regions}
-    </world>
-</scenario>
-'''
+from .xmlOutput import xmlWriter, xmlText
 
 def _futureValue(value, years, rate):
      return value * (1+rate)**years
@@ -38,6 +16,20 @@ def _futureValuePairs(value, years, rate):
 
     return pairs
 
+def _writeCarbonTax(writer, value, years, rate, regions, market):
+    # The tax is defined in the first region; the others join its market
+    with writer.element('scenario', name='ctax'):
+        with writer.element('world'):
+            for i, region in enumerate(regions):
+                with writer.element('region', name=region):
+                    with writer.element('ghgpolicy', name='CO2'):
+                        writer.leaf('market', market)
+
+                        if i == 0:
+                            writer.leaf('isFixedTax', 1)
+                            for year, tax in _futureValuePairs(value, years, rate):
+                                writer.leaf('fixedTax', "%.2f" % tax, year=str(year))
+
 def genCarbonTax(value, years, rate, regions=GCAM_32_REGIONS, market='global'):
     '''
     Generate the text of an XML file defining a global carbon tax starting
@@ -50,21 +42,7 @@ def genCarbonTax(value, years, rate, regions=GCAM_32_REGIONS, market='global'):
     :param rate: (float) annual rate of increase.
     :return: (str) the contents of the XML file
     '''
-    regionList = []
-    firstRegion = regions[0]
-    for region in regions[1:]:
-        regionList.append(regionTemplate.format(region=region, market=market))
-
-    regionsText = "\n".join(regionList)
-
-    pairs = _futureValuePairs(value, years, rate)
-    taxesList = []
-    for year, value in pairs:
-        taxesList.append(fixedTaxTemplate.format(year=year, tax="%.2f" % value))
-
-    taxes = "\n".join(taxesList)
-    fileText = ctaxTemplate.format(taxes=taxes, region=firstRegion, market=market, regions=regionsText)
-    return fileText
+    return xmlText(_writeCarbonTax, value, years, rate, regions, market)
 
 def genCarbonTaxFile(filename, value, startYear=2020, endYear=2100, timestep=5, rate=0.05,
                      regions=GCAM_32_REGIONS, market='global'):
@@ -84,43 +62,14 @@ def genCarbonTaxFile(filename, value, startYear=2020, endYear=2100, timestep=5,
     :return: none
     '''
     years = list(range(startYear, endYear + timestep, timestep))
-    text = genCarbonTax(value, years, rate, regions=regions, market=market)
-    with open(filename, 'w') as f:
-        f.write(text)
-
-
-header = """<?xml version="1.0" encoding="UTF-8"?>
-<scenario>
-    <world>"""
-
-footer = """
-    </world>
-</scenario>
-"""
-
-ghgPolicyTemplate = """
-            <!-- Linked policies must be read in after the policy to which it links
-                 This may be difficult to do in some cases so create an empty CO2
-                 policy that ensure there is something to link to. The actual policy
-                 can be filled in later.
-            -->
-            <ghgpolicy name="CO2">
-                <market>{market}</market>
-            </ghgpolicy>"""
-
-firstRegionTemplate = """
-                <price-adjust year="1975" fillout="1">{priceAdjust}</price-adjust>
-                <demand-adjust year="1975" fillout="1">{demandAdjust}</demand-adjust>
-                <price-unit>1990$/tC</price-unit>
-                <output-unit>MTC</output-unit>"""
-
-regionTemplate2 = """
-        <region name="{region}">{ghgPolicy}
-            <linked-ghg-policy name="CO2_LUC">
-                <market>{market}</market>
-                <linked-policy>CO2</linked-policy>{firstRegionStuff}
-            </linked-ghg-policy>
-        </region>"""
+    with xmlWriter(filename) as writer:
+        _writeCarbonTax(writer, value, years, rate, regions, market)
+
+
+LinkedPolicyComment = (" Linked policies must be read in after the policy to which it links. "
+                       "This may be difficult to do in some cases so create an empty CO2 "
+                       "policy that ensure there is something to link to. The actual policy "
+                       "can be filled in later. ")
 
 #
 # Function to generate UCT/FFICT linked tax files
@@ -161,26 +110,29 @@ def genLinkedBioCarbonPolicyFile(filename, market='global', regions=None, forTax
     """
     regions = regions or GCAM_32_REGIONS
 
-    first = True
-    parts = [header]
-
     priceAdjust  = 1.0 if forTax else 0.0
     demandAdjust = 1.0 if forCap else 0.0
-    firstRegionStuff = firstRegionTemplate.format(priceAdjust=priceAdjust, demandAdjust=demandAdjust)
-    ghgPolicy = ghgPolicyTemplate.format(market=market)
-
-    for region in regions:
-        regionElement = regionTemplate2.format(region=region, market=market,
-                                               ghgPolicy=ghgPolicy if first else '',
-                                               firstRegionStuff=firstRegionStuff if first else '')
-        first = False
-        parts.append(regionElement)
-
-    parts.append(footer)
-    xml = ''.join(parts)
 
-    with open(filename, 'w') as f:
-        f.write(xml)
+    with xmlWriter(filename) as writer:
+        with writer.element('scenario'):
+            with writer.element('world'):
+                for i, region in enumerate(regions):
+                    first = (i == 0)
+                    with writer.element('region', name=region):
+                        if first:
+                            writer.comment(LinkedPolicyComment)
+                            with writer.element('ghgpolicy', name='CO2'):
+                                writer.leaf('market', market)
+
+                        with writer.element('linked-ghg-policy', name='CO2_LUC'):
+                            writer.leaf('market', market)
+                            writer.leaf('linked-policy', 'CO2')
+
+                            if first:
+                                writer.leaf('price-adjust',  priceAdjust,  year='1975', fillout='1')
+                                writer.leaf('demand-adjust', demandAdjust, year='1975', fillout='1')
+                                writer.leaf('price-unit', '1990$/tC')
+                                writer.leaf('output-unit', 'MTC')
 
 
 if __name__ == "__main__":
@@ -16,10 +16,10 @@ import seaborn as sns
 import shlex
 
 from .config import pathjoin, unixPath
-from .error import CommandlineError
+from .error import PygcamException, CommandlineError
 from .log import getLogger
 from .query import dropExtraCols, readCsv
-from .utils import systemOpenFile, digitColumns
+from .utils import systemOpenFile, digitColumns, getNumWorkers, mapInProcessPool
 
 _logger = getLogger(__name__)
 
@@ -333,11 +333,12 @@ def plotTimeSeries(df, xlabel='', ylabel='', box=False, zeroLine=False, title=""
     return (fig, ax)
 
 
-def chartGCAM(args, num=None, negate=False):
+def chartJobs(args, num=None, negate=False):
     """
-    Generate a chart from GCAM data. This function is called to process
-    the ``chart`` sub-command for a single scenario. See the command-line
-    arguments to the ``chart`` sub-command for details about `args`.
+    Read and prepare the data for the chart(s) described by `args`, returning
+    a list of jobs that can be passed to :py:func:`renderCharts`. Each CSV file
+    is read only once per process, regardless of how many charts use it. See the
+    command-line arguments to the ``chart`` sub-command for details about `args`.
 
     :param args: (argparse Namespace) command-line arguments to `chart`
         sub-command
@@ -345,7 +346,9 @@ def chartGCAM(args, num=None, negate=False):
         filename to allow files to have numerical sequence.
     :param negate: (bool) if True, all values in year columns are multiplied
         by -1 before plotting.
-    :return: none
+    :return: (list of tuples) each tuple holds a plotting function, a tuple of
+        positional args, and a dict of keyword args. If ``args.byRegion`` is
+        True, there is one job per region; otherwise there is a single job.
     """
     barWidth   = args.barWidth
     box        = args.box
@@ -410,7 +413,8 @@ def chartGCAM(args, num=None, negate=False):
         yearStrs = None
 
     # e.g., "/Users/rjp/ws-ext/new-reference/batch-new-reference/LUC_Emission_by_Aggregated_LUT_EM-new-reference." % scenario
-    df = readCsv(csvFile, skiprows=args.skiprows, years=yearStrs, interpolate=args.interpolate)
+    df = readCsv(csvFile, skiprows=args.skiprows, years=yearStrs, interpolate=args.interpolate,
+                 cache=True)
 
     if region:
         try:
@@ -445,16 +449,16 @@ def chartGCAM(args, num=None, negate=False):
         imgFile = _amendFilename(imgFile, 'negated')
         df[yearCols] *= -1
 
-    regions = df.region.unique() if byRegion else [None]    # allows loop to work when not byRegion
+    # split the data by region in a single pass, preserving the order of regions in the file
+    groups = df.groupby('region', sort=False) if byRegion else [(None, df)]
 
     outFileOrig = outFile
     imgFileOrig = imgFile
     titleOrig   = title
-    dfOrig = df
 
-    for reg in regions:
+    jobs = []
+    for reg, df in groups:
         if reg:
-            df = dfOrig.query('region == "%s"' % reg)
             title = titleOrig + " (%s)" % reg
             outFile = _amendFilename(outFileOrig, reg)
             imgFile = _amendFilename(imgFileOrig, reg)
@@ -466,37 +470,100 @@ def chartGCAM(args, num=None, negate=False):
             otherRegion = 'Rest of world'
             mainRegion  = reg or unstackReg
 
-            plotUnstackedRegionComparison(df, unstackCol, valueCol=valueCol, region=mainRegion,
-                                          otherRegion=otherRegion, box=box, title=title, ncol=ncol,
-                                          xlabel=xlabel, ylabel=ylabel, ygrid=ygrid, yticks=yticks,
-                                          ymin=ymin, ymax=ymax, legendY=legendY, palette=palette,
-                                          outFile=outFile, sideLabel=sideLabel, labelColor=labelColor,
-                                          yFormat=yFormat, transparent=transparent, openFile=openFile)
+            jobs.append((plotUnstackedRegionComparison, (df, unstackCol),
+                         dict(valueCol=valueCol, region=mainRegion,
+                              otherRegion=otherRegion, box=box, title=title, ncol=ncol,
+                              xlabel=xlabel, ylabel=ylabel, ygrid=ygrid, yticks=yticks,
+                              ymin=ymin, ymax=ymax, legendY=legendY, palette=palette,
+                              outFile=outFile, sideLabel=sideLabel, labelColor=labelColor,
+                              yFormat=yFormat, transparent=transparent, openFile=openFile)))
         elif sumYears or valueCol:
             if sumYears:
                 # create a new value column by summing year columns
                 valueCol = '_total_'
+                df = df.copy()
                 df[valueCol] = df[yearCols].sum(axis=1)
 
-            plotStackedBarsScalar(df, indexCol, columns, valueCol, box=box, zeroLine=zeroLine,
-                                  title=title, xlabel=xlabel, ylabel=ylabel, ygrid=ygrid, yticks=yticks,
-                                  ymin=ymin, ymax=ymax, rotation=rotation, ncol=ncol, barWidth=barWidth,
-                                  legendY=legendY, palette=palette, outFile=outFile, sideLabel=sideLabel,
-                                  labelColor=labelColor, yFormat=yFormat, transparent=transparent,
-                                  openFile=openFile)
+            jobs.append((plotStackedBarsScalar, (df, indexCol, columns, valueCol),
+                         dict(box=box, zeroLine=zeroLine,
+                              title=title, xlabel=xlabel, ylabel=ylabel, ygrid=ygrid, yticks=yticks,
+                              ymin=ymin, ymax=ymax, rotation=rotation, ncol=ncol, barWidth=barWidth,
+                              legendY=legendY, palette=palette, outFile=outFile, sideLabel=sideLabel,
+                              labelColor=labelColor, yFormat=yFormat, transparent=transparent,
+                              openFile=openFile)))
 
         elif timeseries:
-            plotTimeSeries(df, xlabel=xlabel, ylabel=ylabel, box=box, zeroLine=zeroLine, title=title, ygrid=ygrid,
-                           yticks=yticks, ymin=ymin, ymax=ymax, legend=False, legendY=legendY, yearStep=yearStep,
-                           outFile=outFile, sideLabel=sideLabel, labelColor=labelColor, yFormat=yFormat,
-                           transparent=transparent, openFile=openFile)
+            jobs.append((plotTimeSeries, (df,),
+                         dict(xlabel=xlabel, ylabel=ylabel, box=box, zeroLine=zeroLine, title=title, ygrid=ygrid,
+                              yticks=yticks, ymin=ymin, ymax=ymax, legend=False, legendY=legendY, yearStep=yearStep,
+                              outFile=outFile, sideLabel=sideLabel, labelColor=labelColor, yFormat=yFormat,
+                              transparent=transparent, openFile=openFile)))
 
         else:
-            plotStackedTimeSeries(df, index=indexCol, yearStep=yearStep, ygrid=ygrid, yticks=yticks,
-                                  ymin=ymin, ymax=ymax, zeroLine=zeroLine, title=title, legendY=legendY,
-                                  box=box, xlabel=xlabel, ylabel=ylabel, ncol=ncol, barWidth=barWidth,
-                                  palette=palette, outFile=outFile, sideLabel=sideLabel, labelColor=labelColor,
-                                  yFormat=yFormat, transparent=transparent, openFile=openFile)
+            jobs.append((plotStackedTimeSeries, (df,),
+                         dict(index=indexCol, yearStep=yearStep, ygrid=ygrid, yticks=yticks,
+                              ymin=ymin, ymax=ymax, zeroLine=zeroLine, title=title, legendY=legendY,
+                              box=box, xlabel=xlabel, ylabel=ylabel, ncol=ncol, barWidth=barWidth,
+                              palette=palette, outFile=outFile, sideLabel=sideLabel, labelColor=labelColor,
+                              yFormat=yFormat, transparent=transparent, openFile=openFile)))
+
+    return jobs
+
+def _renderChart(job):
+    """
+    Render the chart described by `job`, returning an error message rather
+    than raising an exception, since not all exceptions can be pickled.
+    """
+    func, posArgs, kwargs = job
+    try:
+        func(*posArgs, **kwargs)
+        return None
+    except Exception as e:
+        return "%s: %s" % (kwargs.get('outFile'), e)
+
+def renderCharts(jobs, numWorkers=None):
+    """
+    Render the charts described by `jobs`, distributing them across a pool of
+    processes. Charts are rendered with matplotlib's non-interactive "Agg"
+    backend (see :py:mod:`pygcam.matplotlibFix`).
+
+    :param jobs: (list of tuples) jobs as returned by :py:func:`chartJobs`
+    :param numWorkers: (int) the number of processes to use. If None, the value
+        of config variable ``GCAM.ChartWorkers`` is used. A value of 0 means use
+        one process per CPU. The number is limited to the number of jobs, and if
+        only one process is needed, charts are rendered in the current process.
+    :return: none
+    :raises PygcamException: if any chart could not be rendered
+    """
+    numWorkers = getNumWorkers(numWorkers, 'GCAM.ChartWorkers', len(jobs))
+
+    if numWorkers <= 1:
+        for func, posArgs, kwargs in jobs:
+            func(*posArgs, **kwargs)
+        return
+
+    _logger.info("Rendering %d charts using %d processes", len(jobs), numWorkers)
+
+    errors = [msg for msg in mapInProcessPool(_renderChart, jobs, numWorkers) if msg]
+    if errors:
+        raise PygcamException("Failed to render charts: " + '; '.join(errors))
+
+def chartGCAM(args, num=None, negate=False):
+    """
+    Generate a chart from GCAM data. This function is called to process
+    the ``chart`` sub-command for a single scenario. See the command-line
+    arguments to the ``chart`` sub-command for details about `args`.
+
+    :param args: (argparse Namespace) command-line arguments to `chart`
+        sub-command
+    :param num: (int or None) if not None, a number to prepend to the
+        filename to allow files to have numerical sequence.
+    :param negate: (bool) if True, all values in year columns are multiplied
+        by -1 before plotting.
+    :return: none
+    """
+    jobs = chartJobs(args, num=num, negate=negate)
+    renderCharts(jobs, numWorkers=getattr(args, 'workers', None))
 
 def chartMain(mainArgs, tool, parser):
     # DOCUMENT '*null*', if still useful
@@ -525,7 +592,14 @@ def chartMain(mainArgs, tool, parser):
 
         scenarios = mainArgs.scenario.split(',')
 
+        # Collect the charts to generate, then render them all together
+        jobs = []
+        exitFound = False
+
         for scenario in scenarios:
+            if exitFound:
+                break
+
             substDict['scenario'] = scenario
             argDict = vars(mainArgs)
             argDict['scenario'] = scenario  # for each call, pass the current scenario only
@@ -539,7 +613,8 @@ def chartMain(mainArgs, tool, parser):
                     continue
 
                 if line == 'exit':
-                    return
+                    exitFound = True
+                    break
 
                 line = line.format(**substDict)
                 fileArgs = shlex.split(line)
@@ -550,7 +625,9 @@ def chartMain(mainArgs, tool, parser):
                 nextNum = num if enumerate else None
                 num += 1
 
-                chartGCAM(allArgs, num=nextNum, negate=negate)
+                jobs += chartJobs(allArgs, num=nextNum, negate=negate)
+
+        renderCharts(jobs, numWorkers=mainArgs.workers)
 
     else:
         chartGCAM(mainArgs, negate=negate)
@@ -30,6 +30,18 @@ _ProjectSection = DEFAULT_SECTION
 _PathMap = None
 _PathPattern = None     # compiled regex matching any mapped paths
 
+# Memo of values returned by getParam, keyed by (section, name, raw). Since any
+# value may refer to others via interpolation, the memo is cleared whenever any
+# value, the project section, the path map, or the ConfigParser itself changes.
+_ParamCache = {}
+
+# If defined, names a file written by writeConfigSnapshot(), which is read instead of
+# the config files and environment. Set by the parent of "gt" subprocesses.
+SNAPSHOT_ENV_VAR = 'PYGCAM_CONFIG_SNAPSHOT'
+
+def _clearParamCache():
+    _ParamCache.clear()
+
 # The unixPath and pathjoin funcs are here rather than in utils.py
 # since this functionality is needed here and this avoids import loops.
 def unixPath(path, rmFinalSlash=False, abspath=False):
@@ -81,13 +93,15 @@ def savePathMap(mapString):
 
     :return: nothing
     """
-    global _PathMap, _PathPattern
-
     pairStrings = mapString.split()
     pairs = [s.split(':') for s in pairStrings]
 
     # strip whitespace
     pairs = [[s.strip() for s in pair] for pair in pairs]
+    _setPathMap(pairs)
+
+def _setPathMap(pairs):
+    global _PathMap, _PathPattern
 
     # process the longest strings first to avoid overlooking long prefixes
     pairs = sorted(pairs, key = lambda pair: len(pair[0]), reverse=True)
@@ -95,6 +109,7 @@ def savePathMap(mapString):
 
     _PathPattern = re.compile(pattern)
     _PathMap = dict(pairs)
+    _clearParamCache()
 
 
 def _translatePath(value):
@@ -164,6 +179,7 @@ def setSection(section):
     """
     global _ProjectSection
     _ProjectSection = section
+    _clearParamCache()
 
 def configLoaded():
     return bool(_ConfigParser)
@@ -200,6 +216,7 @@ def _readConfigResourceFile(filename, package='pygcam', raiseError=True):
 
     data = data.decode('utf-8')
     _ConfigParser.read_string(data, source=filename)
+    _clearParamCache()
     return data
 
 
@@ -327,6 +344,18 @@ def setMacJavaVars():
         os.environ['JAVA_LIB'] = javaLib
         setParam('$JAVA_LIB', javaLib)
 
+def _newConfigParser():
+    _clearParamCache()
+
+    # Strict mode prevents duplicate sections, which we do not restrict
+    parser = configparser.ConfigParser(comment_prefixes=('#'),
+                                       strict=False,
+                                       empty_lines_in_values=False)
+
+    # don't force keys to lower-case: variable names are case sensitive
+    parser.optionxform = lambda option: option
+    return parser
+
 def readConfigFiles(allowMissing=False):
     """
     Read the pygcam configuration files, starting with ``pygcam/etc/system.cfg``,
@@ -335,17 +364,19 @@ def readConfigFiles(allowMissing=False):
     read next. Finally, the user's config file, ``~/.pygcam.cfg``, is read. Each
     successive file overrides values for any variable defined in an earlier file.
 
+    If the environment variable ``PYGCAM_CONFIG_SNAPSHOT`` names an existing file,
+    the configuration saved there by :py:func:`writeConfigSnapshot` is loaded
+    instead, and no config files or environment variables are read.
+
     :return: a populated ConfigParser instance
     """
     global _ConfigParser
 
-    # Strict mode prevents duplicate sections, which we do not restrict
-    _ConfigParser = configparser.ConfigParser(comment_prefixes=('#'),
-                                              strict=False,
-                                              empty_lines_in_values=False)
+    snapshotFile = os.getenv(SNAPSHOT_ENV_VAR)
+    if snapshotFile and os.path.exists(snapshotFile):
+        return readConfigSnapshot(snapshotFile)
 
-    # don't force keys to lower-case: variable names are case sensitive
-    _ConfigParser.optionxform = lambda option: option
+    _ConfigParser = _newConfigParser()
 
     home = getHomeDir()
     _ConfigParser.set(DEFAULT_SECTION, 'Home', home)
@@ -406,6 +437,8 @@ def readConfigFiles(allowMissing=False):
                 _ConfigParser.get(section, projectNameVar)):            # and not be blank
             _ConfigParser.set(section, projectNameVar, section)
 
+    _clearParamCache()
+
     projectName = getParam('GCAM.DefaultProject', section=DEFAULT_SECTION)
     if projectName:
         setSection(projectName)
@@ -416,6 +449,98 @@ def readConfigFiles(allowMissing=False):
 
     return _ConfigParser
 
+def getConfigSnapshot():
+    """
+    Return the current configuration as a dict that can be pickled or written as
+    JSON, holding the raw value of each variable in each section, the project
+    section, the path map, whether pygcam.mcs is in use, and the values already
+    resolved by :py:func:`getParam`. A child process can pass this dict to
+    :py:func:`setConfigSnapshot` rather than reading the config files and the
+    environment and interpolating values again.
+
+    :return: (dict) the configuration snapshot
+    """
+    parser = getConfig()
+
+    # Values are raw (uninterpolated), so the snapshot is only read, not re-interpolated
+    defaults = dict(parser.defaults())
+    sections = {}
+    for section in parser.sections():
+        sections[section] = {name: value for name, value in parser.items(section, raw=True)
+                             if defaults.get(name) != value}
+
+    snapshot = {'section'  : _ProjectSection,
+                'usingMCS' : usingMCS(),
+                'pathMap'  : sorted(_PathMap.items()) if _PathMap else None,
+                'defaults' : defaults,
+                'sections' : sections,
+                'resolved' : [[section, name, raw, value] for (section, name, raw), value in iteritems(_ParamCache)]}
+    return snapshot
+
+def setConfigSnapshot(snapshot):
+    """
+    Replace the current configuration with one saved by :py:func:`getConfigSnapshot`.
+    No config files or environment variables are read.
+
+    :param snapshot: (dict) a configuration snapshot
+    :return: a populated ConfigParser instance
+    """
+    global _ConfigParser, _PathMap, _PathPattern
+
+    parser = _newConfigParser()
+    parser.read_dict({DEFAULT_SECTION: snapshot['defaults']})
+    parser.read_dict(snapshot['sections'])
+    _ConfigParser = parser
+
+    setUsingMCS(snapshot['usingMCS'])
+
+    pairs = snapshot['pathMap']
+    if pairs:
+        _setPathMap(pairs)
+    else:
+        _PathMap = _PathPattern = None
+
+    setSection(snapshot['section'])
+
+    # Set the memo last since the calls above clear it
+    for section, name, raw, value in snapshot['resolved']:
+        _ParamCache[(section, name, raw)] = value
+
+    return parser
+
+def writeConfigSnapshot(filename):
+    """
+    Write a configuration snapshot (see :py:func:`getConfigSnapshot`) to `filename`
+    as JSON. If the environment variable ``PYGCAM_CONFIG_SNAPSHOT`` is set to this
+    filename, :py:func:`readConfigFiles` loads the snapshot instead of the usual
+    config files.
+
+    :param filename: (str) the pathname of the file to create
+    :return: none
+    """
+    import json
+
+    with open(filename, 'w') as f:
+        json.dump(getConfigSnapshot(), f)
+
+def readConfigSnapshot(filename):
+    """
+    Load the configuration snapshot written to `filename` by :py:func:`writeConfigSnapshot`.
+
+    :param filename: (str) the pathname of the snapshot file
+    :return: a populated ConfigParser instance
+    """
+    import json
+
+    try:
+        with open(filename) as f:
+            snapshot = json.load(f)
+
+    except (IOError, ValueError) as e:
+        raise ConfigFileError("Can't read config snapshot %s: %s" % (filename, e))
+
+    return setConfigSnapshot(snapshot)
+
 def getSections():
     return _ConfigParser.sections()
 
@@ -448,6 +573,7 @@ def setParam(name, value, section=None):
     """
     section = section or getSection()
     _ConfigParser.set(section, name, value)
+    _clearParamCache()
     return value
 
 def getParam(name, section=None, raw=False, raiseError=True):
@@ -476,6 +602,12 @@ def getParam(name, section=None, raw=False, raiseError=True):
     if not _ConfigParser:
         getConfig()
 
+    key = (section, name, raw)
+    try:
+        return _ParamCache[key]
+    except KeyError:
+        pass
+
     try:
         value = _ConfigParser.get(section, name, raw=raw)
 
@@ -495,6 +627,7 @@ def getParam(name, section=None, raw=False, raiseError=True):
     if _PathMap:
         value = _translatePath(value)
 
+    _ParamCache[key] = value
     return value
 
 _True  = ['t', 'y', 'true',  'yes', 'on',  '1']
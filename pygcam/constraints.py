@@ -5,11 +5,14 @@
    See the https://opensource.org/licenses/MIT for license details.
 
 '''
+from lxml import etree as ET
+
 from .config import pathjoin
 from .constants import LOCAL_XML_NAME
 from .log import getLogger
 from .query import readQueryResult
 from .utils import mkdirs, getBatchDir, getYearCols, printSeries
+from .xmlOutput import xmlText
 
 _logger = getLogger(__name__)
 
@@ -17,55 +20,49 @@ PolicyChoices = ['tax', 'subsidy']
 DefaultYears = '2020-2050'
 DefaultCellulosicCoefficients = "2010:2.057,2015:2.057,2020:2.057,2025:2.039,2030:2.021,2035:2.003,2040:1.986,2045:1.968,2050:1.950,2055:1.932,2060:1.914"
 
-# A list of these is inserted as {constraints} in the metaTemplate
-_ConstraintTemplate = '                <constraint year="{year}">{value}</constraint>'
-
-_MetaTemplate = '''<?xml version="1.0" encoding="UTF-8"?>
-<scenario>
-    <output-meta-data>
-        <summary>
-        This is a generated constraint file. Edits will be overwritten!
-        {summary}
-        </summary>
-    </output-meta-data>
-    <world>
-        <region name="{region}">
-            <{gcamPolicy} name="{name}">
-                <market>{market}</market>
-                {preConstraint}
-{constraints}
-           </{gcamPolicy}>
-        </region>
-    </world>
-</scenario>
-'''
+# The years for which cellulosic ethanol constraints are written
+CellEtohYears = [str(year) for year in range(2020, 2051, 5)]
 
 DEFAULT_POLICY = 'policy-portfolio-standard'
 DEFAULT_REGION = 'USA'
 DEFAULT_MARKET = 'USA'
 
-def _generateConstraintXML(name, series, gcamPolicy=DEFAULT_POLICY, policyType=None,
-                           region=DEFAULT_REGION, market=DEFAULT_MARKET,
-                           preConstraint='', summary=''):
+_GeneratedNote = 'This is a generated constraint file. Edits will be overwritten!'
+
+def _writeConstraints(writer, name, series, gcamPolicy, policyType, region, market,
+                      preConstraint, summary, minPrice):
+    with writer.element('scenario'):
+        with writer.element('output-meta-data'):
+            writer.leaf('summary', ' '.join([s for s in (summary, _GeneratedNote) if s]))
 
-    def genConstraint(year):
-        constraint = _ConstraintTemplate.format(year=year, value="{year%s}" % year)
-        return constraint
+        with writer.element('world'):
+            with writer.element('region', name=region):
+                with writer.element(gcamPolicy, name=name):
+                    writer.leaf('market', market)
 
-    # Is this the most common case?
-    if policyType and not preConstraint:
-        preConstraint = '<policyType>{policyType}</policyType>'.format(policyType=policyType)
+                    if preConstraint:
+                        # One or more elements given as XML text
+                        for elt in ET.fromstring('<pre>%s</pre>' % preConstraint):
+                            writer.write(elt)
 
-    constraints = [genConstraint(i) for i in series.index]
-    constraintText = '\n'.join(constraints)
+                    elif policyType:
+                        writer.leaf('policyType', policyType)
 
-    template = _MetaTemplate.format(name=name, gcamPolicy=gcamPolicy, policyType=policyType,
-                                    region=region, market=market, summary=summary,
-                                    preConstraint=preConstraint, constraints=constraintText)
+                    if minPrice is not None:
+                        writer.leaf('min-price', minPrice, year='1975', fillout='1')
 
-    args = {'year' + col: value for col, value in series.items()}
-    xml = template.format(**args)
-    return xml
+                    for year, value in series.items():
+                        writer.leaf('constraint', value, year=str(year))
+
+def _generateConstraintXML(name, series, gcamPolicy=DEFAULT_POLICY, policyType=None,
+                           region=DEFAULT_REGION, market=DEFAULT_MARKET,
+                           preConstraint='', summary='', minPrice=None):
+    """
+    Return the text of a constraint file defining policy `name`, with the
+    constraint for each year given by the year (index) and value in `series`.
+    """
+    return xmlText(_writeConstraints, name, series, gcamPolicy, policyType, region, market,
+                   preConstraint, summary, minPrice)
 
 
 def _saveConstraintFile(xml, dirname, constraintName, policyType, scenario, groupName='',
@@ -121,34 +118,6 @@ def parseStringPairs(argString, datatype=float):
     coefficients = pd.Series(data=dataDict)
     return coefficients
 
-cellEtohConstraintTemplate ='''<?xml version="1.0" encoding="UTF-8"?>
-<scenario>
-  <output-meta-data>
-    <summary>
-      Cellulosic ethanol constraints.
-
-      This is a generated constraint file. Edits will be overwritten!
-    </summary>
-  </output-meta-data>
-  <world>
-    <region name="USA">
-      <policy-portfolio-standard name="cellulosic-etoh-{cellEtohPolicyType}">
-        <policyType>{cellEtohPolicyType}</policyType>
-        <market>USA</market>
-        <min-price year="1975" fillout="1">-1e6</min-price>
-        <constraint year="2020">{level2020}</constraint>
-        <constraint year="2025">{level2025}</constraint>
-        <constraint year="2030">{level2030}</constraint>
-        <constraint year="2035">{level2035}</constraint>
-        <constraint year="2040">{level2040}</constraint>
-        <constraint year="2045">{level2045}</constraint>
-        <constraint year="2050">{level2050}</constraint>
-      </policy-portfolio-standard>
-    </region>
-  </world>
-</scenario>
-'''
-
 US_REGION_QUERY = 'region in ["USA", "United States"]'
 
 # TBD: make region an argument rather than assuming USA
@@ -222,11 +191,9 @@ def genBioConstraints(**kwargs):
     _saveConstraintFile(xml, xmlOutputDir, 'purpose-grown', purposeGrownPolicyType, policy,
                         groupName=subdir)#, fromMCS=fromMCS)
 
-    # Create dictionary to use for template processing
-    xmlArgs = {"level" + year : value for year, value in desiredCellEtoh.items()}
-    xmlArgs['cellEtohPolicyType'] = 'subsidy' if cellEtohPolicyType == 'subs' else cellEtohPolicyType
-
-    xml = cellEtohConstraintTemplate.format(**xmlArgs)
+    policyType = 'subsidy' if cellEtohPolicyType == 'subs' else cellEtohPolicyType
+    xml = _generateConstraintXML('cellulosic-etoh-' + policyType, desiredCellEtoh[CellEtohYears], policyType=policyType,
+                                 minPrice='-1e6', summary='Cellulosic ethanol constraints.')
     _saveConstraintFile(xml, xmlOutputDir, 'cell-etoh', cellEtohPolicyType, policy,
                         groupName=subdir)#, fromMCS=fromMCS)
 
@@ -235,29 +202,6 @@ def bioMain(args):
     genBioConstraints(**vars(args))
 
 
-yearConstraintTemplate = '''        <constraint year="{year}">{level}</constraint>'''
-
-fuelConstraintTemplate ='''<?xml version="1.0" encoding="UTF-8"?>
-<scenario>
-  <output-meta-data>
-    <summary>
-      Define fuel constraints.
-      This is a generated constraint file. Edits will be overwritten!
-    </summary>
-  </output-meta-data>
-  <world>
-    <region name="USA">
-      <policy-portfolio-standard name="{fuelTag}-{fuelPolicyType}">
-        <policyType>{fuelPolicyType}</policyType>
-        <market>USA</market>
-        <min-price year="1975" fillout="1">-1e6</min-price>
-{yearConstraints}
-      </policy-portfolio-standard>
-    </region>
-  </world>
-</scenario>
-'''
-
 def genDeltaConstraints(**kwargs):
     import pandas as pd
 
@@ -309,15 +253,8 @@ def genDeltaConstraints(**kwargs):
     fuelTargets = fuelBaseline.iloc[0] + deltas
     printSeries(fuelTargets, fuelTag, header='fuelTargets:')
 
-    # Generate annual XML for <constraint year="{year}">{level}</constraint>
-    yearConstraints = [yearConstraintTemplate.format(year=year, level=level) for year, level in fuelTargets.items()]
-
-    xmlArgs = {}
-    xmlArgs['fuelPolicyType'] = fuelPolicyType
-    xmlArgs['fuelTag'] = fuelTag
-    xmlArgs['yearConstraints'] = '\n'.join(yearConstraints)
-
-    xml = fuelConstraintTemplate.format(**xmlArgs)
+    xml = _generateConstraintXML('%s-%s' % (fuelTag, fuelPolicyType), fuelTargets, policyType=fuelPolicyType,
+                                 minPrice='-1e6', summary='Define fuel constraints.')
 
     _saveConstraintFile(xml, xmlOutputDir, fuelTag, fuelPolicyType, policy,
                         groupName=groupName, policySrcDir=policySrcDir)#, fromMCS=fromMCS)
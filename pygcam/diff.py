@@ -6,16 +6,84 @@
 import os
 from .config import pathjoin
 from .log import getLogger
-from .error import CommandlineError, FileFormatError
-from .utils import mkdirs, ensureCSV, QueryResultsDir
-from .query import readCsv, dropExtraCols, csv2xlsx, sumYears, sumYearsByGroup, QueryFile
+from .error import PygcamException, CommandlineError, FileFormatError
+from .utils import mkdirs, ensureCSV, getNumWorkers, mapInProcessPool, QueryResultsDir
+from .query import readCsv, writeColumnar, dropExtraCols, csv2xlsx, sumYears, sumYearsByGroup, QueryFile
 
 _logger = getLogger(__name__)
 
 
+class DiffBaseline(object):
+    """
+    Holds a reference (e.g., baseline) query result indexed by its non-year
+    columns, so that differences between it and any number of other results
+    can be computed without re-indexing the reference data each time.
+    """
+    def __init__(self, df):
+        """
+        :param df: (DataFrame) the reference data, which is not modified
+        """
+        df = dropExtraCols(df, inplace=False)
+
+        # Handle corner case in which query results for non-existent data have zero in Units column
+        self.realUnits = None
+        if 'Units' in df.columns:
+            units = list(df.Units.unique())
+            if len(units) == 2 and '0.0' in units:
+                units.remove('0.0')
+                self.realUnits = units[0]
+                df.Units = self.realUnits
+
+        self.columns = set(df.columns)
+        self.yearCols = [col for col in df.columns if col.isdigit()]
+        self.nonYearCols = [col for col in df.columns if col not in self.yearCols]
+        self.df = df.set_index(self.nonYearCols)[self.yearCols]
+
+    def difference(self, other, resetIndex=True, dropna=True, asPercentChange=False):
+        """
+        Compute the difference between `other` and the reference data. See
+        :py:func:`computeDifference` for a description of the arguments.
+        """
+        import numpy as np
+        import pandas as pd
+
+        other = dropExtraCols(other, inplace=False)
+
+        if set(other.columns) != self.columns:
+            raise FileFormatError("Can't compute difference because result sets have different columns. df1:%s, df2:%s" \
+                                  % (list(self.df.reset_index().columns), other.columns))
+
+        if self.realUnits:
+            other.Units = self.realUnits
+
+        other = other.set_index(self.nonYearCols)[self.yearCols]
+        ref = self.df
+
+        # Compute difference for timeseries values. When the rows are identical, as is
+        # usual for results of the same query, skip the (relatively costly) alignment.
+        if other.index.equals(ref.index):
+            values = other.values - ref.values
+            if asPercentChange:
+                values = np.true_divide(values, ref.values)     # values may be integers
+            diff = pd.DataFrame(values, index=ref.index, columns=self.yearCols)
+        else:
+            diff = other - ref
+            if asPercentChange:
+                diff = diff / ref
+
+        if dropna:
+            diff.dropna(inplace=True)
+
+        if resetIndex:
+            diff.reset_index(inplace=True)      # convert multi-index back to regular column values
+
+        return diff
+
+
 def computeDifference(df1, df2, resetIndex=True, dropna=True, asPercentChange=False):
     """
-    Compute the difference between two DataFrames.
+    Compute the difference between two DataFrames. To compute differences between
+    one DataFrame and several others, use :py:class:`DiffBaseline` directly.
 
     :param df1: a pandas DataFrame instance
     :param obj2: a pandas DataFrame instance
@@ -28,41 +96,8 @@ def computeDifference(df1, df2, resetIndex=True, dropna=True, asPercentChange=Fa
     :return: a pandas DataFrame with the difference in all the year columns, computed
       as (df2 - df1) if asPercentChange is False, otherwise as (df2 - df1)/df1.
     """
-    df1 = dropExtraCols(df1, inplace=False)
-    df2 = dropExtraCols(df2, inplace=False)
-
-    if set(df1.columns) != set(df2.columns):
-        raise FileFormatError("Can't compute difference because result sets have different columns. df1:%s, df2:%s" \
-                              % (df1.columns, df2.columns))
-
-    # Handle corner case in which query results for non-existent data have zero in Units column
-    if 'Units' in df1.columns:
-        units = list(df1.Units.unique())
-        if len(units) == 2 and '0.0' in units:
-            units.remove('0.0')
-            realUnits = units[0]
-            df1.Units = realUnits
-            df2.Units = realUnits
-
-    yearCols = [col for col in df1.columns if col.isdigit()]
-    nonYearCols = list(set(df1.columns) - set(yearCols))
-
-    df1.set_index(nonYearCols, inplace=True)
-    df2.set_index(nonYearCols, inplace=True)
-
-    # Compute difference for timeseries values
-    diff = df2 - df1
-
-    if asPercentChange:
-        diff /= df1
-
-    if dropna:
-        diff.dropna(inplace=True)
-
-    if resetIndex:
-        diff.reset_index(inplace=True)      # convert multi-index back to regular column values
-
-    return diff
+    base = DiffBaseline(df1)
+    return base.difference(df2, resetIndex=resetIndex, dropna=dropna, asPercentChange=asPercentChange)
 
 def _label(referenceFile, otherFile, asPercentChange=False):
     label = "([{other}] minus [{ref}]) / [{ref}]" if asPercentChange else "[{other}] minus [{ref}]"
@@ -93,18 +128,25 @@ def writeDiffsToCSV(outFile, referenceFile, otherFiles, skiprows=1, interpolate=
     """
     refDF = readCsv(referenceFile, skiprows=skiprows, interpolate=interpolate,
                     years=years, startYear=startYear)
+    base = DiffBaseline(refDF)
 
+    diff = None
     with open(outFile, 'w') as f:
         for otherFile in otherFiles:
             otherFile = ensureCSV(otherFile)   # add csv extension if needed
             otherDF   = readCsv(otherFile, skiprows=skiprows, interpolate=interpolate,
                                 years=years, startYear=startYear)
 
-            diff = computeDifference(refDF, otherDF, asPercentChange=asPercentChange)
+            diff = base.difference(otherDF, asPercentChange=asPercentChange)
             csvText = diff.to_csv(index=None)
             label = _label(referenceFile, otherFile, asPercentChange=asPercentChange)
             f.write("%s\n%s" % (label, csvText))    # csvText has "\n" already
 
+    # A file with a single difference matrix has the standard GCAM CSV format,
+    # so save a columnar copy, if so configured, for faster reading later.
+    if len(otherFiles) == 1:
+        writeColumnar(diff, outFile)
+
 
 def writeDiffsToXLSX(outFile, referenceFile, otherFiles, skiprows=1, interpolate=False,
                      years=None, startYear=0, asPercentChange=False):
@@ -136,6 +178,7 @@ def writeDiffsToXLSX(outFile, referenceFile, otherFiles, skiprows=1, interpolate
         _logger.debug("Reading reference file:", referenceFile)
         refDF = readCsv(referenceFile, skiprows=skiprows, interpolate=interpolate,
                         years=years, startYear=startYear)
+        base = DiffBaseline(refDF)
 
         for otherFile in otherFiles:
             otherFile = ensureCSV(otherFile)   # add csv extension if needed
@@ -146,7 +189,7 @@ def writeDiffsToXLSX(outFile, referenceFile, otherFiles, skiprows=1, interpolate
             sheetName = 'Diff%d' % sheetNum
             sheetNum += 1
 
-            diff = computeDifference(refDF, otherDF, asPercentChange=asPercentChange)
+            diff = base.difference(otherDF, asPercentChange=asPercentChange)
             diff.to_excel(writer, index=None, sheet_name=sheetName, startrow=2, startcol=0)
 
             worksheet = writer.sheets[sheetName]
@@ -228,6 +271,94 @@ def queryCsvPathname(query, scenario, workingDir='.'):
     pathname = pathjoin(workingDir, scenario, QueryResultsDir, '%s-%s.csv' % (query, scenario))
     return pathname
 
+def diffQuery(query, baseline, policies, workingDir='.', skiprows=1, interpolate=False,
+              years=None, startYear=0, asPercentChange=False):
+    """
+    Compute the differences between the results of `query` for each of the
+    `policies` and for `baseline`, writing one CSV file of differences per
+    policy. The baseline results are read and indexed only once.
+
+    :param query: (str) the base file name of the query result
+    :param baseline: (str) the baseline scenario
+    :param policies: (list of str) the policy scenarios
+    :param workingDir: (str) the directory immediately above the baseline
+        and policy sandboxes.
+    :param skiprows: (int) should be 1 for GCAM files, to skip header info before column names
+    :param interpolate: (bool) if True, linearly interpolate annual values between timesteps
+    :param years: (iterable of 2 values coercible to int) the range of years to include in
+       results.
+    :param startYear: (int) the year at which to begin interpolation, if interpolate is True.
+    :param asPercentChange: (bool) if True, compute percent change rather than difference.
+    :return: (list of str) the pathnames of the files written
+    """
+    baselineFile = queryCsvPathname(query, baseline, workingDir=workingDir)
+    refDF = readCsv(baselineFile, skiprows=skiprows, interpolate=interpolate,
+                    years=years, startYear=startYear)
+    base = DiffBaseline(refDF)
+
+    outFiles = []
+    for policy in policies:
+        policyFile = queryCsvPathname(query, policy, workingDir=workingDir)
+        outFile = diffCsvPathname(query, baseline, policy, workingDir=workingDir,
+                                  createDir=True, asPercentChange=asPercentChange)
+        _logger.info("Writing %s", outFile)
+
+        otherDF = readCsv(policyFile, skiprows=skiprows, interpolate=interpolate,
+                          years=years, startYear=startYear)
+        diff = base.difference(otherDF, asPercentChange=asPercentChange)
+
+        with open(outFile, 'w') as f:
+            label = _label(baselineFile, policyFile, asPercentChange=asPercentChange)
+            f.write("%s\n%s" % (label, diff.to_csv(index=None)))
+
+        writeColumnar(diff, outFile)
+        outFiles.append(outFile)
+
+    return outFiles
+
+def _diffQueryWorker(args):
+    """
+    Run diffQuery in a worker process, returning an error message rather
+    than raising an exception, since not all exceptions can be pickled.
+    """
+    query, baseline, policies, kwargs = args
+    try:
+        diffQuery(query, baseline, policies, **kwargs)
+        return None
+    except Exception as e:
+        return 'query %s: %s' % (query, e)
+
+def diffQueries(queries, baseline, policies, numWorkers=None, **kwargs):
+    """
+    Compute the differences between each of the `policies` and `baseline` for all
+    the given `queries`, distributing the queries across a pool of processes.
+
+    :param queries: (list of str) the base file names of the query results
+    :param baseline: (str) the baseline scenario
+    :param policies: (list of str) the policy scenarios
+    :param numWorkers: (int) the number of processes to use. If None, the value
+        of config variable ``GCAM.DiffWorkers`` is used. A value of 0 means use
+        one process per CPU. The number is limited to the number of queries, and
+        if only one process is needed, the differences are computed in the
+        current process.
+    :param kwargs: keyword arguments passed to :py:func:`diffQuery`
+    :return: none
+    :raises PygcamException: if any of the differences could not be computed
+    """
+    numWorkers = getNumWorkers(numWorkers, 'GCAM.DiffWorkers', len(queries))
+
+    if numWorkers <= 1:
+        for query in queries:
+            diffQuery(query, baseline, policies, **kwargs)
+        return
+
+    _logger.info("Computing differences for %d queries using %d processes", len(queries), numWorkers)
+
+    argList = [(query, baseline, policies, kwargs) for query in queries]
+    errors = [msg for msg in mapInProcessPool(_diffQueryWorker, argList, numWorkers) if msg]
+    if errors:
+        raise PygcamException("Failed to compute differences for " + '; '.join(errors))
+
 def diffMain(args):
     workingDir = args.workingDir
     mkdirs(workingDir)
@@ -250,15 +381,13 @@ def diffMain(args):
     else:
         years = startYear = None
 
-    # If a query file is given, we loop over the query names, computing required arguments to performDiff().
+    # If a query file is given, we compute the differences for each query and policy scenario.
     if queryFile:
-        if len(args.csvFiles) != 2:
-            raise CommandlineError("When --queryFile is specified, 2 positional arguments--the baseline and policy names--are required.")
-
-        baseline, policy = args.csvFiles
+        if len(args.csvFiles) < 2:
+            raise CommandlineError("When --queryFile is specified, at least 2 positional arguments--the baseline and one or more policy names--are required.")
 
-        # def makePath(query, scenario):
-        #     return pathjoin(scenario, QueryResultsDir, '%s-%s.csv' % (query, scenario))
+        baseline = args.csvFiles[0]
+        policies = args.csvFiles[1:]
 
         mainPart, extension = os.path.splitext(queryFile)
 
@@ -270,17 +399,9 @@ def diffMain(args):
                 lines = f.read()
                 queries = [line for line in lines.split('\n') if line]   # eliminates blank lines
 
-        for query in queries:
-            baselineFile = queryCsvPathname(query, baseline, workingDir=workingDir)
-            policyFile   = queryCsvPathname(query, policy,   workingDir=workingDir)
-
-            outFile = diffCsvPathname(query, baseline, policy, workingDir=workingDir,
-                                      createDir=True, asPercentChange=asPercentChange)
-            _logger.info("Writing %s", outFile)
-
-            writeDiffsToFile(outFile, baselineFile, [policyFile], ext='.csv', skiprows=skiprows,
-                             interpolate=interpolate, years=years, startYear=startYear,
-                             asPercentChange=asPercentChange)
+        diffQueries(queries, baseline, policies, numWorkers=args.workers,
+                    workingDir=workingDir, skiprows=skiprows, interpolate=interpolate,
+                    years=years, startYear=startYear, asPercentChange=asPercentChange)
     else:
         csvFiles = [ensureCSV(f) for f in args.csvFiles]
         referenceFile = csvFiles[0]
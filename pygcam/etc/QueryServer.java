@@ -0,0 +1,143 @@
+/*
+ * A long-lived ModelInterface query server for pygcam (see pygcam/queryServer.py).
+ *
+ * The server loads ModelInterface once, then reads the pathname of a batch
+ * query file from each line of stdin and runs it exactly as
+ * "ModelInterface/InterfaceMain -b <batchFile>" would, replying with a line
+ * starting with "OK" on success or "ERROR" followed by a message on failure.
+ * Any other output is diagnostic. The server exits when stdin is closed.
+ *
+ * This file is run directly from source, which requires a Java 11 or later JDK:
+ *
+ *   java -cp <ModelInterface classpath> QueryServer.java
+ *
+ * InterfaceMain may call System.exit() after running a batch file, so this
+ * is intercepted here to keep the JVM running for the next batch file.
+ * Java 18 through 23 allow this only if "-Djava.security.manager=allow" is
+ * included in GCAM.MI.JavaArgs; Java 24 and later don't allow it at all. If
+ * the exit can't be intercepted, the server exits after one batch file, and
+ * pygcam falls back to running GCAM.MI.BatchCommand.
+ *
+ * Copyright (c) 2016 Richard Plevin
+ * See the https://opensource.org/licenses/MIT for license details.
+ */
+import java.io.BufferedReader;
+import java.io.File;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.security.Permission;
+
+public class QueryServer {
+    static final String MAIN_CLASS = "ModelInterface.InterfaceMain";
+
+    // Set while running a batch file, so only ModelInterface's exits are trapped
+    static volatile boolean trapExit = false;
+
+    static class ExitTrappedException extends SecurityException {
+        final int status;
+
+        ExitTrappedException(int status) {
+            super("System.exit(" + status + ")");
+            this.status = status;
+        }
+    }
+
+    @SuppressWarnings("removal")
+    static boolean installExitTrap() {
+        try {
+            System.setSecurityManager(new SecurityManager() {
+                @Override
+                public void checkPermission(Permission perm) {
+                }
+
+                @Override
+                public void checkPermission(Permission perm, Object context) {
+                }
+
+                @Override
+                public void checkExit(int status) {
+                    if (trapExit) {
+                        throw new ExitTrappedException(status);
+                    }
+                }
+            });
+            return true;
+
+        } catch (UnsupportedOperationException | SecurityException e) {
+            return false;
+        }
+    }
+
+    static ExitTrappedException findExit(Throwable e) {
+        for ( ; e != null; e = e.getCause()) {
+            if (e instanceof ExitTrappedException) {
+                return (ExitTrappedException) e;
+            }
+        }
+        return null;
+    }
+
+    public static void main(String[] args) throws Exception {
+        // Status lines go to the original stdout; ModelInterface's output goes to
+        // stderr so it can't be mistaken for a status line.
+        PrintStream reply = System.out;
+        System.setOut(System.err);
+
+        Method interfaceMain = Class.forName(MAIN_CLASS).getMethod("main", String[].class);
+
+        if (!installExitTrap()) {
+            System.err.println("QueryServer: can't intercept System.exit(); the server will exit " +
+                               "after each batch file. (For Java 18-23, add -Djava.security.manager=allow " +
+                               "to GCAM.MI.JavaArgs.)");
+        }
+
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in));
+        String line;
+
+        while ((line = in.readLine()) != null) {
+            String batchFile = line.trim();
+            if (batchFile.isEmpty()) {
+                continue;
+            }
+
+            String error = null;
+
+            if (!new File(batchFile).isFile()) {
+                error = "batch file not found: " + batchFile;
+            } else {
+                trapExit = true;
+                try {
+                    interfaceMain.invoke(null, (Object) new String[] {"-b", batchFile});
+
+                } catch (InvocationTargetException e) {
+                    ExitTrappedException exit = findExit(e);
+                    if (exit == null) {
+                        error = String.valueOf(e.getCause());
+                    } else if (exit.status != 0) {
+                        error = "ModelInterface exited with status " + exit.status;
+                    }
+
+                } catch (ExitTrappedException e) {
+                    if (e.status != 0) {
+                        error = "ModelInterface exited with status " + e.status;
+                    }
+
+                } catch (Exception e) {
+                    error = String.valueOf(e);
+
+                } finally {
+                    trapExit = false;
+                }
+            }
+
+            System.err.flush();
+            reply.println(error == null ? "OK" : "ERROR " + error.replace('\n', ' '));
+            reply.flush();
+        }
+
+        // ModelInterface may have started non-daemon threads
+        System.exit(0);
+    }
+}
@@ -0,0 +1,280 @@
+'''
+.. A content-addressed file store used to populate workspaces, sandboxes,
+   and local-xml directories with hardlinks or reflinks rather than copies.
+
+.. Copyright (c) 2016 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import errno
+import hashlib
+import os
+import shutil
+import stat
+
+from .config import getParam
+from .log import getLogger
+
+_logger = getLogger(__name__)
+
+_BLOCK_SIZE = 1024 * 1024
+
+# ioctl request code for FICLONE on Linux (btrfs, XFS and others support it)
+_FICLONE = 0x40049409
+
+# Files in the store are never written in place
+_WRITE_BITS = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+def _reflink(src, dst):
+    """
+    Create `dst` as a copy-on-write clone of `src`, if the platform and
+    filesystem support it.
+
+    :return: (bool) True if the clone was created
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    if not hasattr(fcntl, 'ioctl') or not os.uname()[0] == 'Linux':
+        return False
+
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        return True
+
+    except (IOError, OSError):
+        if os.path.lexists(dst):
+            os.remove(dst)
+        return False
+
+def breakLink(path):
+    """
+    If `path` is a hardlink shared with other files (e.g., with an object in
+    the FileStore), remove it so that it can be rewritten without altering
+    the other files. Call this before writing a file in place.
+
+    :param path: (str) the pathname of a file that is about to be written
+    :return: none
+    """
+    try:
+        if os.lstat(path).st_nlink > 1:
+            _logger.debug("Removing hardlink '%s' before writing", path)
+            os.remove(path)
+
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+class FileStore(object):
+    """
+    Stores files by the SHA-1 digest of their contents, and materializes them
+    at a destination as a reflink (copy-on-write clone) or a hardlink where the
+    filesystem supports these, otherwise as a copy. Each distinct file is thus
+    stored once, however many workspaces and sandboxes refer to it.
+
+    Hardlinked files share storage with the store, so they are made read-only;
+    code that rewrites such a file should first call :py:func:`breakLink`.
+    """
+    Instances = {}
+
+    def __init__(self, storeDir):
+        """
+        :param storeDir: (str) the directory holding the store, which is
+            created if needed. For hardlinks to be possible, it must be on
+            the same filesystem as the sandboxes and workspaces.
+        """
+        self.storeDir   = storeDir
+        self.objectsDir = os.path.join(storeDir, 'objects')
+        self.indexDir   = os.path.join(storeDir, 'index')
+        self.digests = {}       # (path, size, mtime, inode) => digest
+
+        for d in (self.objectsDir, self.indexDir):
+            if not os.path.isdir(d):
+                try:
+                    os.makedirs(d, 0o755)
+                except OSError as e:
+                    if e.errno != errno.EEXIST:    # another process may have created it
+                        raise
+
+    @classmethod
+    def getStore(cls):
+        """
+        Return the FileStore for the directory identified by config variable
+        GCAM.FileStoreDir, or None if the variable is empty.
+        """
+        storeDir = getParam('GCAM.FileStoreDir', raiseError=False)
+        if not storeDir:
+            return None
+
+        storeDir = os.path.abspath(os.path.expanduser(storeDir))
+        store = cls.Instances.get(storeDir)
+        if store is None:
+            store = cls.Instances[storeDir] = FileStore(storeDir)
+
+        return store
+
+    @classmethod
+    def decache(cls):
+        cls.Instances.clear()
+
+    def objectPath(self, digest):
+        return os.path.join(self.objectsDir, digest[:2], digest[2:])
+
+    def digest(self, path):
+        """
+        Return the SHA-1 digest of the contents of file `path`. Digests are
+        remembered in an on-disk index keyed by the file's pathname, size,
+        modification time and inode, so unchanged files are read only once.
+
+        :param path: (str) pathname of a regular file
+        :return: (str) hexadecimal digest
+        """
+        path = os.path.realpath(path)
+        st = os.stat(path)
+        key = '%s|%d|%d|%d' % (path, st.st_size, int(st.st_mtime * 1e6), st.st_ino)
+
+        digest = self.digests.get(key)
+        if digest:
+            return digest
+
+        indexFile = os.path.join(self.indexDir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+        try:
+            with open(indexFile) as f:
+                digest = f.read().strip()
+        except IOError:
+            pass
+
+        if not digest:
+            h = hashlib.sha1()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(_BLOCK_SIZE), b''):
+                    h.update(block)
+
+            digest = h.hexdigest()
+
+            def writer(tmp):
+                with open(tmp, 'w') as f:
+                    f.write(digest)
+
+            self._atomicWrite(indexFile, writer)
+
+        self.digests[key] = digest
+        return digest
+
+    def _atomicWrite(self, path, writer):
+        # Write to a unique temp file, then rename, so concurrent processes
+        # never see a partial file.
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            writer(tmp)
+            os.rename(tmp, path)
+        finally:
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+
+    def add(self, path):
+        """
+        Add the file `path` to the store if its contents are not already present.
+
+        :param path: (str) pathname of a regular file
+        :return: (str) the pathname of the stored object
+        """
+        objPath = self.objectPath(self.digest(path))
+
+        if not os.path.exists(objPath):
+            parent = os.path.dirname(objPath)
+            if not os.path.isdir(parent):
+                try:
+                    os.mkdir(parent, 0o755)
+                except OSError as e:
+                    if e.errno != errno.EEXIST:
+                        raise
+
+            # The source is copied rather than linked so later edits to it can't alter the store
+            def writer(tmp):
+                shutil.copy2(path, tmp)
+                os.chmod(tmp, stat.S_IMODE(os.stat(tmp).st_mode) & ~_WRITE_BITS)
+
+            _logger.debug("Adding '%s' to file store", path)
+            self._atomicWrite(objPath, writer)
+
+        return objPath
+
+    def materialize(self, src, dst):
+        """
+        Create `dst` with the contents of file `src`, using a reflink or
+        hardlink to the stored object if possible, otherwise a copy. An
+        existing `dst` is replaced.
+
+        :param src: (str) pathname of a regular file
+        :param dst: (str) pathname of the file to create
+        :return: (str) the method used: 'reflink', 'hardlink', or 'copy'
+        """
+        objPath = self.add(src)
+
+        if os.path.lexists(dst):
+            os.remove(dst)
+
+        if _reflink(objPath, dst):
+            method = 'reflink'
+        else:
+            try:
+                os.link(objPath, dst)
+                return 'hardlink'       # leave it read-only, like the stored object
+
+            except OSError:             # e.g., different filesystem or unsupported
+                shutil.copy(objPath, dst)
+                method = 'copy'
+
+        mode = stat.S_IMODE(os.stat(src).st_mode)
+        os.chmod(dst, mode | stat.S_IWUSR)
+        return method
+
+    def materializeTree(self, src, dst):
+        """
+        Recreate the directory tree `src` at `dst`, materializing each file as
+        with :py:meth:`materialize`. Like ``shutil.copytree``, symbolic links
+        are followed, and `dst` must not exist yet.
+
+        :param src: (str) the directory to reproduce
+        :param dst: (str) the directory to create
+        :return: none
+        """
+        for dirpath, dirnames, filenames in os.walk(src, followlinks=True):
+            relPath = os.path.relpath(dirpath, src)
+            dstDir = os.path.normpath(os.path.join(dst, relPath))
+            os.makedirs(dstDir)
+            shutil.copystat(dirpath, dstDir)
+
+            for name in filenames:
+                self.materialize(os.path.join(dirpath, name), os.path.join(dstDir, name))
+
+def storeCopy(src, dst):
+    """
+    Copy file or directory `src` to `dst` via the FileStore identified by
+    GCAM.FileStoreDir, or by copying if no store is configured.
+
+    :param src: (str) path to a source file or directory
+    :param dst: (str) path to a destination file or directory, which must not
+        exist if `src` is a directory.
+    :return: none
+    """
+    store = FileStore.getStore()
+    isdir = os.path.isdir(src)
+
+    if not isdir and os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    if store is None:
+        if isdir:
+            shutil.copytree(src, dst)
+        else:
+            breakLink(dst)      # don't overwrite a file shared with the store
+            shutil.copy2(src, dst)
+
+    elif isdir:
+        store.materializeTree(src, dst)
+    else:
+        store.materialize(src, dst)
@@ -8,12 +8,14 @@ from __future__ import print_function
 import os
 import re
 import subprocess
+import threading
 from semver import VersionInfo
 
 from .config import getParam, getParamAsBoolean, parse_version_info, pathjoin, unixPath
 from .error import ProgramExecutionError, GcamError, GcamSolverError, PygcamException, ConfigFileError
 from .log import getLogger
 from .scenarioSetup import createSandbox
+from .telemetry import SolverTelemetry, telemetryPathname, isPeriodStart, RUNNING, UNSOLVED
 from .utils import writeXmldbDriverProperties, getExeDir, pushd
 from .windows import IsWindows
 
@@ -109,7 +111,11 @@ def setJavaPath(exeDir):
     os.environ['CLASSPATH'] = classpath = envClasspath + ';' + javaBinServer + ';' + miClasspath
     _logger.debug('CLASSPATH=%s', classpath)
 
-def _gcamWrapper(args):
+# Seconds to keep reading GCAM's output after it fails to solve a period, to
+# collect the unsolved markets it reports before GCAM is terminated.
+SolverDrainSeconds = 10
+
+def _gcamWrapper(args, telemetryFile=None):
     try:
         _logger.debug('Starting gcam with wrapper')
         gcamProc = subprocess.Popen(args, bufsize=0, stdout=subprocess.PIPE,
@@ -122,26 +128,60 @@ def _gcamWrapper(args):
     modelDidNotSolve = 'Model did not solve'
     pattern = re.compile('(.*(BaseXException|%s).*)' % modelDidNotSolve)
 
-    gcamOut = gcamProc.stdout
-    while True:
-        line = gcamOut.readline().decode('utf-8')
-        if line == '':
-            break
-
-        _logger.info(line.rstrip())          # see if this ends up in worker.log
+    telemetry = SolverTelemetry(path=telemetryFile)
+    status = None
+    solverError = None
+    timer = None
 
-        match = re.search(pattern, line)
-        if match:
+    try:
+        gcamOut = gcamProc.stdout
+        while True:
+            line = gcamOut.readline().decode('utf-8')
+            if line == '':
+                break
+
+            _logger.info(line.rstrip())          # see if this ends up in worker.log
+
+            if solverError:
+                # The unsolved markets are reported before the next period starts
+                if isPeriodStart(line):
+                    break
+
+                telemetry.processLine(line)
+                continue
+
+            telemetry.processLine(line)
+
+            match = re.search(pattern, line)
+            if match:
+                msg = 'GCAM error: ' + match.group(0)
+                if match.group(2) != modelDidNotSolve:
+                    gcamProc.terminate()
+                    raise GcamError(msg)
+
+                # Keep reading the output for a bounded time to record the unsolved
+                # markets. Terminating GCAM closes its output, ending the loop.
+                solverError = msg
+                timer = threading.Timer(SolverDrainSeconds, gcamProc.terminate)
+                timer.daemon = True
+                timer.start()
+
+        if solverError:
             gcamProc.terminate()
-            msg = 'GCAM error: ' + match.group(0)
-            if match.group(1) == modelDidNotSolve:
-                raise GcamSolverError(msg)
-            else:
-                raise GcamError(msg)
+            telemetry.finish(status=UNSOLVED)
+            raise GcamSolverError(solverError)
+
+        _logger.debug('gcamWrapper found EOF. Waiting for GCAM to exit...')
+        status = gcamProc.wait()
+        _logger.debug('gcamWrapper: GCAM exited with status %s', status)
+
+    finally:
+        if timer:
+            timer.cancel()
+
+        if telemetry.status == RUNNING:
+            telemetry.finish(exitCode=status)
 
-    _logger.debug('gcamWrapper found EOF. Waiting for GCAM to exit...')
-    status = gcamProc.wait()
-    _logger.debug('gcamWrapper: GCAM exited with status %s', status)
     return status
 
 #
@@ -251,7 +291,8 @@ def runGCAM(scenario, workspace=None, refWorkspace=None, scenariosDir=None, grou
         _logger.info('Running: %s', command)
 
         noWrapper = IsWindows or noWrapper     # never use the wrapper on Windows
-        exitCode = subprocess.call(gcamArgs, shell=False) if noWrapper else _gcamWrapper(gcamArgs)
+        exitCode = subprocess.call(gcamArgs, shell=False) if noWrapper else \
+                   _gcamWrapper(gcamArgs, telemetryFile=telemetryPathname(exeDir))
 
         if exitCode != 0:
             raise ProgramExecutionError(command, exitCode)
@@ -19,6 +19,7 @@ from .error import FileFormatError, CommandlineError, PygcamException
 from .log import getLogger
 from .utils import mkdirs, flatten
 from .XMLFile import XMLFile
+from .xmlOutput import writeXmlTree
 
 _logger = getLogger(__name__)
 
@@ -109,27 +110,24 @@ class LandProtection(object):
         :param unprotectFirst: (bool) if True, make all land "unprotected" before protecting.
         :return: none
         """
-        parser = ET.XMLParser(remove_blank_text=True)
-        tree = ET.parse(infile, parser)
-
         # TBD: eliminate this for v5.0
         # Remove any existing land protection, if so requested
         # if unprotectFirst:
         #     unProtectLand(tree, otherArable=True)
 
-        # self.protectLandTree(tree, scenarioName)
-        protectLandTree(tree, scenarioName)
+        _logger.info("Applying protection scenario %s", scenarioName)
+        _protectLandFile(infile, outfile, self.protectionDict(scenarioName), backup=backup)
 
-        if backup:
-            try:
-                # Ensure we're not clobbering reference files.
-                backupFile = outfile + '~'
-                os.rename(outfile, backupFile)
-            except Exception as e:
-                PygcamException('Failed to create backup file "%s": %s', backupFile, e)
+    def protectionDict(self, scenarioName):
+        """
+        Return the protections defined by scenario `scenarioName`, as a dict of
+        lists of (landtype, basin, fraction) tuples keyed by region name.
+        """
+        scenario = Scenario.getScenario(scenarioName)
+        if not scenario:
+            raise FileFormatError("Scenario '%s' was not found" % scenarioName)
 
-        _logger.info("Writing '%s'...", outfile)
-        tree.write(outfile, xml_declaration=True, pretty_print=True)
+        return _protection_dict(scenario)
 
 
 class Group(object):
@@ -277,18 +275,20 @@ def unProtectLand(tree, landClasses=None, otherArable=False, regions=None):
         if len(protectedNodes) == 0:
             continue
 
+        # Index the leaves under this root by name in one pass, rather than
+        # searching the whole root for each allocation.
+        leaves = {}
+        for leaf in landRoot.iter('UnmanagedLandLeaf'):
+            leaves.setdefault(leaf.get('name'), leaf)
+
         # Find matching not-protected node and add protected land back in
         for node in protectedNodes:
             name = node.get('name')
             unProtectedName = name[len("Protected"):]
-            prefix = './/UnmanagedLandLeaf[@name="%s"]' % unProtectedName
+            unprotectedAllocs = _allocationIndex(leaves[unProtectedName])
 
-            protectedAllocs = node.xpath(".//allocation|.//landAllocation")
-
-            for alloc in protectedAllocs:
-                year = alloc.get('year')
-                xpath = prefix + '//%s[@year="%s"]' % (alloc.tag, year)
-                unprotectedAlloc = landRoot.find(xpath)
+            for alloc in _allocationNodes(node):
+                unprotectedAlloc = unprotectedAllocs[(alloc.tag, alloc.get('year'))]
                 originalArea = float(unprotectedAlloc.text) + float(alloc.text)
                 unprotectedAlloc.text = str(originalArea)
 
@@ -393,7 +393,7 @@ def protectLand(infile, outfile, fraction, landClasses=None, otherArable=False,
 
     createProtected(tree, fraction, landClasses=landClasses, otherArable=otherArable,
                     regions=regions, unprotectFirst=unprotectFirst)
-    tree.write(outfile, xml_declaration=True, pretty_print=True)
+    writeXmlTree(tree, outfile)
 
 
 # TBD: NEEDS TESTING
@@ -445,6 +445,7 @@ def runProtectionScenario(scenarioName, outputDir=None, workspace=None,
     workspace = workspace or getParam('GCAM.SandboxRefWorkspace')
     xmlFiles = xmlFiles or _landXmlPaths(workspace)
 
+    pairs = []
     for inFile in xmlFiles:
         basename = os.path.basename(inFile)
         outFile = inFile if inPlace else pathjoin(outputDir, basename)
@@ -453,7 +454,14 @@ def runProtectionScenario(scenarioName, outputDir=None, workspace=None,
         if not inPlace and os.path.lexists(outFile) and os.path.samefile(inFile, outFile):
             raise CommandlineError("Attempted to overwrite '%s' but --inPlace was not specified." % inFile)
 
-        landProtection.protectLand(inFile, outFile, scenarioName, unprotectFirst=unprotectFirst)
+        pairs.append((inFile, outFile))
+
+    # The scenario is resolved once and applied to each file as it's read
+    _logger.info("Applying protection scenario %s", scenarioName)
+    prot_dict = landProtection.protectionDict(scenarioName)
+
+    for inFile, outFile in pairs:
+        _protectLandFile(inFile, outFile, prot_dict)
 
 def protectLandMain(args):
 
@@ -526,41 +534,117 @@ def eltname(elt):
 def _compose_land_basin(landtype, basin, protection):
     return "{}{}_{}".format(protection, landtype, basin)
 
+def _allocationNodes(leaf):
+    """
+    Return the allocation and landAllocation nodes beneath `leaf`, in document order.
+    """
+    return list(leaf.iter('allocation', 'landAllocation'))
+
+def _allocationIndex(leaf):
+    """
+    Return a dict of the allocation and landAllocation nodes beneath `leaf`,
+    keyed by (tag, year). If several match, the first is used.
+    """
+    index = {}
+    for node in _allocationNodes(leaf):
+        index.setdefault((node.tag, node.get('year')), node)
+    return index
+
+class LandTree(object):
+    """
+    An index of the unmanaged land leaves in a parsed GCAM land input file, built
+    in one pass over the tree and keyed by region name and leaf name, e.g.,
+    ('USA', 'ProtectedShrubland_MissouriR'). Protection is applied to all
+    selected leaves of a region at once, using array operations.
+    """
+    def __init__(self, tree):
+        """
+        :param tree: (lxml ElementTree) a tree for a parsed GCAM land input file
+        """
+        from collections import defaultdict
+
+        self.tree = tree
+        self.leaves = defaultdict(dict)     # {regionName: {leafName: element}}
+
+        for region in tree.iter('region'):
+            leaves = self.leaves[region.get('name')]
+            for leaf in region.iter('UnmanagedLandLeaf'):
+                leaves[eltname(leaf)] = leaf
+
+    def leaf(self, region, name):
+        return self.leaves[region][name]
+
+    def landtypeBasinPairs(self, region):
+        """
+        Return the (landtype, basin) pairs of the protected leaves in `region`.
+        """
+        return _landtype_basin_pairs(self.leaves.get(region, {}))
+
+    def _history(self, leaf):
+        # The values from which the total area is computed
+        return [(node.get('year'), float(node.text)) for node in _allocationNodes(leaf)
+                if node.tag == 'landAllocation' or float(node.get('year')) < 1975]
+
+    def protect(self, prot_dict):
+        """
+        Set the protected share of each selected land type to the given fraction of
+        the total (protected + unprotected) area in each year.
+
+        :param prot_dict: (dict) a list of (landtype, basin, fraction) tuples keyed
+            by region name. If basin is None or empty, the fraction applies to
+            the land type in all basins of the region.
+        :return: none
+        """
+        import numpy as np
+
+        for reg, prot_tups in prot_dict.items():
+            pairs = self.landtypeBasinPairs(reg)
+
+            # If several protections select a land type and basin, the last one applies
+            selected = {}
+            for (landtype, basin, prot_frac) in prot_tups:
+                for (l, b) in pairs:
+                    if landtype == l and (basin == b or not basin):
+                        selected[(l, b)] = prot_frac
+
+            # Group the leaves with the same years so each group is computed as one array
+            groups = {}
+            for (landtype, basin), prot_frac in selected.items():
+                _logger.debug("Processing %s, %s, %s", reg, landtype, basin)
+                protLeaf   = self.leaf(reg, _compose_land_basin(landtype, basin, PROTECTED))
+                unprotLeaf = self.leaf(reg, _compose_land_basin(landtype, basin, ''))
+
+                protHist   = self._history(protLeaf)
+                unprotHist = self._history(unprotLeaf)
+
+                years = tuple([year for year, value in protHist])
+                if years != tuple([year for year, value in unprotHist]):
+                    raise FileFormatError("Protected and unprotected %s in %s, basin %s have different years" %
+                                          (landtype, reg, basin))
+
+                group = groups.setdefault(years, [])
+                group.append((protLeaf, unprotLeaf, prot_frac,
+                              [value for year, value in protHist], [value for year, value in unprotHist]))
+
+            for years, group in groups.items():
+                protLeaves, unprotLeaves, fractions, protVals, unprotVals = zip(*group)
+
+                total  = np.array(protVals) + np.array(unprotVals)
+                prot   = total * np.array(fractions).reshape((-1, 1))
+                unprot = total - prot
+
+                for leaves, values in ((protLeaves, prot), (unprotLeaves, unprot)):
+                    for leaf, row in zip(leaves, values):
+                        _set_land_values(leaf, dict(zip(years, row)))
+
 def _set_land_values(land_leaf, vals):
     """
     Update allocation and landAllocation nodes with the values
     computed for each year.
     """
-    nodes = land_leaf.xpath('.//allocation|.//landAllocation')
-    for node in nodes:
+    for node in _allocationNodes(land_leaf):
         year = node.get('year')
-        node.text = str(vals[year])
-
-def _update_protection(reg_dict, landtype, basin, prot_vals, unprot_vals):
-    def _upd(protected, vals):
-        leaf_name = _compose_land_basin(landtype, basin, protected)
-        land_leaf = reg_dict[leaf_name]
-        _set_land_values(land_leaf, vals)
-
-    _upd(PROTECTED, prot_vals)
-    _upd('', unprot_vals)
-
-def _get_allocation(reg_dict, landtype, basin, protected=''):
-    import pandas as pd
-
-    land_key = protected + landtype + '_' + basin
-    land_leaf = reg_dict[land_key]
-    nodes = land_leaf.xpath('.//allocation[@year<1975]|.//landAllocation')
-    [(node.get('year'), float(node.text)) for node in nodes]
-    values = [(node.get('year'), float(node.text)) for node in nodes]
-    ind, val = zip(*values)
-    s = pd.Series(val, index=ind)
-    return s
-
-def _get_total_area(reg_dict, landtype, basin):
-    unprot = _get_allocation(reg_dict, landtype, basin, protected='')
-    prot   = _get_allocation(reg_dict, landtype, basin, protected=PROTECTED)
-    return prot + unprot
+        node.text = str(float(vals[year]))
 
 def _landtype_basin_pairs(reg_dict):
     """
@@ -569,27 +653,47 @@ def _landtype_basin_pairs(reg_dict):
     pairs = [_parse_land_basin(key)[0:2] for key in reg_dict.keys() if key.startswith(PROTECTED)]
     return pairs
 
-def _cache_land_nodes(tree, regions):
-    d = {}
-    for reg in regions:
-        nodes = tree.xpath('//region[@name="{}"]//UnmanagedLandLeaf'.format(reg))
-        d[reg] = {eltname(node) : node for node in nodes}
-    return d
-
 def _protect_land(tree, prot_dict):
-    node_dict = _cache_land_nodes(tree, prot_dict.keys())
-    for (reg, prot_tups) in prot_dict.items():
-        reg_dict = node_dict[reg]
-        land_basin_pairs = _landtype_basin_pairs(reg_dict)
-
-        for (landtype, basin, prot_frac) in prot_tups:
-            for (l, b) in land_basin_pairs:
-                if landtype == l and (basin == b or not basin):
-                    print("Processing {}, {}, {}".format(reg, landtype, b))
-                    total = _get_total_area(reg_dict, landtype, b)
-                    prot_vals   = total * prot_frac
-                    unprot_vals = total - prot_vals
-                    _update_protection(reg_dict, landtype, b, prot_vals, unprot_vals)
+    LandTree(tree).protect(prot_dict)
+
+def _protectLandFile(infile, outfile, prot_dict, backup=True):
+    """
+    Read the land file `infile`, apply the protections in `prot_dict`, and write
+    the result to `outfile`, first renaming any existing `outfile` to `outfile~`
+    if `backup` is True.
+    """
+    parser = ET.XMLParser(remove_blank_text=True)
+    tree = ET.parse(infile, parser)
+
+    _protect_land(tree, prot_dict)
+
+    if backup:
+        try:
+            # Ensure we're not clobbering reference files.
+            backupFile = outfile + '~'
+            os.rename(outfile, backupFile)
+        except Exception as e:
+            PygcamException('Failed to create backup file "%s": %s', backupFile, e)
+
+    _logger.info("Writing '%s'...", outfile)
+    writeXmlTree(tree, outfile)
+
+def _protection_dict(scenario):
+    """
+    Return a dict of lists of (landtype, basin, fraction) tuples, keyed by region
+    name, describing the protections of `scenario`.
+    """
+    from collections import defaultdict
+
+    prot_dict = defaultdict(list)
+
+    for reg, protReg in scenario.protRegDict.items():
+        for prot in protReg.protections:
+            fraction = prot.fraction
+            basin = prot.basin
+            prot_dict[reg] += [(landtype, basin, fraction) for landtype in prot.landClasses]
+
+    return prot_dict
 
 #
 # Modified from landProtection.py method of same name
@@ -604,20 +708,10 @@ def protectLandTree(tree, scenarioName):
     :param scenarioName: (str) the name of the scenario to apply
     :return: none
     """
-    from collections import defaultdict
-
     _logger.info("Applying protection scenario %s", scenarioName)
 
     scenario = Scenario.getScenario(scenarioName)
     if not scenario:
         raise FileFormatError("Scenario '%s' was not found" % scenarioName)
 
-    prot_dict = defaultdict(list)
-
-    for reg, protReg in scenario.protRegDict.items():
-        for prot in protReg.protections:
-            fraction = prot.fraction
-            basin = prot.basin
-            prot_dict[reg] += [(landtype, basin, fraction) for landtype in prot.landClasses]
-
-    _protect_land(tree, prot_dict)
+    _protect_land(tree, _protection_dict(scenario))
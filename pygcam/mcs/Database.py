@@ -10,14 +10,15 @@
 This module includes contributions by Sam Fendell and Ryan Jones.
 '''
 from __future__ import print_function
-from collections import Iterable
+from collections import Iterable, OrderedDict, defaultdict
 from contextlib import contextmanager
 from datetime import datetime
 from six import string_types, iteritems, MAXSIZE
 from six.moves import xrange
 import sys
 
-from sqlalchemy import create_engine, Table, Column, String, Float, text, MetaData, event
+from sqlalchemy import (create_engine, Table, Column, String, Float, text, literal, select, and_,
+                        MetaData, event)
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, load_only
@@ -31,7 +32,7 @@ from . import util as U
 from .constants import RegionMap
 from .error import PygcamMcsUserError, PygcamMcsSystemError
 from .schema import (ORMBase, Run, Sim, Input, Output, InValue, OutValue, Experiment,
-                     Program, Code, Region, TimeSeries)
+                     Program, Code, Region, TimeSeries, TimeSeriesValue, SolverPeriod)
 
 _logger = getLogger(__name__)
 
@@ -166,6 +167,7 @@ class CoreDatabase(object):
         self.url     = None
         self.engine  = None
         self.appId   = None
+        self.solverTableChecked = False
 
     def endSession(self, session):
         '''
@@ -449,6 +451,39 @@ class CoreDatabase(object):
             engine = session.get_bind()
             engine.echo = value
 
+    def migrateSchema(self):
+        '''
+        Bring a database created by an earlier version up to the current schema,
+        in place, by creating any missing tables and indexes. Existing tables and
+        data are not otherwise altered.
+
+        :return: (list of str) the names of the tables and indexes created
+        '''
+        from sqlalchemy import inspect
+
+        engine = self.engine
+        meta = ORMBase.metadata
+        inspector = inspect(engine)
+
+        created = []
+        tableNames = inspector.get_table_names()
+        for table in meta.sorted_tables:
+            if table.name not in tableNames:
+                _logger.info("Creating table %s", table.name)
+                table.create(bind=engine)
+                created.append(table.name)
+                continue
+
+            existing = [idx['name'] for idx in inspector.get_indexes(table.name)]
+            for index in table.indexes:
+                if index.name not in existing:
+                    _logger.info("Creating index %s on table %s", index.name, table.name)
+                    index.create(bind=engine)
+                    created.append(index.name)
+
+        self.solverTableChecked = True
+        return created
+
     def addColumns(self, tableClass, columns):
         '''
         Adds a new column or columns to an existing table, emitting an
@@ -495,16 +530,19 @@ class CoreDatabase(object):
         return outputId
 
     def getOutputIds(self, nameList):
-        # cache on first call
-        if not self.outputIds:
+        # cache on first call, and reload if outputs have been added since
+        if not self.outputIds or not all([name in self.outputIds for name in nameList]):
             with self.sessionScope() as session:
                 rows = session.query(Output.name, Output.outputId).all()
                 self.outputIds = dict(rows)
 
         # lookup ids in cache
-        ids = [self.outputIds[name] for name in nameList]
+        try:
+            ids = [self.outputIds[name] for name in nameList]
+        except KeyError as e:
+            raise PygcamMcsSystemError("Output %s was not found in the Output table" % e)
+
         return ids
-        # return zip(*ids)[0] if ids else []
 
     def getOutputs(self):
         rows = self.getTable(Output)
@@ -614,6 +652,62 @@ class CoreDatabase(object):
     #     self.endSession(session)
     #     return DataFrame(values, columns=columnNames)
 
+    def saveSolverTelemetry(self, runId, telemetry, session=None):
+        """
+        Save the per-period solver records for a run, replacing any saved earlier.
+
+        :param runId: (int) the run ID
+        :param telemetry: (dict) as read by pygcam.telemetry.readTelemetry
+        :param session: a database session, or None to create and commit one
+        :return: none
+        """
+        if not self.solverTableChecked:
+            # The table may be missing from databases created by earlier versions
+            SolverPeriod.__table__.create(bind=self.engine, checkfirst=True)
+            self.solverTableChecked = True
+
+        sess = session or self.Session()
+        sess.query(SolverPeriod).filter_by(runId=runId).delete(synchronize_session=False)
+
+        for rec in telemetry.get('periods', []):
+            markets = rec.get('unsolvedMarkets')
+            sess.add(SolverPeriod(runId=runId, period=rec['period'], year=rec['year'],
+                                  iterations=rec.get('iterations'), seconds=rec.get('seconds'),
+                                  status=rec.get('status'),
+                                  unsolvedMarkets=','.join(markets) if markets else None))
+
+        if session is None:
+            self.commitWithRetry(sess)
+            self.endSession(sess)
+
+    def getSolverTelemetry(self, simId, expName=None):
+        """
+        Return the per-period solver records for the runs of a simulation.
+
+        :param simId: (int) simulation ID
+        :param expName: (str) if not None, return only records for this scenario
+        :return: (pandas.DataFrame) with columns trialNum, expName, period, year,
+            iterations, seconds, status, and unsolvedMarkets, or None if there
+            are no records.
+        """
+        from pandas import DataFrame    # lazy import
+
+        with self.sessionScope() as session:
+            q = session.query(Run.trialNum, Experiment.expName, SolverPeriod.period, SolverPeriod.year,
+                              SolverPeriod.iterations, SolverPeriod.seconds, SolverPeriod.status,
+                              SolverPeriod.unsolvedMarkets).\
+                    join(Run, SolverPeriod.runId == Run.runId).filter(Run.simId == simId).join(Experiment)
+
+            if expName:
+                q = q.filter(Experiment.expName == expName)
+
+            rows = q.order_by(Run.trialNum, SolverPeriod.period).all()
+            if not rows:
+                return None
+
+            cols = [d['name'] for d in q.column_descriptions]
+            return DataFrame.from_records(rows, columns=cols)
+
     def getParameterValues(self, simId, program='gcam', asDataFrame=False):
         from pandas import DataFrame    # lazy import
         session = self.Session()
@@ -635,21 +729,59 @@ class CoreDatabase(object):
         return resultDF
 
     def getParameterValues2(self, simId):
-        from pandas import DataFrame    # lazy import
-        session = self.Session()
+        return self.getParameterMatrix(simId)
 
-        query = session.query(InValue.trialNum, InValue.value, Input.paramName).\
-                 filter(InValue.simId == simId).join(Input).order_by(InValue.trialNum)
+    def getParameterMatrix(self, simId, program=None):
+        '''
+        Read the values of all parameters for all trials of a simulation directly
+        into a matrix, rather than pivoting row by row.
 
-        rslt = query.all()
-        self.endSession(session)
+        :param simId: (int) simulation ID
+        :param program: (str) if not None, return only parameters of this program
+        :return: (pandas.DataFrame) indexed by trialNum, with one column per parameter,
+            sorted by name, or None if no values are stored for `simId`. If several
+            values are stored for one parameter and trial, the last one read is used.
+        :raises PygcamMcsSystemError: if `program` is None and values are stored for
+            parameters of the same name in different programs.
+        '''
+        import numpy as np
+        from pandas import DataFrame, Index    # lazy import
 
-        if not rslt:
+        with self.sessionScope() as session:
+            query = session.query(Input.inputId, Input.paramName)
+            if program:
+                query = query.join(Program).filter(Program.name == program)
+
+            names = dict(query.all())
+
+            query = session.query(InValue.trialNum, InValue.inputId, InValue.value).filter(InValue.simId == simId)
+            if program:
+                query = query.filter(InValue.inputId.in_(list(names.keys())))
+
+            rows = query.all()
+
+        if not rows:
             return None
 
-        cols = ['trialNum', 'value', 'paramName']
-        resultDF = DataFrame.from_records(rslt, columns=cols)
-        resultDF = resultDF.pivot(index='trialNum', columns='paramName', values='value')
+        trialNums, inputIds, values = [np.array(col) for col in zip(*rows)]
+
+        colIds   = sorted(set(inputIds), key=lambda inputId: names[inputId])
+        colNames = [names[inputId] for inputId in colIds]
+
+        # Columns are named by parameter, so the same name in two programs would collide
+        dups = sorted(set([name for prev, name in zip(colNames, colNames[1:]) if name == prev]))
+        if dups:
+            raise PygcamMcsSystemError("Parameters %s are defined for more than one program; "
+                                       "specify the program to read" % dups)
+
+        colNums = {inputId: i for i, inputId in enumerate(colIds)}
+        trials, rowIdx = np.unique(trialNums, return_inverse=True)
+
+        matrix = np.full((len(trials), len(colIds)), np.nan)
+        matrix[rowIdx, [colNums[inputId] for inputId in inputIds]] = values.astype(float)
+
+        resultDF = DataFrame(matrix, index=Index(trials, name='trialNum'),
+                             columns=Index(colNames, name='paramName'))
         return resultDF
 
     def getParameters(self):
@@ -954,6 +1086,7 @@ class GcamDatabase(CoreDatabase):
         self.paramIds = {}                   # parameter IDs by name
         self.outputIds = None                # output IDs by name
         self.canonicalRegionMap = {}
+        self.longTimeSeries = getParamAsBoolean('MCS.LongTimeSeries')
 
         # Cache these to avoid database access in saveResults loop
         for regionName, regionId in RegionMap.items():
@@ -978,7 +1111,8 @@ class GcamDatabase(CoreDatabase):
         'Add GCAM-specific tables to the database'
         super(GcamDatabase, self).initDb(args=args)
 
-        self.addYearCols()
+        if not self.longTimeSeries:
+            self.addYearCols()
         self.addExpCols()
 
         if args and args.empty:
@@ -988,7 +1122,8 @@ class GcamDatabase(CoreDatabase):
 
     def startDb(self, checkInit=True):
         super(GcamDatabase, self).startDb(checkInit=checkInit)
-        self.addYearCols(alterTable=False)
+        if not self.longTimeSeries:
+            self.addYearCols(alterTable=False)
         self.addExpCols(alterTable=False)
 
     def createExp(self, name, parent=None, description=None):
@@ -1195,13 +1330,54 @@ class GcamDatabase(CoreDatabase):
         Save the value of the given parameter in the database. Tuples are
         of the format: (trialNum, paramId, value, varNum)
         '''
+        # We save varNum to distinguish among independent values for the same variable name.
+        # The only purpose this serves is to ensure uniqueness, enforced by the database.
+        rows = ({'inputId': paramId, 'simId': simId, 'trialNum': trialNum,
+                 'value': value, 'row': 0, 'col': varNum} for trialNum, paramId, value, varNum in tuples)
+
+        self._bulkInsert(InValue, rows)
+
+    def saveParameterMatrix(self, simId, df, columns, start=0):
+        '''
+        Save the values of all parameters for all trials in one bulk operation.
+
+        :param simId: (int) simulation ID
+        :param df: (pandas.DataFrame) the trial data, with one row per trial and
+            one column per parameter
+        :param columns: (list of (str, int)) (paramName, varNum) pairs identifying
+            the columns of `df` to save and the variable number of each
+        :param start: (int) the trial number of the first row of `df`
+        :return: none
+        '''
+        trialNums = list(range(start, start + df.shape[0]))
+
+        def rows():
+            for pname, varNum in columns:
+                paramId = self.getParamId(pname)
+                values = df[pname].values.astype(float).tolist()
+                for trialNum, value in zip(trialNums, values):
+                    yield {'inputId': paramId, 'simId': simId, 'trialNum': trialNum,
+                           'value': value, 'row': 0, 'col': varNum}
+
+        self._bulkInsert(InValue, rows())
+
+    def _bulkInsert(self, tableClass, rows, chunkSize=50000):
+        '''
+        Insert `rows` (an iterable of dicts with identical keys) into the table for
+        `tableClass` with multi-row INSERTs of up to `chunkSize` rows, in a single
+        transaction. Rows are consumed in chunks so the iterable need not fit in memory.
+        '''
+        from itertools import islice
+
+        insert = tableClass.__table__.insert()
+        rows = iter(rows)
+
         with self.sessionScope() as session:
-            for trialNum, paramId, value, varNum in tuples:
-                # We save varNum to distinguish among independent values for the same variable name.
-                # The only purpose this serves is to ensure uniqueness, enforced by the database.
-                inValue = InValue(inputId=paramId, simId=simId, trialNum=trialNum,
-                                  value=value, row=0, col=varNum)
-                session.add(inValue)
+            while True:
+                chunk = list(islice(rows, chunkSize))
+                if not chunk:
+                    break
+                session.execute(insert, chunk)
 
     def deleteRunResults(self, runId, outputIds=None, session=None):
         """
@@ -1216,12 +1392,109 @@ class GcamDatabase(CoreDatabase):
         if outputIds:
             query = query.filter(TimeSeries.outputId.in_(outputIds))
 
+        if self.longTimeSeries:
+            self._deleteSeriesValues(sess, query.with_entities(TimeSeries.seriesId))
+
         query.delete(synchronize_session='fetch')
 
         if session is None:
             self.commitWithRetry(sess)
             self.endSession(sess)
 
+    def _deleteSeriesValues(self, session, seriesIds):
+        # Delete the long-format values of the series selected by query `seriesIds`.
+        # We don't rely on ON DELETE CASCADE, which SQLite enforces only if enabled.
+        session.query(TimeSeriesValue).filter(TimeSeriesValue.seriesId.in_(seriesIds.subquery())).\
+            delete(synchronize_session=False)
+
+    def saveRunResults(self, runResults, session=None):
+        """
+        Save the scalar and time-series results for a batch of runs, replacing any
+        results previously saved for the same runs and outputs. Rather than issuing
+        queries per value, output IDs are taken from the cache, stale rows are
+        removed with one DELETE per table (per distinct set of outputs), and new
+        rows are written with one multi-row INSERT per table.
+
+        :param runResults: (iterable of (runId, resultList) pairs) where each item of
+            resultList is a dict with keys 'paramName', 'value', 'regionName', 'isScalar',
+            and 'units', as created by pygcam.mcs.XMLResultFile.collectResults. For
+            time-series, 'value' is a dict of values keyed by year column name.
+        :param session: a database session, or None to create and commit one
+        :return: none
+        """
+        outValues = OrderedDict()       # keyed by (runId, outputId); the last value saved wins
+        series = OrderedDict()          # keyed by (runId, outputId, regionId); likewise
+        values = {}                     # year values keyed as for series, if self.longTimeSeries
+        deletions = defaultdict(list)   # runIds keyed by the outputIds to delete
+
+        for runId, resultList in runResults:
+            if not resultList:
+                continue
+
+            outputIds = self.getOutputIds([d['paramName'] for d in resultList])
+            deletions[tuple(sorted(set(outputIds)))].append(runId)
+
+            for resultDict, outputId in zip(resultList, outputIds):
+                if resultDict['isScalar']:
+                    outValues[(runId, outputId)] = {'runId': runId, 'outputId': outputId,
+                                                    'value': resultDict['value']}
+                else:
+                    regionId = self.getRegionId(resultDict['regionName'])
+                    key = (runId, outputId, regionId)
+                    row = series[key] = {'runId': runId, 'outputId': outputId, 'regionId': regionId,
+                                         'units': resultDict['units']}
+
+                    if self.longTimeSeries:
+                        values[key] = resultDict['value']
+                    else:
+                        row.update(resultDict['value'])
+
+        sess = session or self.Session()
+
+        for outputIds, runIds in iteritems(deletions):
+            if self.longTimeSeries:
+                seriesIds = sess.query(TimeSeries.seriesId).filter(TimeSeries.runId.in_(runIds),
+                                                                   TimeSeries.outputId.in_(outputIds))
+                self._deleteSeriesValues(sess, seriesIds)
+
+            for table in (OutValue, TimeSeries):
+                sess.query(table).filter(table.runId.in_(runIds), table.outputId.in_(outputIds)).\
+                    delete(synchronize_session=False)
+
+        if outValues:
+            sess.execute(OutValue.__table__.insert(), list(outValues.values()))
+
+        if series:
+            rows = list(series.values())
+
+            # A multi-row insert requires the same keys in each row
+            keys = set()
+            for row in rows:
+                keys.update(row)
+
+            for row in rows:
+                for key in keys:
+                    row.setdefault(key, None)
+
+            sess.execute(TimeSeries.__table__.insert(), rows)
+
+        if values:
+            # Look up the IDs assigned to the new series. Any earlier series for
+            # the same runs and outputs were deleted above.
+            runIds = set([runId for runId, outputId, regionId in values])
+            query = sess.query(TimeSeries.seriesId, TimeSeries.runId, TimeSeries.outputId, TimeSeries.regionId).\
+                filter(TimeSeries.runId.in_(runIds))
+            seriesIds = {(runId, outputId, regionId): seriesId for seriesId, runId, outputId, regionId in query}
+
+            rows = [{'seriesId': seriesIds[key], 'year': U.stripYearPrefix(col), 'value': value}
+                    for key, yearValues in iteritems(values) for col, value in iteritems(yearValues)]
+            if rows:
+                sess.execute(TimeSeriesValue.__table__.insert(), rows)
+
+        if session is None:
+            self.commitWithRetry(sess)
+            self.endSession(sess)
+
     def saveTimeSeries(self, runId, regionId, paramName, values, units=None, session=None):
         sess = session or self.Session()
 
@@ -1268,6 +1541,79 @@ class GcamDatabase(CoreDatabase):
             rslt = query.all()
             return rslt
 
+    def getTimeSeriesDF(self, simId, paramName, expList):
+        '''
+        Retrieve the timeseries for the given simId and paramName in the form of a
+        DataFrame, reading either storage format (see MCS.LongTimeSeries).
+
+        :param simId: simulation ID
+        :param paramName: name of output parameter
+        :param expList: (list of str) the names of the experiments to select
+           results for.
+        :return: (pandas.DataFrame) indexed by seriesId, with columns runId, expName,
+           units, and one column per year named "y2005", "y2010", etc., or None if
+           there are no results.
+        '''
+        from pandas import DataFrame    # lazy import
+
+        if not self.longTimeSeries:
+            rslt = self.getTimeSeries(simId, paramName, expList)
+            if not rslt:
+                return None
+
+            cols = ['seriesId', 'runId', 'units'] + self.yearCols()
+            records = [[getattr(obj, col) for col in cols] + [expName] for obj, expName in rslt]
+            return DataFrame.from_records(records, columns=cols + ['expName'], index='seriesId')
+
+        with self.sessionScope() as session:
+            query = session.query(TimeSeries.seriesId, TimeSeries.runId, TimeSeries.units, Experiment.expName,
+                                  TimeSeriesValue.year, TimeSeriesValue.value). \
+                join(TimeSeriesValue, TimeSeriesValue.seriesId == TimeSeries.seriesId). \
+                join(Run, TimeSeries.runId == Run.runId).filter_by(simId=simId).filter_by(status='succeeded'). \
+                join(Experiment).filter(Experiment.expName.in_(expList)). \
+                join(Output, TimeSeries.outputId == Output.outputId).filter_by(name=paramName)
+
+            rows = query.all()
+
+        if not rows:
+            return None
+
+        df = DataFrame.from_records(rows, columns=['seriesId', 'runId', 'units', 'expName', 'year', 'value'])
+        df['year'] = U.YEAR_COL_PREFIX + df.year.astype(str)
+        resultDF = df.pivot_table(index=['seriesId', 'runId', 'units', 'expName'], columns='year', values='value')
+        resultDF.columns.name = None
+        return resultDF.reset_index(level=['runId', 'units', 'expName'])
+
+    def copyTimeSeriesToLong(self):
+        '''
+        Copy the values in the year columns of the "timeseries" table into the
+        "timeseriesvalue" table, replacing any values there for the same series
+        and years. This is done with one INSERT ... SELECT per year, so the data
+        never passes through Python.
+
+        :return: (int) the number of year columns copied
+        '''
+        engine = self.engine
+        wide = Table('timeseries', MetaData(), autoload=True, autoload_with=engine)
+        longTable = TimeSeriesValue.__table__
+
+        yearCols = [col for col in wide.columns if isinstance(U.stripYearPrefix(col.name), int)]
+
+        with self.sessionScope() as session:
+            for col in yearCols:
+                year = U.stripYearPrefix(col.name)
+                _logger.info("Copying timeseries column %s to timeseriesvalue", col.name)
+
+                hasValue = col.isnot(None)
+                copied = select([wide.c.seriesId]).where(hasValue)
+                session.execute(longTable.delete().where(and_(longTable.c.year == year,
+                                                              longTable.c.seriesId.in_(copied))))
+
+                query = select([wide.c.seriesId, literal(year), col]).where(hasValue)
+                session.execute(longTable.insert().from_select(['seriesId', 'year', 'value'], query))
+
+        return len(yearCols)
+
 
 # Single instance of the class. Use 'getDatabase' constructor
 # to ensure that this instance is returned if already created.
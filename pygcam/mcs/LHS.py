@@ -13,24 +13,26 @@ matrix for the sampled parameters.
 
 Heavily modified from http://nullege.com/codes/show/src@m@o@model-builder-HEAD@Bayes@lhs.py
 '''
+from collections import OrderedDict
 import numpy as np
 from scipy import stats
 from pandas import DataFrame
 
+def _rankColumns(m):
+    '''
+    Return an array of the same shape as `m` holding the rank of each value within its column.
+    '''
+    return np.apply_along_axis(stats.rankdata, 0, m)
+
 def rankCorrCoef(m):
     '''
     Take a 2-D array of values and produce a array of rank correlation
     coefficients representing the rank correlation among the columns.
+    This is the Pearson correlation of the columns' ranks (i.e., Spearman's
+    rho), computed for all pairs of columns in one matrix operation.
     '''
-    dummy, cols = m.shape
-    corrCoef = np.zeros((cols, cols))  # @UndefinedVariable
-
-    for i in range(cols):
-        corrCoef[i, i] = 1.  # All columns are perfectly correlated with themselves
-        for j in range(i + 1, cols):
-            corr = stats.spearmanr(m[:, i], m[:, j])[0]
-            corrCoef[i, j] = corrCoef[j, i] = corr
-
+    corrCoef = np.corrcoef(_rankColumns(m), rowvar=False)
+    np.fill_diagonal(corrCoef, 1.)  # All columns are perfectly correlated with themselves
     return corrCoef
 
 
@@ -63,8 +65,10 @@ def genRankValues(params, trials, corrMat):
     strata = np.arange(1.0, trials + 1) / (trials + 1)
     vdwScores = stats.norm().ppf(strata)
 
+    # Each column is the previous one, reshuffled. The shuffles are done
+    # in sequence so the random number stream is consumed as before.
     S = np.zeros((trials, params))
-    for i in xrange(params):
+    for i in range(params):
         np.random.shuffle(vdwScores)
         S[:, i] = vdwScores
 
@@ -74,10 +78,7 @@ def genRankValues(params, trials, corrMat):
     Q = np.array(np.linalg.cholesky(E))
     final = np.dot(np.dot(S, np.linalg.inv(Q).T), P.T)
 
-    ranks = np.zeros((trials, params), dtype='i')
-    for i in xrange(params):
-        ranks[:, i] = stats.rankdata(final[:, i])
-
+    ranks = _rankColumns(final).astype('i')
     return ranks
 
 
@@ -120,24 +121,79 @@ def lhs(paramList, trials, corrMat=None, columns=None, skip=None):
 
     skip = skip or []
 
+    # Draw the random numbers for each parameter in order, exactly as if each
+    # parameter's values were computed in turn, but defer ppf calls on scipy
+    # distributions so like distributions can be evaluated together.
+    percentiles = {}
+    deferred = OrderedDict()    # column indices keyed by batch key
+    shuffles = {}
+
     for i, param in enumerate(paramList):
         if param in skip:
             continue    # process later
 
-        values = param.ppf(getPercentiles(trials))  # extract values from the RV for these percentiles
+        percentiles[i] = getPercentiles(trials)
 
-        if corrMat is None:
-            # Sequence is a special case for which we don't shuffle (and we ignore stratified sampling)
-            if param.param.dataSrc.distroName != 'sequence':
-                np.random.shuffle(values)  # randomize the stratified samples
+        key = _batchKey(param)
+        if key is None:
+            samples[:, i] = param.ppf(percentiles[i])  # may consume random numbers, so call it now
         else:
-            indices = ranks[:, i] - 1  # make them 0-relative
-            values = values[indices]   # reorder to respect correlations
+            deferred.setdefault(key, []).append(i)
+
+        # Sequence is a special case for which we don't shuffle (and we ignore stratified sampling)
+        if corrMat is None and param.param.dataSrc.distroName != 'sequence':
+            # Same random number use as shuffling the values, which we don't have yet
+            shuffles[i] = np.random.permutation(trials)
 
-        samples[:, i] = values
+    for cols in deferred.values():
+        rvs = [paramList[i].getFrozenRV() for i in cols]
+        samples[:, cols] = _batchPpf(rvs, np.array([percentiles[i] for i in cols])).T
+
+    for i in percentiles:
+        if corrMat is None:
+            if i in shuffles:
+                samples[:, i] = samples[shuffles[i], i]     # randomize the stratified samples
+        else:
+            indices = ranks[:, i] - 1                       # make them 0-relative
+            samples[:, i] = samples[indices, i]             # reorder to respect correlations
 
     return DataFrame(samples, columns=columns) if columns else samples
 
+def _batchKey(param):
+    '''
+    Return a key identifying the distributions whose ppf can be evaluated in one call
+    with `param`, or None if `param` isn't based on a standard scipy continuous
+    distribution. (The ppf of these consumes no random numbers.)
+    '''
+    getFrozenRV = getattr(param, 'getFrozenRV', None)
+    rv = getFrozenRV() if getFrozenRV else None
+    dist = getattr(rv, 'dist', None)
+
+    if not (isinstance(dist, stats.rv_continuous) and type(dist).__module__.startswith('scipy.')):
+        return None
+
+    return (type(dist), len(rv.args), tuple(sorted(rv.kwds.keys())))
+
+def _batchPpf(rvs, percentiles):
+    '''
+    Evaluate the ppf of several frozen RVs of the same scipy distribution and
+    argument signature in one call, broadcasting their arguments over the rows
+    of `percentiles`.
+
+    :param rvs: (list of scipy frozen RVs) distributions with a common _batchKey
+    :param percentiles: (numpy.ndarray) one row of percentiles per RV
+    :return: (numpy.ndarray) the values, in the shape of `percentiles`
+    '''
+    first = rvs[0]
+
+    def column(values):
+        return np.array(values, dtype=float).reshape((len(rvs), 1))
+
+    args = [column([rv.args[n] for rv in rvs]) for n in range(len(first.args))]
+    kwds = {name: column([rv.kwds[name] for rv in rvs]) for name in first.kwds}
+
+    return first.dist.ppf(percentiles, *args, **kwds)
+
 def lhsAmend(df, rvList, trials):
     """
     Amend the DataFrame with LHS data by adding columns for the given parameters.
@@ -6,6 +6,7 @@ from lxml import etree as ET
 
 from ..log import getLogger
 from ..XMLFile import XMLFile
+from ..xmlOutput import writeXmlTree
 from .error import PygcamMcsUserError
 
 _logger = getLogger(__name__)
@@ -125,7 +126,7 @@ class XMLConfigFile(XMLFile):
             os.unlink(path)             # we don't want to write through to the src
 
         _logger.debug("XMLConfigFile writing %s", path)
-        self.tree.write(path, xml_declaration=True, pretty_print=True)
+        writeXmlTree(self.tree, path)
 
     def getConfigElement(self, name, group):
         '''
@@ -173,6 +174,25 @@ class XMLConfigFile(XMLFile):
     def updateComponentPathname(self, name, pathname):
         self.updateConfigElement(name, COMPONENTS_GROUP, newValue=pathname)
 
+    def addComponentPathname(self, name, pathname, after=None):
+        '''
+        Add a scenario component with the given name and pathname, replacing any
+        existing component of that name. The new component is placed immediately
+        after the component named `after`, if given, otherwise at the end.
+        '''
+        elt = self.getConfigElement(name, COMPONENTS_GROUP)
+        if elt is not None:
+            elt.getparent().remove(elt)
+
+        prior = self.getConfigElement(after, COMPONENTS_GROUP) if after else None
+        if prior is None:
+            return self.addConfigElement(name, COMPONENTS_GROUP, pathname)
+
+        elt = ET.Element('Value', name=name)
+        elt.text = pathname
+        prior.addnext(elt)
+        return elt
+
     def addConfigElement(self, name, group, value):
         '''
         Append a new element with the given name and value to the given group.
@@ -0,0 +1,107 @@
+# Copyright (c) 2016 Richard Plevin. See the file COPYRIGHT.txt for details.
+'''
+Write GCAM "add-on" XML files holding only the input file elements that are
+modified by a trial, rather than complete copies of the modified files.
+'''
+import os
+from lxml import etree as ET
+
+from ..log import getLogger
+
+_logger = getLogger(__name__)
+
+# Attributes GCAM uses to match elements in add-on files to those read earlier
+_IdentAttrs = ('name', 'year')
+
+def deltaRelativePath(relPath):
+    """
+    Return the pathname of the add-on file holding the trial values for the
+    input file at `relPath`, e.g., "../input/gcamdata/land2.xml" becomes
+    "../input/gcamdata/land2-delta.xml". (Convert this with trialRelativePath
+    to get the location in the trial directory.)
+    """
+    basename, ext = os.path.splitext(relPath)
+    return basename + '-delta' + ext
+
+def _identity(elt):
+    return (elt.tag,) + tuple([elt.get(attr) for attr in _IdentAttrs])
+
+
+class XMLDeltaFile(object):
+    """
+    Represents the add-on file for one input XML file. The add-on holds each
+    modified element with its current value, along with the element's ancestors.
+    Each element carries its original attributes but none of its unmodified
+    children. GCAM reads the add-on after the original file, so the values it
+    holds replace the original values.
+    """
+    def __init__(self, tree, elements):
+        """
+        :param tree: (lxml.etree.ElementTree) the parsed input file
+        :param elements: (list of lxml.etree.Element) the elements of `tree`
+            whose values are set by the trial data.
+        """
+        self.tree = tree
+        self.elements = elements
+
+        identifiable = {}   # memoize results for ancestors shared by many elements
+        self.expressible = all([self._isIdentifiable(elt, identifiable) for elt in elements])
+
+        # The path from the child of the root to each element
+        self.paths = [list(reversed(list(elt.iterancestors())))[1:] + [elt] for elt in elements]
+
+    @staticmethod
+    def _isIdentifiable(elt, memo):
+        """
+        Return True if `elt` and each of its ancestors are the only children of their
+        parents with their tag and identifying attributes. Otherwise, GCAM could not
+        tell which of several like elements an add-on refers to.
+        """
+        for node in [elt] + list(elt.iterancestors()):
+            parent = node.getparent()
+            if parent is None:
+                return True
+
+            result = memo.get(node)
+            if result is None:
+                ident = _identity(node)
+                matches = [sib for sib in parent.iterchildren(node.tag) if _identity(sib) == ident]
+                result = memo[node] = (len(matches) == 1)
+
+            if not result:
+                _logger.debug("Element %s is not uniquely identifiable", node.getroottree().getpath(node))
+                return False
+
+        return True
+
+    def isExpressible(self):
+        """
+        Return True if all the modified elements can be expressed in an add-on file.
+        """
+        return self.expressible
+
+    def getTree(self):
+        """
+        Create the add-on XML tree from the current values of the modified elements.
+
+        :return: (lxml.etree.ElementTree) the add-on tree
+        """
+        root = self.tree.getroot()
+        newRoot = ET.Element(root.tag, attrib=dict(root.attrib))
+        copies = {}
+
+        for path in self.paths:
+            parent = newRoot
+            for node in path:
+                copy = copies.get(node)
+                if copy is None:
+                    copy = copies[node] = ET.SubElement(parent, node.tag, attrib=dict(node.attrib))
+                parent = copy
+
+            parent.text = path[-1].text
+
+        return ET.ElementTree(newRoot)
+
+    def write(self, path):
+        _logger.info("XMLDeltaFile: writing %s", path)
+        self.getTree().write(path, xml_declaration=True, encoding='utf-8')
@@ -10,10 +10,11 @@ import numpy as np
 import os
 import pandas as pd
 
-from ..config import getParam
+from ..config import getParam, getParamAsBoolean
 from ..log import getLogger
 from ..utils import importFromDotSpec
 from ..XMLFile import XMLFile
+from ..xmlOutput import writeXmlTree
 
 from .Database import getDatabase
 from .distro import DistroGen
@@ -21,6 +22,7 @@ from .error import PygcamMcsUserError, PygcamMcsSystemError, DistributionSpecErr
 from .util import mkdirs, loadObjectFromPath
 from .XML import XMLWrapper, findAndSave, getBooleanXML
 from .XMLConfigFile import XMLConfigFile
+from .XMLDeltaFile import XMLDeltaFile, deltaRelativePath
 
 _logger = getLogger(__name__)
 
@@ -507,6 +509,14 @@ class XMLRandomVar(XMLVariable):
         assert dataSrc, 'Called ppf on shared XMLRandomVar (dataSrc is None)'
         return dataSrc.ppf(*args)
 
+    def getFrozenRV(self):
+        """
+        Return the frozen RV whose ppf() underlies ours, or None if there isn't
+        one. Called by LHS to evaluate like distributions together.
+        """
+        dataSrc = self.param.getDataSrc()
+        return getattr(dataSrc, 'rv', None)
+
 class XMLParameter(XMLWrapper):
     """
     Stores information for a single parameter definition, whether a distribution,
@@ -691,6 +701,9 @@ class XMLParameter(XMLWrapper):
         isFactor = dataSrc.isFactor()
         isDelta  = dataSrc.isDelta()
 
+        # All of our variables take their value from the column named for this parameter
+        randomValue = df.at[trialNum, self.getName()]
+
         # Update all elements referenced by our list of XMLVariables (or of their subclass, XMLRandomVar)
         for var in self.vars:
             if var.getElement() is None:    # Skip shared RVs, which don't point to an XML element
@@ -699,9 +712,6 @@ class XMLParameter(XMLWrapper):
 
             originalValue = var.getFloatValue()  # apply factor and delta to cached, original value
 
-            varName = var.getParameter().getName()
-            randomValue = df.ix[trialNum, varName]
-
             newValue = randomValue * originalValue if isFactor else \
                 ((randomValue + originalValue) if isDelta else randomValue)
 
@@ -741,6 +751,8 @@ class XMLRelFile(XMLFile):
 
         self.inputFile = inputFile
         self.relPath = relPath
+        self.deltaFile = None
+        self.canWriteDelta = None     # set by XMLInputFile.usesDeltaFile()
 
         scenarioDir = getSimLocalXmlDir(simId)
         absPath = os.path.abspath(os.path.join(scenarioDir, relPath))
@@ -753,6 +765,19 @@ class XMLRelFile(XMLFile):
     def getAbsPath(self):
         return self.getFilename()
 
+    def getDeltaFile(self):
+        """
+        Return the XMLDeltaFile for the elements of this file that are modified
+        by parameters, creating it on first use.
+        """
+        if self.deltaFile is None:
+            root = self.tree.getroot()
+            elements = [var.getElement() for param in XMLParameter.getInstances() for var in param.getVars()
+                        if var.getElement() is not None and var.getElement().getroottree().getroot() is root]
+            self.deltaFile = XMLDeltaFile(self.tree, elements)
+
+        return self.deltaFile
+
     def saveSomewhere(self):
         # Save the modified file somewhere for each trial. Maybe in trial-xml?
         pass
@@ -816,6 +841,50 @@ class XMLInputFile(XMLWrapper):
 
         self.writeFuncs[funcRef] = fn
 
+    def usesDeltaXml(self):
+        """
+        Return True if trial values for this input file are written to a small
+        add-on file (see XMLDeltaFile) rather than to a copy of the whole file.
+        This requires that the file is a scenario component in the config file
+        and that no WriteFunc or trial function can modify the file arbitrarily.
+        N.B. This must return the same value when gensim writes the config files
+        and when workers write the trial files.
+        """
+        if not getParamAsBoolean('MCS.DeltaXml') or self.writeFuncs:
+            return False
+
+        if self.getComponentName().lower().endswith('.xml'):
+            return False
+
+        return not any([param.dataSrc.isTrialFunc() for param in self.parameters.values()])
+
+    def usesDeltaFile(self, xmlFile):
+        """
+        Return True if trial values for `xmlFile` are written to an add-on file,
+        i.e., if :py:meth:`usesDeltaXml` is True and the elements modified by our
+        parameters are identifiable in an add-on file (see XMLDeltaFile). Otherwise,
+        the config refers to a full copy of the modified file, which replaces the
+        original, since GCAM would apply the list elements of a full copy twice.
+        The elements are found by running the queries, which gives the same result
+        when gensim writes the config files and when workers write the trial files.
+        """
+        if not self.usesDeltaXml():
+            return False
+
+        if xmlFile.canWriteDelta is None:
+            tree = xmlFile.getTree()
+            elements = []
+            for param in self.parameters.values():
+                if param.isActive() and param.query:
+                    elements.extend(param.query.runQuery(tree))
+
+            xmlFile.canWriteDelta = XMLDeltaFile(tree, elements).isExpressible()
+            if not xmlFile.canWriteDelta:
+                _logger.info("Modified elements of %s are not uniquely identifiable; using a full copy",
+                             xmlFile.getRelPath())
+
+        return xmlFile.canWriteDelta
+
     def findAndSaveParams(self, element):
        findAndSave(element, PARAM_ELT_NAME, XMLParameter, self.parameters,
                    testFunc=XMLParameter.isActive, parent=self)
@@ -877,8 +946,13 @@ class XMLInputFile(XMLWrapper):
             # TBD: some parameter(s) modify the file for this component, in all cases.
             # TBD: This new path has to be coordinated between config file and actual file.
             if writeConfigFiles and not isXML:
-                trialRelPath = trialRelativePath(relPath, '../..')
-                configFile.updateComponentPathname(compName, trialRelPath)
+                if self.usesDeltaFile(self.xmlFileMap[relPath]):
+                    # Read the original file, followed by the trial's add-on file
+                    deltaPath = trialRelativePath(deltaRelativePath(relPath), '../..')
+                    configFile.addComponentPathname(compName + '-delta', deltaPath, after=compName)
+                else:
+                    trialRelPath = trialRelativePath(relPath, '../..')
+                    configFile.updateComponentPathname(compName, trialRelPath)
 
     def runQueries(self):
         """
@@ -982,12 +1056,19 @@ class XMLParameterFile(XMLFile):
 
     def writeLocalXmlFiles(self, trialDir):
         """
-        Write copies of all modified XML files
+        Write copies of all modified XML files, or for input files that use
+        add-on files, only the modified elements. (See XMLInputFile.usesDeltaFile.)
         """
         xmlFiles = XMLInputFile.getModifiedXMLFiles()
 
         for xmlFile in xmlFiles:
+            inputFile = xmlFile.inputFile
+            useDelta = inputFile.usesDeltaFile(xmlFile)
+
             exeRelPath = xmlFile.getRelPath()
+            if useDelta:
+                exeRelPath = deltaRelativePath(exeRelPath)
+
             absPath = trialRelativePath(exeRelPath, trialDir)
 
             # Ensure that directories down to basename exist
@@ -996,7 +1077,6 @@ class XMLParameterFile(XMLFile):
 
             # TBD: Might be cleaner to call file func on .xml file rather than on tree
             # Call per-InputFile functions, if defined.
-            inputFile = xmlFile.inputFile
             inputFile.callFileFunctions(xmlFile, trialDir)
 
             if os.path.exists(absPath):
@@ -1004,14 +1084,105 @@ class XMLParameterFile(XMLFile):
                 _logger.debug("Removing %s", absPath)
                 os.unlink(absPath)
 
-            _logger.info("XMLParameterFile: writing %s", absPath)
-            xmlFile.tree.write(absPath, xml_declaration=True, pretty_print=True)
+            if useDelta:
+                xmlFile.getDeltaFile().write(absPath)
+            else:
+                _logger.info("XMLParameterFile: writing %s", absPath)
+                writeXmlTree(xmlFile.tree, absPath)
 
     def dump(self):
         print("Parameter file: %s" % self.getFilename())
         for obj in self.inputFiles.values():
             obj.dump()
 
+def _mtime(path):
+    return os.stat(path).st_mtime
+
+class ResidentParameterModel(object):
+    """
+    Keeps a parameter file, the input XML files it modifies, and the elements
+    selected by each parameter's query resident in a worker process, so that an
+    engine running many trials reads and queries these only once. This works
+    because each trial's values are computed from the elements' original values,
+    so the same trees can be updated for every trial. Models whose parameters use
+    trial functions or whose input files use write functions are rebuilt for each
+    trial, since these functions can modify the trees arbitrarily.
+    """
+    current = None
+
+    # Class attributes holding the state that decache() discards between trials
+    stateAttrs = ((XMLCorrelation, 'instances'),
+                  (XMLDataFile,    'cache'),
+                  (XMLRandomVar,   'instances'),
+                  (XMLParameter,   'instances'),
+                  (XMLInputFile,   'xmlFileMap'))
+
+    def __init__(self, key, paramFile):
+        self.key = key
+        self.paramFile = paramFile
+        self.state = [(cls, attr, getattr(cls, attr)) for cls, attr in self.stateAttrs]
+
+        paths = [xmlFile.getAbsPath() for xmlFile in XMLInputFile.getModifiedXMLFiles()]
+        self.stamps = [(path, _mtime(path)) for path in paths]
+
+    @classmethod
+    def decache(cls):
+        cls.current = None
+
+    def isValid(self, key):
+        """
+        Return True if the model was built for `key` and none of the
+        input XML files has been modified since they were read.
+        """
+        try:
+            return key == self.key and all([_mtime(path) == mtime for path, mtime in self.stamps])
+        except OSError:
+            return False
+
+    def restore(self):
+        for cls, attr, value in self.state:
+            setattr(cls, attr, value)
+
+    @staticmethod
+    def isReusable(paramFile):
+        if any([inputFile.writeFuncs for inputFile in paramFile.inputFiles.values()]):
+            return False
+
+        return not any([param.dataSrc.isTrialFunc() for param in XMLParameter.getInstances()])
+
+    @classmethod
+    def getParameterFile(cls, paramPath, context, scenarioNames):
+        """
+        Return an XMLParameterFile for `paramPath` with its input files loaded and
+        queries run, reusing the one built for an earlier trial if it is still valid.
+        This assumes that decache() has been called since any other use of the
+        parameter classes.
+
+        :param paramPath: (str) pathname of the parameters file
+        :param context: (Context) the trial's context
+        :param scenarioNames: (list of str) the scenarios whose input files are modified
+        :return: (XMLParameterFile) the parameter file
+        """
+        key = (os.path.realpath(paramPath), _mtime(paramPath), context.simId,
+               context.groupName, tuple(scenarioNames))
+
+        model = cls.current
+        if model and model.isValid(key):
+            _logger.debug("Reusing resident parameter model for %s", paramPath)
+            model.restore()
+            return model.paramFile
+
+        cls.current = None
+
+        paramFile = XMLParameterFile(paramPath)
+        paramFile.loadInputFiles(context, scenarioNames, writeConfigFiles=False)
+        paramFile.runQueries()
+
+        if getParamAsBoolean('MCS.ResidentParameters') and cls.isReusable(paramFile):
+            cls.current = cls(key, paramFile)
+
+        return paramFile
+
 def decache():
     '''
     Clear all instance caches so a new run can begin cleanly
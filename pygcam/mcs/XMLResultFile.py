@@ -3,11 +3,12 @@
 # Copyright (c) 2015-2017. The Regents of the University of California (Regents).
 # See the file COPYRIGHT.txt for details.
 import os
-from collections import OrderedDict, defaultdict
+from collections import OrderedDict
 from datetime import datetime
 
 import pandas as pd
 
+from ..cache import getCache
 from ..config import getParam
 from ..log import getLogger
 from ..XMLFile import XMLFile
@@ -240,10 +241,16 @@ class QueryResult(object):
         are comma-delimited, and strings with spaces are double-quoted. Assume units are
         the same as in the first row of data.
         '''
+        from ..query import readColumnar
+
         _logger.debug("readCSV: reading %s", self.filename)
         with open(self.filename) as f:
             self.title  = f.readline().strip()
-            self.df = pd.read_table(f, sep=',', header=0, index_col=False, quoting=0)
+
+            # Use the columnar copy of the data, if available
+            self.df = readColumnar(self.filename)
+            if self.df is None:
+                self.df = pd.read_table(f, sep=',', header=0, index_col=False, quoting=0)
 
         df = self.df
 
@@ -268,14 +275,15 @@ class QueryResult(object):
     def getData(self):
         return self.df
 
-# A single result DF can have data for multiple outputs, so we cache the files
-outputCache = defaultdict(lambda: None)
+# A single result DF can have data for multiple outputs, so we cache the files.
+# The cache is bounded by MCS.ResultCacheSizeMB so long-running engines don't grow.
+outputCache = getCache('mcsResults', sizeParam='MCS.ResultCacheSizeMB')
 
 def getCachedFile(csvPath, loader=QueryResult, desc="query result"):
-    result = outputCache[csvPath]
+    result = outputCache.get(csvPath)
     if not result:
         try:
-            outputCache[csvPath] = result = loader(csvPath)
+            result = outputCache.put(csvPath, loader(csvPath))
         except Exception as e:
             _logger.warning('saveResults: Failed to read {}: {}'.format(desc, e))
             raise FileMissingError(csvPath)
@@ -288,6 +296,7 @@ def getOutputDir(trialDir, scenario, type):
 
 
 def extractResult(context, scenario, outputDef, type):
+    from ..query import sumYearColumns
     from .util import activeYears, YEAR_COL_PREFIX
 
     _logger.debug("Extracting result for {}, name={}".format(context, outputDef.name))
@@ -335,17 +344,15 @@ def extractResult(context, scenario, outputDef, type):
     active = activeYears()
     if isScalar:
         if outputDef.cumulative:
-            total = selected[active].sum(axis=1)
-            value = float(total.sum() if isinstance(total, pd.Series) else total)
+            value = float(sumYearColumns(selected, yearCols=active).sum())
         else:
             colName = outputDef.columnName()
             value = selected[colName].sum()     # works for single or multiple rows
     else:
         # When no column name is specified, assume this is a time-series result, so save all years.
-        # Use sum() to collapse values to a single time series; for a single row it helpfully
-        # converts the 1-element series to a simple float.
-        yearCols = [YEAR_COL_PREFIX + y for y in active]
-        value = {colName: selected[yearStr].sum() for colName, yearStr in zip(yearCols, active)}
+        # Sum all rows to collapse values to a single time series.
+        totals = sumYearColumns(selected, yearCols=active)
+        value = {YEAR_COL_PREFIX + yearStr: totals[yearStr] for yearStr in active}
 
     if outputDef.percentage:
         # Recursively read the baseline scenario result so we can compute % change
@@ -392,36 +399,12 @@ def saveResults(context, resultList):
     '''
     from .Database import getDatabase
 
-    runId = context.runId
-
     db = getDatabase()
-    session = db.Session()
-
-    # Delete any stale results for this runId (i.e., if re-running a given runId)
-    names = [resultDict['paramName'] for resultDict in resultList]
-    ids = db.getOutputIds(names)
-    db.deleteRunResults(runId, outputIds=ids, session=session)
-    db.commitWithRetry(session)
 
-    for resultDict in resultList:
-        paramName  = resultDict['paramName']
-        value      = resultDict['value']
-        regionName = resultDict['regionName']
-        regionId = db.getRegionId(regionName)
-
-        # Save the values to the database
-        try:
-            if resultDict['isScalar']:
-                db.setOutValue(runId, paramName, value, session=session)  # TBD: need regionId?
-            else:
-                units = resultDict['units']
-                db.saveTimeSeries(runId, regionId, paramName, value, units=units, session=session)
-
-        except Exception as e:
-            session.rollback()
-            db.endSession(session)
-            # TBD: distinguish database save errors from data access errors?
-            raise PygcamMcsSystemError("saveResults failed: %s" % e)
+    # Replaces any stale results for this runId (i.e., if re-running a given runId)
+    try:
+        db.saveRunResults([(context.runId, resultList)])
 
-    db.commitWithRetry(session)
-    db.endSession(session)
+    except Exception as e:
+        # TBD: distinguish database save errors from data access errors?
+        raise PygcamMcsSystemError("saveResults failed: %s" % e)
@@ -1,5 +1,6 @@
 # Copyright (c) 2012-2015. The Regents of the University of California (Regents)
 # and Richard Plevin. See the file COPYRIGHT.txt for details.
+from collections import OrderedDict
 import os
 import numpy as np
 from pygcam.matplotlibFix import plt
@@ -455,25 +456,21 @@ def plotOutputDistribution(simId, expName, resultSeries, resultName, xlabel, tri
 
 # TBD: If row/col are obsolete, this info can now be read from trialData.csv or data.sa
 def readParameterValues(simId, trials):
-    def makeKey(paramName, row, col):
-        return paramName
-        #return "%s[%d][%d]" % (paramName, row, col) if row or col else paramName
-
     db = getDatabase()
 
     paramTuples = db.getParameters()        # Returns paramName, row, col
-    paramNames  = [makeKey(*tup) for tup in paramTuples]   # names like "foo[1][14]"
-    inputDF     = pd.DataFrame(index=xrange(trials), columns=paramNames, dtype=float)
+    paramNames  = list(OrderedDict.fromkeys([tup[0] for tup in paramTuples]))
     _logger.debug("Found %d distinct parameter names" % len(paramNames))
 
-    paramValues = db.getParameterValues(simId, asDataFrame=False)
-    numParams = len(paramValues)
-    _logger.info('%d parameter values read' % numParams)
+    inputDF = db.getParameterMatrix(simId, program='gcam')
+    if inputDF is None:
+        inputDF = pd.DataFrame(columns=paramNames, dtype=float)
 
-    for row, col, value, trialNum, pname in paramValues:
-        key = makeKey(pname, row, col)
-        inputDF[key][trialNum] = value
+    _logger.info('%d parameter values read' % inputDF.count().sum())
 
+    inputDF = inputDF.reindex(index=xrange(trials), columns=paramNames)
+    inputDF.index.name = None
+    inputDF.columns.name = None
     return inputDF
 
 def _fixColname(name):
@@ -8,10 +8,11 @@ from .explore_plugin import ExploreCommand
 from .gensim_plugin import GensimCommand
 from .ippsetup_plugin import IppSetupCommand
 from .iterate_plugin import IterateCommand
+from .migrate_plugin import MigrateCommand
 from .parallelPlot_plugin import ParallelPlotCommand
 from .runsim_plugin import RunSimCommand
 
 MCSBuiltins = [AddExpCommand, AnalyzeCommand, ClusterCommand,
                DiscreteCommand, GensimCommand, DelSimCommand,
                EngineCommand, ExploreCommand, IppSetupCommand,
-               IterateCommand, ParallelPlotCommand, RunSimCommand]
+               IterateCommand, MigrateCommand, ParallelPlotCommand, RunSimCommand]
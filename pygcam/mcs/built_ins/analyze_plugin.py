@@ -40,8 +40,8 @@ def driver(args, tool):
         plotDir  = getParam('MCS.PlotDir')
         plotType = getParam('MCS.PlotType')
 
-        allResults = db.getTimeSeries(simId, resultName, expList) # , regionName)
-        if not allResults:
+        resultDF = db.getTimeSeriesDF(simId, resultName, expList) # , regionName)
+        if resultDF is None:
             raise PygcamMcsUserError('No timeseries results for simId=%d, expList=%s, resultName=%s' \
                                      % (simId, expList, resultName))
 
@@ -50,17 +50,8 @@ def driver(args, tool):
             filename = os.path.join(plotDir, 's%d' % simId, basename)
             return filename
 
-        # massage the data into the format required by plotTimeSeries
-        def createRecord(pair):
-            obj, expName = pair
-            d = obj.__dict__
-            d['expName'] = expName
-            return d
-
-        records = [createRecord(pair) for pair in allResults]
-        resultDF = pd.DataFrame.from_records(records, index='seriesId')
         units = resultDF.units.iloc[0]
-        resultDF.drop(['units', '_sa_instance_state', 'outputId'], axis=1, inplace=True)
+        resultDF.drop(['units'], axis=1, inplace=True)
 
         # convert column names like 'y2020' to '2020'
         cols = [stripYearPrefix(c) for c in resultDF.columns]
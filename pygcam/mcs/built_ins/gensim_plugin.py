@@ -129,34 +129,22 @@ def genTrialData(simId, trials, paramFileObj, args):
 
 def saveTrialData(df, simId, start=0):
     """
-    Save the trial data in `df` to the SQL database, for the given simId.
+    Save the trial data in `df` to the SQL database, for the given simId,
+    and to the binary trial matrix read by workers.
     """
     from ..Database import getDatabase
+    from ..trialMatrix import TrialMatrix
     from ..XMLParameterFile import XMLRandomVar
-    from six.moves import xrange
+
+    TrialMatrix.write(simId, df, start=start)
 
     trials = df.shape[0]
 
-    # Delete all Trial entries for this simId and this range of trialNums
     db = getDatabase()
 
-    paramValues = []
-
-    for trial in xrange(trials):
-        trialNum = trial + start
-
-        # Save all RV values to the database
-        instances = XMLRandomVar.getInstances()
-        for var in instances:
-            varNum = var.getVarNum()
-            param = var.getParameter()
-            pname = param.getName()
-            value = df[pname][trial]
-            paramId = db.getParamId(pname)
-            paramValues.append((trialNum, paramId, value, varNum))
-
-    # Write the tuples (simId, trialNum, paramId, value) to the database
-    db.saveParameterValues(simId, paramValues)
+    # Save all RV values to the database in one bulk operation
+    columns = [(var.getParameter().getName(), var.getVarNum()) for var in XMLRandomVar.getInstances()]
+    db.saveParameterMatrix(simId, df, columns, start=start)
 
     # SALib methods may not create exactly the number of trials requested
     # so we update the database to set the record straight.
@@ -0,0 +1,42 @@
+# Copyright (c) 2016  Richard Plevin
+# See the https://opensource.org/licenses/MIT for license details.
+
+from pygcam.log import getLogger
+from .McsSubcommandABC import McsSubcommandABC
+
+_logger = getLogger(__name__)
+
+def driver(args, tool):
+    '''
+    Bring an existing database up to the current schema, in place.
+    '''
+    from ..Database import getDatabase
+
+    db = getDatabase()
+
+    created = db.migrateSchema()
+    _logger.info("Created %d tables and indexes: %s", len(created), ', '.join(created) or 'none')
+
+    if args.longTimeSeries:
+        count = db.copyTimeSeriesToLong()
+        _logger.info("Copied %d year columns to the long-format timeseries table", count)
+
+
+class MigrateCommand(McsSubcommandABC):
+    def __init__(self, subparsers):
+        kwargs = {'help' : '''Update a database created by an earlier version of pygcam to the 
+            current schema, in place, by adding any missing tables and indexes.'''}
+        super(MigrateCommand, self).__init__('migrate', subparsers, kwargs)
+
+    def addArgs(self, parser):
+        parser.add_argument('-l', '--longTimeSeries', action='store_true', default=False,
+                            help='''Copy existing time-series results from the year columns of 
+                            table "timeseries" to the long-format table "timeseriesvalue". Do this
+                            before setting config variable MCS.LongTimeSeries to True for an 
+                            existing database.''')
+
+        return parser   # for auto-doc generation
+
+
+    def run(self, args, tool):
+        driver(args, tool)
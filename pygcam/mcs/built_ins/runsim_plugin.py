@@ -12,9 +12,10 @@ def driver(args, tool):
     from pygcam.project import Project
     from ..master import Master, pidFileExists, startCluster, getTrialsToRedo
     from ..Database import getDatabase
+    from ..executor import LOCAL
     from ..util import parseTrialString
 
-    if not (args.runLocal or args.redoListOnly):
+    if not (args.runLocal or args.redoListOnly or args.executor == LOCAL):
         # If the pid file doesn't exist, we assume the cluster is
         # not running and we run it with the given profile and
         # cluster ID, relying on the config file for other parameters.
@@ -66,6 +67,7 @@ class RunSimCommand(McsSubcommandABC):
     def addArgs(self, parser):
         from pygcam.config import getParam, getParamAsInt, getParamAsFloat
         from pygcam.utils import ParseCommaList
+        from ..executor import EXECUTORS
 
         defaultProfile    = getParam('IPP.Profile')
         defaultClusterId  = getParam('IPP.ClusterId')
@@ -73,6 +75,8 @@ class RunSimCommand(McsSubcommandABC):
         defaultMaxEngines = getParamAsInt('IPP.MaxEngines')
         defaultMinutes    = getParamAsFloat('IPP.MinutesPerRun')
         defaultWaitSecs   = getParamAsFloat('IPP.ResultLoopWaitSecs')
+        defaultExecutor   = getParam('MCS.Executor')
+        defaultLocalWorkers = getParam('MCS.LocalWorkers')
 
         # TBD: document this variable
         defaultScenario = getParam('MCS.DefaultScenario', raiseError=False)
@@ -169,6 +173,17 @@ class RunSimCommand(McsSubcommandABC):
                              ranges of trial numbers to run. Ex: 1,4,6-10,3. Default is to run all 
                              defined trials.''')
 
+        parser.add_argument('-W', '--localWorkers', type=int, default=None,
+                            help='''The number of trials to run at once with "--executor local". 
+                            Overrides config var MCS.LocalWorkers, currently %s. (0 means 
+                            one per CPU.)''' % defaultLocalWorkers)
+
+        parser.add_argument('-x', '--executor', choices=EXECUTORS, default=defaultExecutor,
+                            help='''How to run trials: "ipyparallel" runs them on a cluster of 
+                            ipyparallel engines, started if needed; "local" runs them in a pool 
+                            of processes on this host, so no cluster is needed. Overrides config 
+                            var MCS.Executor, currently "%s".''' % defaultExecutor)
+
         parser.add_argument('-w', '--waitSecs', type=int, default=defaultWaitSecs,
                             help='''How many seconds to wait between queries to the ipyparallel
                             controller for completed jobs. Default is %d.''' % defaultWaitSecs)
@@ -0,0 +1,158 @@
+'''
+.. Executors run worker.runTrial on behalf of the Master, either on
+   ipyparallel engines or in a pool of processes on the local host.
+
+.. Copyright (c) 2016  Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import itertools
+import threading
+
+from ..log import getLogger
+
+_logger = getLogger(__name__)
+
+# Values for config variable MCS.Executor
+IPYPARALLEL = 'ipyparallel'
+LOCAL = 'local'
+
+EXECUTORS = (IPYPARALLEL, LOCAL)
+
+class TrialExecutor(object):
+    """
+    Interface between the Master and the mechanism used to run trials.
+    The task handle returned by :py:meth:`submit` provides the subset of
+    the interface of ipyparallel's AsyncResult used by the Master: a list
+    of task ids in `msg_ids`, a method ``add_done_callback(func)``, and a
+    method ``get()`` that returns a list holding the task's value.
+    """
+    name = None
+
+    def submit(self, func, context, argDict, after=None):
+        """
+        Run ``func(context, argDict)``.
+
+        :param func: (callable) a module-level function, i.e., worker.runTrial
+        :param context: (Context) the trial to run
+        :param argDict: (dict) arguments passed to `func`
+        :param after: (task handle) if not None, a task that must complete
+            before this one starts, e.g., the baseline for a policy trial
+        :return: a task handle
+        """
+        raise NotImplementedError('Subclass of TrialExecutor must implement submit()')
+
+    def shutdown(self):
+        pass
+
+
+class IppExecutor(TrialExecutor):
+    """
+    Runs trials on ipyparallel engines using a load-balanced view.
+    """
+    name = IPYPARALLEL
+
+    def __init__(self, client):
+        self.view = client.load_balanced_view(retries=2)
+
+    def submit(self, func, context, argDict, after=None):
+        view = self.view
+
+        if after is None:
+            return view.map_async(func, [context], [argDict])
+
+        # Create a dependency on the task that we've already submitted
+        with view.temp_flags(after=after):
+            return view.map_async(func, [context], [argDict])
+
+
+class LocalTask(object):
+    """
+    Handle for a task run by a LocalExecutor, with the subset of the
+    AsyncResult interface used by the Master.
+    """
+    _ids = itertools.count()
+
+    def __init__(self, context):
+        self.msg_ids = ['local-%d' % next(self._ids)]
+        self.context = context
+        self.value = None
+        self.errorMsg = None
+        self.done = False
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    def ready(self):
+        return self.done
+
+    def add_done_callback(self, func):
+        with self.lock:
+            if not self.done:
+                self.callbacks.append(func)
+                return
+
+        func(self)
+
+    def get(self):
+        if self.errorMsg:
+            raise RuntimeError(self.errorMsg)
+
+        return [self.value]
+
+    def finish(self, pair):
+        # Called in the pool's result-handler thread with the value returned by _runTask
+        self.value, self.errorMsg = pair
+
+        with self.lock:
+            self.done = True
+            callbacks, self.callbacks = self.callbacks, []
+
+        for func in callbacks:
+            func(self)
+
+
+def _runTask(func, context, argDict):
+    # Exceptions raised in a pool process may not survive the trip back to
+    # the master, so we return the error message instead.
+    try:
+        return (func(context, argDict), None)
+
+    except Exception as e:
+        return (None, '%s: %s' % (type(e).__name__, e))
+
+
+class LocalExecutor(TrialExecutor):
+    """
+    Runs trials in a pool of processes on the local host, so no ipyparallel
+    controller or engines are needed. A task submitted with `after` is given
+    to the pool only when that task completes, and is failed without being
+    run if that task failed, as with ipyparallel's `after` dependencies.
+    """
+    name = LOCAL
+
+    def __init__(self, numWorkers):
+        from multiprocessing import Pool
+        from ..utils import _initPoolWorker, _poolArgs
+
+        _logger.info("Starting pool of %d local workers", numWorkers)
+        self.pool = Pool(numWorkers, initializer=_initPoolWorker, initargs=_poolArgs())
+
+    def submit(self, func, context, argDict, after=None):
+        task = LocalTask(context)
+
+        def start(prior=None):
+            if prior is not None and prior.errorMsg:
+                task.finish((None, 'Not run: task %s failed: %s' % (prior.msg_ids[0], prior.errorMsg)))
+                return
+
+            self.pool.apply_async(_runTask, (func, context, argDict), callback=task.finish)
+
+        if after is None:
+            start()
+        else:
+            after.add_done_callback(start)
+
+        return task
+
+    def shutdown(self):
+        self.pool.close()
+        self.pool.join()
@@ -12,6 +12,7 @@ import plotly.graph_objs as go
 import plotly.tools as tools
 from scipy import stats
 
+from pygcam.cache import getCache
 from pygcam.log import getLogger
 from pygcam.mcs.analysis import getCorrDF
 from pygcam.config import getConfig, DEFAULT_SECTION, getParam, setParam, setSection, getSections
@@ -40,23 +41,26 @@ def sliderLabel(value):
     return {'label': str(value),
             'style': {'font-size': 10, 'font-family': 'Lato'}}
 
+# Shared by all @cached methods; bounded by MCS.ExplorerCacheSizeMB
+_explorerCache = getCache('explorer', sizeParam='MCS.ExplorerCacheSizeMB')
+
 def cached(func):
     """
     Simple decorator to cache results keyed on method args plus project name.
     Note that this is not general purpose, but specialized for the McsData class.
     """
-    cache = {}
+    _missing = object()
 
     #@wraps  # keeps the name and doc string of wrapped function intact
     def wrapper(*args, **kwargs):
         self = args[0]
         key = (func.__name__, self.project, args[1:])
 
-        try:
-            return cache[key]
-        except KeyError:
-            cache[key] = result = func(*args, **kwargs)
-            return result
+        result = _explorerCache.get(key, _missing)
+        if result is _missing:
+            result = _explorerCache.put(key, func(*args, **kwargs))
+
+        return result
 
     return wrapper
 
@@ -10,22 +10,26 @@
 #
 from __future__ import division, print_function
 import copy
-from six import iteritems
+from six import iteritems, MAXSIZE
+from six.moves.queue import Queue, Empty
 import os
 import stat
 import sys
-from time import sleep
+from time import sleep, time
 from IPython.paths import locate_profile
 
 import ipyparallel as ipp
 from ipyparallel.apps.ipclusterapp import ALREADY_STARTED, ALREADY_STOPPED, NO_CLUSTER
 
 from .context import Context
-from .Database import RUN_NEW, RUN_RUNNING, RUN_SUCCEEDED, RUN_QUEUED, RUN_KILLED, ENG_TERMINATE, getDatabase
+from .Database import (RUN_NEW, RUN_RUNNING, RUN_SUCCEEDED, RUN_QUEUED, RUN_KILLED, RUN_ABORTED,
+                       ENG_TERMINATE, getDatabase)
 from .error import IpyparallelError, PygcamMcsSystemError, PygcamMcsUserError
+from .executor import IppExecutor, LocalExecutor, LOCAL
 from .util import parseTrialString, createTrialString
 from ..config import getParam, getParamAsInt
 from ..log import getLogger
+from ..utils import getNumWorkers
 
 # Exit values for Master.processTrials()
 CONTINUE = 1
@@ -109,7 +113,10 @@ class Master(object):
         self.args = args
         self.db = getDatabase(checkInit=False)
         self.client = None
+        self.executor = None
         self.finished = False
+        self.pending = None
+        self.completed = None
 
         projectName = args.projectName
 
@@ -312,9 +319,12 @@ class Master(object):
 
     def resubmit(self, task, context):
         _logger.info('Resubmitting task %s', context)
-        self.client.resubmit(task)
+        ar = self.client.resubmit(task)
         self.setRunStatus(context, RUN_QUEUED)
 
+        if self.pending is not None:
+            self.watch(ar)
+
     def getResults(self, tasks):
         if not tasks:
             return None
@@ -373,43 +383,29 @@ class Master(object):
         session = db.Session()
 
         try:
-            # Delete all old values in first transaction
-            for result in results:
-                context = result.context
-                resultsList = result.resultsList
-
-                if resultsList:
-                    # Delete any stale results for this runId (i.e., if re-running a given runId)
-                    names = [resultDict['paramName'] for resultDict in resultsList]
-                    ids = db.getOutputIds(names)
-                    db.deleteRunResults(context.runId, outputIds=ids, session=session)
-
-            db.commitWithRetry(session)
-
-            # Add all new values in a second transaction
+            runResults = []
             for result in results:
                 context = result.context
-                resultsList = result.resultsList or []
-                runId   = context.runId
-
                 self.setRunStatus(context, session=session)
 
-                if context.status != RUN_SUCCEEDED:
-                    continue
+                telemetry = getattr(result, 'telemetry', None)
+                if telemetry:
+                    db.saveSolverTelemetry(context.runId, telemetry, session=session)
 
-                for resultDict in resultsList:
-                    paramName  = resultDict['paramName']
-                    value      = resultDict['value']
-                    regionName = resultDict['regionName']
+                resultsList = result.resultsList
+                if not resultsList:
+                    continue
 
-                    # Save the values to the database
-                    if resultDict['isScalar']:
-                        db.setOutValue(runId, paramName, value, session=session)
-                    else:
-                        regionId = db.getRegionId(regionName)   # cached; not a DB query
-                        units = resultDict['units']
-                        db.saveTimeSeries(runId, regionId, paramName, value, units=units, session=session)
+                if context.status == RUN_SUCCEEDED:
+                    runResults.append((context.runId, resultsList))
+                else:
+                    # Don't leave results from an earlier run of this runId looking current
+                    ids = db.getOutputIds([resultDict['paramName'] for resultDict in resultsList])
+                    db.deleteRunResults(context.runId, outputIds=ids, session=session)
 
+            # Replace any stale results (i.e., if re-running a given runId) and save
+            # the new ones for the whole batch with set-based deletes and inserts.
+            db.saveRunResults(runResults, session=session)
             db.commitWithRetry(session)
 
         except Exception as e:
@@ -449,7 +445,10 @@ class Master(object):
 
     def run(self):
         """
-        Run the main wait-and-process loop on `ars`, a list of async result instances.
+        Submit the trials and then process results as tasks complete. Each task's
+        completion is signaled by a callback from ipyparallel, so results are saved
+        as soon as they are available rather than on the next polling pass. Checks
+        on engines, run status, and queue totals are performed every `waitSecs`.
         Takes parameters from arguments passed from runsim plugin.
 
         :return: none
@@ -464,77 +463,158 @@ class Master(object):
             listTrialsToRedo(self.db, args.simId, args.scenarios, args.statuses)
             return
 
+        if getattr(args, 'executor', None) == LOCAL:
+            self.runPool()
+            return
+
         self.waitForWorkers()    # wait for engines to spin up
+        self.executor = IppExecutor(self.client)
 
         shutdownWhenIdle = not args.dontShutdownWhenIdle
 
-        ars = self.runTrials()
+        self.completed = Queue()    # AsyncResults of completed tasks, posted by _taskDone
+        self.pending = {}           # AsyncResults of tasks not yet completed, keyed by msg_id
 
-        pending = self.client.outstanding
+        for ar in self.runTrials():
+            self.watch(ar)
 
+        waitSecs = args.waitSecs
+        lastCheck = 0
         counter = 0         # for occasionally displaying queue status
 
-        while pending:
+        while self.pending:
+            # Wait for a task to complete, then collect any others that completed meanwhile
+            done = []
+            try:
+                done.append(self.completed.get(timeout=waitSecs))
+                while True:
+                    done.append(self.completed.get_nowait())
+            except Empty:
+                pass
+
+            if done:
+                self.processCompleted(done)
+
+                if shutdownWhenIdle:
+                    self.shutdownIdleEngines()
+
+            if time() - lastCheck < waitSecs:
+                continue
 
             if not self.checkEngines():
                 return
 
-            state = 'nominal'   # set to 'completed' when some are completed, to set shorter sleep
-
-            # check for status updates
-            for ar in ars:
+            # check for status updates published by running tasks
+            for ar in list(self.pending.values()):
                 data = ar.data[0]
                 if data:
                     context = data.get('context')
                     if context:
                         self.setRunStatus(context)
 
-            # finished is the set of msg_ids that are complete
-            finished = pending.difference(self.client.outstanding)
+            if counter % 5 == 0:
+                _logger.info("%d engines: %s", len(self.client.ids), self.queueTotals())
+
+            # handle the case of initial over-allocation
+            if counter == 0 and shutdownWhenIdle:
+                self.shutdownIdleEngines()
 
-            # update pending to exclude those that finished
-            pending = pending.difference(finished)
+            counter += 1
+            lastCheck = time()
 
-            if finished:
-                state = 'completed'
-                _logger.debug('%d completed tasks', len(finished))
+        _logger.info("Shutting down hub")
+        self.client.shutdown(hub=True, block=True)
+
+    def runPool(self):
+        """
+        Run the trials in a pool of processes on this host, rather than on
+        ipyparallel engines, saving results as tasks complete. Policy trials
+        start only after the corresponding baseline trial completes.
+
+        :return: none
+        """
+        args = self.args
+        numWorkers = getNumWorkers(getattr(args, 'localWorkers', None), 'MCS.LocalWorkers', MAXSIZE)
+        self.executor = LocalExecutor(numWorkers)
+
+        self.completed = Queue()    # tasks completed, posted by _taskDone
+        self.pending = {}           # tasks not yet completed, keyed by task id
+
+        try:
+            for task in self.runTrials():
+                self.watch(task)
+
+            while self.pending:
+                done = []
+                try:
+                    done.append(self.completed.get(timeout=args.waitSecs))
+                    while True:
+                        done.append(self.completed.get_nowait())
+                except Empty:
+                    pass
+
+                if not done:
+                    continue
+
+                results = []
+                for task in done:
+                    for msgId in task.msg_ids:
+                        self.pending.pop(msgId, None)
+
+                    try:
+                        workerResult = task.get()[0]
+
+                    except Exception as e:
+                        _logger.error('Trial %s failed: %s', task.context, e)
+                        self.setRunStatus(task.context, RUN_ABORTED)
+                        continue
+
+                    context = workerResult.context
+                    if context.status == ENG_TERMINATE:
+                        # With a single allocation, no other worker has more time left
+                        _logger.warning('Trial %s not run: insufficient time remaining', context)
+                        self.setRunStatus(context, RUN_NEW)
+                    else:
+                        results.append(workerResult)
 
-                results = self.getResults(finished)
                 if results:
                     self.saveResults(results)
-                else:
-                    _logger.warning('Purging %d completed tasks with no results (engine died?)', len(finished))
-                    self.client.purge_results(jobs=finished)
 
-                # drop finished tasks from list to avoid checking status needlessly
-                toDelete = []
-                for ar in ars:
-                    id = ar.msg_id[0]
-                    if id in finished:
-                        toDelete.append(ar)
-                        finished.remove(id)
+        finally:
+            self.executor.shutdown()
 
-                for ar in toDelete:
-                    ars.remove(ar)
+    def watch(self, ar):
+        """
+        Track the task(s) of AsyncResult `ar` until completion.
+        """
+        for msgId in ar.msg_ids:
+            self.pending[msgId] = ar
 
-                if shutdownWhenIdle:
-                    self.shutdownIdleEngines()
+        ar.add_done_callback(self._taskDone)
 
-            if counter % 5 == 0:
-                _logger.info("%d engines: %s", len(self.client.ids), self.queueTotals())
+    def _taskDone(self, ar):
+        # Called in ipyparallel's I/O thread, so just hand the result to the main thread
+        self.completed.put(ar)
 
-            secs = args.waitSecs if state == 'nominal' else 2
-            _logger.debug('sleep(%d)', secs)
-            sleep(secs)
+    def processCompleted(self, ars):
+        """
+        Save the results of the completed tasks identified by the AsyncResults `ars`.
+        """
+        finished = [msgId for ar in ars for msgId in ar.msg_ids if msgId in self.pending]
+        for msgId in finished:
+            del self.pending[msgId]
 
-            # handle the case of initial over-allocation
-            if counter == 0 and shutdownWhenIdle:
-                self.shutdownIdleEngines()
+        if not finished:
+            return
 
-            counter += 1
+        _logger.debug('%d completed tasks', len(finished))
 
-        _logger.info("Shutting down hub")
-        self.client.shutdown(hub=True, block=True)
+        results = self.getResults(finished)
+        if results:
+            self.saveResults(results)
+        else:
+            _logger.warning('Purging %d completed tasks with no results (engine died?)', len(finished))
+            self.client.purge_results(jobs=finished)
 
     def runTrials(self):
         from . import worker
@@ -546,18 +626,19 @@ class Master(object):
         for key in ('runLocal', 'noGCAM', 'noBatchQueries', 'noPostProcessor'):
             argDict[key] = args.get(key, False)
 
+        runLocal = args['runLocal']
+        executor = None if runLocal else self.executor
+        argDict['executor'] = executor.name if executor else None
+
         simId       = args['simId']
         statuses    = args['statuses']
         scenarios   = args['scenarios']
         projectName = args['projectName']
         groupName   = args['groupName']
         trialStr    = args['trials']
-        runLocal    = args['runLocal']
 
         asyncResults = []
 
-        view = None if runLocal else self.client.load_balanced_view(retries=2)
-
         db = getDatabase()
         exps = {e.expName: e.parent for e in db.getExps()}
 
@@ -619,18 +700,13 @@ class Master(object):
 
                     else:
                         if isBaseline(scenario):
-                            result = view.map_async(worker.runTrial, [context], [argDict])
+                            result = executor.submit(worker.runTrial, context, argDict)
                             baselineARs[context.trialNum] = result
 
                         else:
+                            # Create a dependency on the baseline, if we've already submitted it
                             baselineAR = baselineARs.get(context.trialNum, None)
-                            if baselineAR is None:
-                                result = view.map_async(worker.runTrial, [context], [argDict])
-                            else:
-                                # Create a dependency on the baseline that we've already submitted
-                                # TBD: looks like this should work ok if after=None...
-                                with view.temp_flags(after=baselineAR):
-                                    result = view.map_async(worker.runTrial, [context], [argDict])
+                            result = executor.submit(worker.runTrial, context, argDict, after=baselineAR)
 
                         statusPairs.append((context, RUN_QUEUED))
                         asyncResults.append(result)
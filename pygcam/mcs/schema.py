@@ -57,12 +57,15 @@ class Output(CoreMCSMixin, ORMBase):
     timeseries  = Column(Boolean, default=False)    # TBD: use this!
     description = Column(String, nullable=True)
     units       = Column(String, nullable=True)
+    __table_args__ = (Index("output_index1", "name", unique=False),)
 
 
 class OutValue(CoreMCSMixin, ORMBase):
     outputId = Column(Integer, ForeignKey('output.outputId', ondelete="CASCADE"), primary_key=True)
     runId    = Column(Integer, ForeignKey('run.runId', ondelete="CASCADE"), primary_key=True)
     value    = Column(Float)
+    # The primary key serves lookups by outputId; this serves those by runId
+    __table_args__ = (Index("outvalue_index1", "runId", unique=False),)
 
 # deprecated
 class Program(CoreMCSMixin, ORMBase):
@@ -109,3 +112,30 @@ class TimeSeries(CoreMCSMixin, ORMBase):
     regionId = Column(Integer, ForeignKey('region.regionId', ondelete="CASCADE"))
     outputId = Column(Integer, ForeignKey('output.outputId', ondelete="CASCADE"))
     units = Column(String)
+    __table_args__ = (Index("timeseries_index1", "runId", "outputId", unique=False),
+                      Index("timeseries_index2", "outputId", "runId", unique=False))
+
+
+class TimeSeriesValue(CoreMCSMixin, ORMBase):
+    '''
+    Time-series results in "long" format, with one row per year, used instead
+    of the year columns of TimeSeries when MCS.LongTimeSeries is True. The run,
+    output, region and units of each series remain in its TimeSeries row.
+    '''
+    seriesId = Column(Integer, ForeignKey('timeseries.seriesId', ondelete="CASCADE"), primary_key=True)
+    year     = Column(Integer, primary_key=True)
+    value    = Column(Float)
+
+
+class SolverPeriod(CoreMCSMixin, ORMBase):
+    '''
+    Solver telemetry for one model period of a run, as recorded by
+    pygcam.telemetry. Unsolved market names are stored comma-delimited.
+    '''
+    runId      = Column(Integer, ForeignKey('run.runId', ondelete="CASCADE"), primary_key=True)
+    period     = Column(Integer, primary_key=True)
+    year       = Column(Integer)
+    iterations = Column(Integer, nullable=True)
+    seconds    = Column(Float,   nullable=True)
+    status     = Column(String,  nullable=True)
+    unsolvedMarkets = Column(String, nullable=True)
@@ -0,0 +1,140 @@
+# Copyright (c) 2016 Richard Plevin. See the file COPYRIGHT.txt for details.
+'''
+Store the trial data for a simulation as a binary matrix of float64 values,
+with one row per trial and one column per parameter, so that workers can
+memory-map the file and read the single row they need.
+'''
+import json
+import os
+import numpy as np
+
+from ..log import getLogger
+from .error import PygcamMcsSystemError
+from .context import getSimDir
+
+_logger = getLogger(__name__)
+
+MATRIX_FILE = 'trialData.npy'
+HEADER_FILE = 'trialData.json'
+
+def _replace(tmp, path):
+    if os.path.lexists(path):
+        os.remove(path)     # os.rename doesn't overwrite on Windows
+    os.rename(tmp, path)
+
+class TrialMatrix(object):
+    """
+    Read-only access to the trial matrix for a simulation. The matrix is stored
+    in numpy's ".npy" format, with a JSON file naming the columns and giving the
+    trial number of the first row. Instances are cached by simId, and the file
+    is memory-mapped, so a worker reading one trial at a time touches only the
+    pages holding the requested rows.
+    """
+    instances = {}
+
+    def __init__(self, simId):
+        simDir = getSimDir(simId)
+        self.simId = simId
+        self.matrixFile = os.path.join(simDir, MATRIX_FILE)
+        self.headerFile = os.path.join(simDir, HEADER_FILE)
+
+        with open(self.headerFile) as f:
+            header = json.load(f)
+
+        self.columns = header['columns']
+        self.start   = header['start']
+        self.colIndex = {name: i for i, name in enumerate(self.columns)}
+        self.mtime = os.path.getmtime(self.matrixFile)
+
+        self.matrix = np.load(self.matrixFile, mmap_mode='r')
+        if self.matrix.shape[1] != len(self.columns):
+            raise PygcamMcsSystemError("Trial matrix %s has %d columns; header lists %d" %
+                                       (self.matrixFile, self.matrix.shape[1], len(self.columns)))
+
+    @classmethod
+    def exists(cls, simId):
+        simDir = getSimDir(simId)
+        return os.path.exists(os.path.join(simDir, MATRIX_FILE)) and \
+               os.path.exists(os.path.join(simDir, HEADER_FILE))
+
+    @classmethod
+    def getInstance(cls, simId):
+        """
+        Return the TrialMatrix for `simId`, re-opening it if the file was
+        rewritten (e.g., by gensim) since it was opened.
+        """
+        obj = cls.instances.get(simId)
+        if obj is None or os.path.getmtime(obj.matrixFile) != obj.mtime:
+            obj = cls.instances[simId] = TrialMatrix(simId)
+
+        return obj
+
+    @classmethod
+    def decache(cls):
+        cls.instances = {}
+
+    @classmethod
+    def write(cls, simId, df, start=0):
+        """
+        Save the trial data in `df`, which must hold only numeric values, in
+        one column per parameter and one row per trial.
+
+        :param simId: (int) simulation ID
+        :param df: (pandas.DataFrame) the trial data
+        :param start: (int) the trial number of the first row of `df`
+        :return: none
+        """
+        simDir = getSimDir(simId)
+        matrixFile = os.path.join(simDir, MATRIX_FILE)
+        headerFile = os.path.join(simDir, HEADER_FILE)
+
+        matrix = np.ascontiguousarray(df.values, dtype=np.float64)
+        header = {'columns' : [str(col) for col in df.columns],
+                  'start'   : int(start)}
+
+        # Write to temporary files so workers never read a partial matrix
+        tmpMatrix = matrixFile + '.tmp.npy'
+        tmpHeader = headerFile + '.tmp'
+        np.save(tmpMatrix, matrix)
+        with open(tmpHeader, 'w') as f:
+            json.dump(header, f)
+
+        _replace(tmpHeader, headerFile)
+        _replace(tmpMatrix, matrixFile)
+
+        cls.instances.pop(simId, None)
+        _logger.debug("Wrote %d x %d trial matrix to %s", matrix.shape[0], matrix.shape[1], matrixFile)
+
+    def trialCount(self):
+        return self.matrix.shape[0]
+
+    def getVector(self, trialNum):
+        """
+        Return the parameter values for one trial.
+
+        :param trialNum: (int) the trial number
+        :return: (numpy.ndarray of float64) the values, in the order of self.columns
+        """
+        row = trialNum - self.start
+        if not 0 <= row < self.matrix.shape[0]:
+            raise PygcamMcsSystemError("Trial %d is not in the trial matrix for simId %d" % (trialNum, self.simId))
+
+        return np.array(self.matrix[row])     # copy the row out of the memory map
+
+    def getValue(self, trialNum, name):
+        """
+        Return the value of parameter `name` for the given trial.
+        """
+        return float(self.matrix[trialNum - self.start, self.colIndex[name]])
+
+    def getTrialData(self, trialNum):
+        """
+        Return the values for one trial as a single-row DataFrame indexed by
+        trial number, in the same form as the DataFrame read from trialData.csv.
+        """
+        from pandas import DataFrame    # lazy import
+
+        vector = self.getVector(trialNum)
+        df = DataFrame([vector], columns=self.columns, index=[trialNum])
+        df.index.name = 'trialNum'
+        return df
@@ -42,11 +42,21 @@ def writeTrialDataFile(simId, df):
     df.to_csv(dataFile, index_label='trialNum')
 
 
-def readTrialDataFile(simId):
+def readTrialDataFile(simId, trialNum=None):
     """
-    Load trial data (e.g., saved by writeTrialDataFile) and return a DataFrame
+    Load trial data (e.g., saved by writeTrialDataFile) and return a DataFrame.
+    If `trialNum` is given and the binary trial matrix written by gensim exists,
+    only that trial's row is read from it.
+
+    :param simId: (int) simulation ID
+    :param trialNum: (int) if not None, the trial whose data is required
+    :return: (pandas.DataFrame) the trial data, indexed by trial number
     """
     import pandas as pd
+    from .trialMatrix import TrialMatrix
+
+    if trialNum is not None and TrialMatrix.exists(simId):
+        return TrialMatrix.getInstance(simId).getTrialData(trialNum)
 
     simDir = getSimDir(simId)
 
@@ -4,19 +4,21 @@ import os
 import time
 import ipyparallel as ipp
 
+from pygcam.cache import logCacheStats
 from pygcam.config import getConfig, getParam, setParam, getParamAsFloat, getParamAsBoolean
 from pygcam.error import GcamError, GcamSolverError
 from pygcam.log import getLogger, configureLogs
 from pygcam.signals import (catchSignals, TimeoutSignalException, UserInterruptException)
-from pygcam.utils import mkdirs
+from pygcam.utils import mkdirs, getExeDir
 
 from pygcam.mcs.constants import RUNNER_SUCCESS, RUNNER_FAILURE
 from pygcam.mcs.context import Context
 from pygcam.mcs.error import PygcamMcsUserError, GcamToolError
 from pygcam.mcs.Database import (RUN_SUCCEEDED, RUN_FAILED, RUN_KILLED, RUN_ABORTED,
-                                 RUN_UNSOLVED, RUN_GCAMERROR, RUN_RUNNING)
+                                 RUN_UNSOLVED, RUN_GCAMERROR, RUN_RUNNING, ENG_TERMINATE)
+from pygcam.mcs.executor import IPYPARALLEL
 from pygcam.mcs.util import readTrialDataFile, symlink
-from pygcam.mcs.XMLParameterFile import XMLParameter, XMLParameterFile, decache
+from pygcam.mcs.XMLParameterFile import XMLParameter, ResidentParameterModel, decache
 
 _logger = getLogger(__name__)
 
@@ -62,10 +64,8 @@ def _readParameterInfo(context, paramPath):
     scenarioSetup = ScenarioSetup.parse(scenarioFile)
     scenarioNames = scenarioSetup.scenariosInGroup(context.groupName)
 
-    paramFile = XMLParameterFile(paramPath)
-    paramFile.loadInputFiles(context, scenarioNames, writeConfigFiles=False)
-    paramFile.runQueries()
-    return paramFile
+    # Reuses the parameter model built for an earlier trial on this engine, if possible
+    return ResidentParameterModel.getParameterFile(paramPath, context, scenarioNames)
 
 def _applySingleTrialData(df, context, paramFile):
     simId    = context.simId
@@ -105,7 +105,7 @@ def _runGcamTool(context, noGCAM=False, noBatchQueries=False,
         paramPath = getParam('MCS.ParametersFile')      # TBD: gensim has optional override of param file. Keep it?
         paramFile = _readParameterInfo(context, paramPath)
 
-        df = readTrialDataFile(simId)
+        df = readTrialDataFile(simId, trialNum=context.trialNum)
         columns = df.columns
 
         # add data for linked columns if not present
@@ -130,6 +130,9 @@ def _runGcamTool(context, noGCAM=False, noBatchQueries=False,
 
     if gcamStatus == 0:
         if not noBatchQueries:
+            # N.B. The query step runs in this process, so if GCAM.MI.ServerCommand
+            # is set, the query server started by the first trial is reused by all
+            # subsequent trials run on this engine.
             _runPygcamSteps('query', context)
 
         if not noPostProcessor:
@@ -155,6 +158,7 @@ class WorkerResult(object):
         self.context  = context
         self.errorMsg = errorMsg
         self.resultsList = []
+        self.telemetry = self._readTelemetry()
 
         if context.status == RUN_SUCCEEDED:
             self.resultsList = collectResults(context, RESULT_TYPE_SCENARIO)
@@ -167,6 +171,24 @@ class WorkerResult(object):
             _logger.debug('Worker results saving %s', self.resultsList)
 
 
+    def _readTelemetry(self):
+        '''
+        Read the solver telemetry, if any, written while GCAM ran in the trial's sandbox.
+        Telemetry is saved whatever the trial's status, since failed and unsolved trials
+        are often the ones of interest.
+        '''
+        from pygcam.telemetry import readTelemetry, telemetryPathname
+
+        path = telemetryPathname(getExeDir(self.context.getScenarioDir()))
+        if not path:
+            return None
+
+        try:
+            return readTelemetry(path)
+        except Exception as e:
+            _logger.warning("Failed to read solver telemetry from '%s': %s", path, e)
+            return None
+
     def __str__(self):
         c = self.context
         return "<WorkerResult run=%s sim=%s trial=%s, scenario=%s, status=%s error=%s>" % \
@@ -195,6 +217,9 @@ class Worker(object):
         self.argDict  = argDict
         self.runLocal = argDict.get('runLocal', False)
 
+        # Status is published to the Master only from ipyparallel engines
+        self.publish  = not self.runLocal and argDict.get('executor', IPYPARALLEL) == IPYPARALLEL
+
     def runTrial(self):
         """
         Run a single trial on the current engine using the local Worker.
@@ -227,7 +252,7 @@ class Worker(object):
         context = self.context
         context.setVars(status=status)
 
-        if not self.runLocal:
+        if self.publish:
             publish_data(dict(context=context))
 
     def _runTrial(self):
@@ -297,6 +322,7 @@ class Worker(object):
 
         self.setStatus(status)
         result = WorkerResult(context, errorMsg)
+        logCacheStats()
         return result
 
 
@@ -315,22 +341,34 @@ def runTrial(context, argDict):
     global latestStartTime
 
     if not argDict.get('runLocal', False):
+        usingIpp = argDict.get('executor', IPYPARALLEL) == IPYPARALLEL
+
         # On the first run, compute the latest time we should start a new trial.
         # On subsequent runs, check that there's adequate time still left.
         if latestStartTime is None:
             startTime = time.time()
 
-            wallTime  = os.getenv('MCS_WALLTIME', '2:00') # should always be set except when debugging
-            parts = [int(item) for item in wallTime.split(':')]
-            secs = parts.pop()
-            mins = parts.pop() if parts else 0
-            hrs  = parts.pop() if parts else 0
+            # Should always be set on engines except when debugging. For local
+            # workers, it's set only when running within a batch job's time limit.
+            wallTime  = os.getenv('MCS_WALLTIME', '2:00' if usingIpp else '')
+            if wallTime:
+                parts = [int(item) for item in wallTime.split(':')]
+                secs = parts.pop()
+                mins = parts.pop() if parts else 0
+                hrs  = parts.pop() if parts else 0
 
-            minTimeToRun = getParamAsFloat('IPP.MinTimeToRun')
-            latestStartTime = (startTime + secs + 60 * mins + 3600 * hrs) - (minTimeToRun * 60)
+                minTimeToRun = getParamAsFloat('IPP.MinTimeToRun')
+                latestStartTime = (startTime + secs + 60 * mins + 3600 * hrs) - (minTimeToRun * 60)
+            else:
+                latestStartTime = float('inf')
 
         else:
             if time.time() > latestStartTime:
+                if not usingIpp:
+                    # No other local worker has more time left, so just tell the master
+                    context.setVars(status=ENG_TERMINATE)
+                    return WorkerResult(context, 'insufficient time remaining')
+
                 # TBD: test this!
                 # raising UnmetDependency error causes scheduler to reassign to another engine
                 raise ipp.UnmetDependency()
@@ -16,11 +16,12 @@ import sys
 
 from lxml import etree as ET
 
-from .config import getParam, setParam, getConfigDict, unixPath, pathjoin
+from .config import (getParam, getParamAsInt, setParam, getConfigDict, unixPath, pathjoin,
+                     writeConfigSnapshot, SNAPSHOT_ENV_VAR)
 from .constants import LOCAL_XML_NAME, XML_SRC_NAME
-from .error import PygcamException, CommandlineError, FileFormatError
+from .error import PygcamException, CommandlineError, ConfigFileError, FileFormatError
 from .log import getLogger
-from .utils import flatten, shellCommand, getBooleanXML, simpleFormat, QueryResultsDir
+from .utils import flatten, shellCommand, getBooleanXML, simpleFormat, QueryResultsDir, mkdirs
 from .temp_file import getTempFile
 from .XMLFile import XMLFile
 from .xmlSetup import ScenarioSetup
@@ -194,13 +195,19 @@ class Step(object):
         return "<Step name='%s' seq='%s' runFor='%s'>%s</Step>" % \
                (self.name, self.seq, self.runFor, self.command)
 
-    def run(self, project, baseline, scenario, argDict, tool, noRun=False):
+    def runsFor(self, isBaseline):
+        """
+        Return True if this step should be run for a baseline scenario (if
+        `isBaseline` is True) or for a policy scenario (if False).
+        """
         runFor = self.runFor
+        return runFor == 'all' or runFor == ('baseline' if isBaseline else 'policy')
+
+    def run(self, project, baseline, scenario, argDict, tool, noRun=False):
         isBaseline = (baseline == scenario.name)
-        isPolicy = not isBaseline
 
         # See if this step should be run.
-        if runFor != 'all' and ((isBaseline and runFor != 'baseline') or (isPolicy and runFor != 'policy')):
+        if not self.runsFor(isBaseline):
             return
 
         # User can substitute an empty command to delete a default step
@@ -572,6 +579,11 @@ class Project(XMLFile):
         shellArgs = dropArgs(shellArgs, '-D', '--distribute', takesArgs=False)
         shellArgs = dropArgs(shellArgs, '-a', '--allGroups', takesArgs=False)
 
+        if getattr(args, 'parallel', False) and run and not args.distribute:
+            self.runParallel(scenarios, self.requestedSteps(steps, explicitSteps), shellArgs,
+                             sandboxDir, quitProgram)
+            return
+
         baselineJobId = None
 
         for scenarioName in scenarios:
@@ -612,23 +624,154 @@ class Project(XMLFile):
 
             try:
                 # Loop over all steps and run those that user has requested
-                for step in self.sortedSteps:
-                    group = step.group
-                    if step.name in steps and (not group or                            # no group specified
-                                               group == scenarioGroupName or           # exact match
-                                               re.match(group, scenarioGroupName)):    # pattern match
-                        # Skip optional steps unless explicitly mentioned
-                        if (step.optional and step.name not in explicitSteps):
-                            continue
-
-                        argDict['step'] = step.name
-                        step.run(self, baseline, scenario, argDict, tool, noRun=args.noRun)
+                for step in self.requestedSteps(steps, explicitSteps):
+                    argDict['step'] = step.name
+                    step.run(self, baseline, scenario, argDict, tool, noRun=args.noRun)
             except PygcamException as e:
                 if quitProgram:
                     raise
                 _logger.error("Error running step '%s': %s", step.name, e)
 
 
+    def requestedSteps(self, steps, explicitSteps):
+        """
+        Return the Step instances, in sequence order, for the given step names
+        that apply to the current scenario group.
+
+        :param steps: (set of str) the names of the steps to run
+        :param explicitSteps: (list of str) the names of steps requested explicitly
+            by the user, which is the only way to run "optional" steps.
+        :return: (list of Step) the steps to run
+        """
+        scenarioGroupName = self.scenarioGroupName
+
+        def groupMatches(group):
+            return (not group or                            # no group specified
+                    group == scenarioGroupName or           # exact match
+                    re.match(group, scenarioGroupName))     # pattern match
+
+        # Skip optional steps unless explicitly mentioned
+        return [step for step in self.sortedSteps
+                if step.name in steps and groupMatches(step.group) and
+                   not (step.optional and step.name not in explicitSteps)]
+
+    def runParallel(self, scenarios, stepObjs, shellArgs, sandboxDir, quitProgram):
+        """
+        Run the given steps for the given scenarios in separate "gt" processes on
+        the local computer, running independent steps concurrently. Steps for each
+        scenario are run in order. Each step for a policy scenario also waits for
+        the baseline to complete all its steps up to the same point in the sequence,
+        so, e.g., a policy's "diff" step is run only after the baseline's "query"
+        step. Concurrency is limited by config variables ``GCAM.ParallelMaxCores``,
+        ``GCAM.ParallelMaxMemoryGB``, and ``GCAM.ParallelStepMemoryGB``. Each step's
+        output is written to a file in the directory ``GCAM.BatchLogDir``.
+
+        :param scenarios: (list of str) the names of scenarios to run, with the
+            baseline, if any, first.
+        :param stepObjs: (list of Step) the steps to run, in sequence order
+        :param shellArgs: (list of str) the arguments to "gt" to pass to each
+            step, excluding those identifying scenarios.
+        :param sandboxDir: (str) the directory holding scenario sandboxes
+        :param quitProgram: (bool) if True, stop starting new steps when any step fails.
+        :return: none
+        :raises PygcamException: if any step fails
+        """
+        from multiprocessing import cpu_count
+        from .scheduler import Scheduler
+
+        projectName = self.projectName
+        scenarioGroupName = self.scenarioGroupName
+
+        maxCores  = getParamAsInt('GCAM.ParallelMaxCores') or cpu_count()
+        maxMemory = float(getParam('GCAM.ParallelMaxMemoryGB') or 0)
+        stepMemory = self.stepMemory()
+        logDir = getParam('GCAM.BatchLogDir') or pathjoin(sandboxDir, 'log')
+
+        # We specify the steps and scenario for each process
+        shellArgs = dropArgs(shellArgs, '-s', '--step')
+        shellArgs = dropArgs(shellArgs, '-k', '--skipStep')
+        shellArgs = dropArgs(shellArgs, '-p', '--parallel', takesArgs=False)
+
+        # The concurrency of diff and chart is limited by the scheduler instead
+        configArgs = ['+s', 'GCAM.DiffWorkers=1', '+s', 'GCAM.ChartWorkers=1']
+
+        # Each process loads our configuration rather than re-reading the config files
+        mkdirs(logDir)
+        snapshotFile = pathjoin(logDir, 'config-snapshot.json')
+        writeConfigSnapshot(snapshotFile)
+        env = dict(os.environ, **{SNAPSHOT_ENV_VAR: snapshotFile})
+
+        scheduler = Scheduler(maxProcs=maxCores, maxMemory=maxMemory, env=env)
+        baselineTasks = []      # (seq, taskName) for the baseline's steps
+
+        for scenarioName in scenarios:
+            scenario = self.scenarioDict[scenarioName]
+
+            if not scenario.isActive:
+                _logger.debug("Skipping inactive scenario: %s", scenarioName)
+                continue
+
+            isBaseline = scenario.isBaseline
+            prevTask = None
+            stepNames = set()
+
+            for step in stepObjs:
+                # Steps with the same name are run together by "gt run -s name"
+                if not step.runsFor(isBaseline) or step.name in stepNames:
+                    continue
+
+                stepNames.add(step.name)
+                dependsOn = [prevTask] if prevTask else []
+
+                if not isBaseline:
+                    baselineDone = [name for seq, name in baselineTasks if seq <= step.seq]
+                    if baselineDone:
+                        dependsOn.append(baselineDone[-1])
+
+                taskName = '%s.%s' % (scenarioName, step.name)
+                command = ['gt', '+P', projectName] + configArgs + shellArgs + \
+                          ['-S', scenarioName, '-s', step.name, '-g', scenarioGroupName]
+                memory = stepMemory.get(step.name, stepMemory.get('*', 0))
+                logFile = pathjoin(logDir, taskName + '.log')
+
+                scheduler.addTask(taskName, command, dependsOn=dependsOn, memory=memory, logFile=logFile)
+                prevTask = taskName
+
+                if isBaseline:
+                    baselineTasks.append((step.seq, taskName))
+
+        failed = scheduler.run(quitOnError=quitProgram)
+        if failed:
+            names = ', '.join([task.name for task in failed])
+            if quitProgram:
+                raise PygcamException("Steps failed: %s (see logs in %s)" % (names, logDir))
+
+            _logger.error("Steps failed: %s (see logs in %s)", names, logDir)
+
+    @staticmethod
+    def stepMemory():
+        """
+        Parse the value of config variable ``GCAM.ParallelStepMemoryGB``, which
+        is a comma-delimited list of "step=GB" pairs, where the step name "*"
+        provides a default for unlisted steps.
+
+        :return: (dict) memory required (GB) keyed by step name
+        """
+        value = getParam('GCAM.ParallelStepMemoryGB') or ''
+        result = {}
+
+        try:
+            for item in value.split(','):
+                item = item.strip()
+                if item:
+                    name, gb = item.split('=')
+                    result[name.strip()] = float(gb)
+
+        except ValueError:
+            raise ConfigFileError('GCAM.ParallelStepMemoryGB must be a comma-delimited list of "step=GB" pairs; got "%s"' % value)
+
+        return result
+
     def dump(self, steps, scenarios):
         print("Scenario group:", self.scenarioGroupName)
         print("Requested steps:", steps)
@@ -10,13 +10,16 @@ import subprocess
 
 from lxml import etree as ET
 from semver import VersionInfo
+from six import string_types
 
 from .Xvfb import Xvfb
+from .cache import getCache
 from .config import getParam, getParamAsBoolean, parse_version_info, pathjoin, unixPath
 from .constants import NUM_AEZS, GCAM_32_REGIONS
 from .error import PygcamException, ConfigFileError, FileFormatError, CommandlineError, FileMissingError
 from .log import getLogger
-from .queryFile import QueryFile, RewriteSetParser, Query
+from .queryFile import QueryFile, QueryIndex, RewriteSetParser, Query
+from .queryServer import getQueryServer, stopQueryServer, QueryServerError
 from .utils import (mkdirs, deleteFile, ensureExtension, ensureCSV, saveToFile,
                     getExeDir, writeXmldbDriverProperties, digitColumns)
 from .temp_file import TempFile, getTempFile
@@ -24,6 +27,33 @@ from .temp_file import TempFile, getTempFile
 _logger = getLogger(__name__)
 
 
+#
+# Operations on the year columns of GCAM query results. These operate on all rows
+# and year columns at once, which matters when processing many MCS trial results.
+#
+def yearColumns(df, years=None, timestep=None):
+    """
+    Return the names of the year columns (e.g., "2015") in `df`, sorted by year.
+
+    :param df: (DataFrame) data of the format returned by batch queries
+    :param years: (sequence of two values coercible to int) if given, only year
+        columns in this range (inclusive) are returned.
+    :param timestep: (int) if given, only years that are multiples of this
+        value are included, e.g., use 5 to select the standard GCAM time-steps
+        from annual data.
+    :return: (list of str) the names of the year columns
+    """
+    yearInts = sorted(digitColumns(df, asInt=True))
+
+    if years:
+        first, last = [int(y) for y in years]
+        yearInts = [y for y in yearInts if first <= y <= last]
+
+    if timestep:
+        yearInts = [y for y in yearInts if y % timestep == 0]
+
+    return [str(y) for y in yearInts]
+
 def limitYears(df, years):
     """
     Modify df to drop all years outside the range given by `years`.
@@ -32,30 +62,32 @@ def limitYears(df, years):
         range (inclusive) are kept. Data for other years is dropped.
     :return: (DataFrame) df, modified in place.
     """
-    first, last = [int(y) for y in years]
-    yearCols  = digitColumns(df, asInt=True)
-    dropYears = [str(y) for y in filter(lambda y: y < first or y > last, yearCols)]
+    keep = set(yearColumns(df, years=years))
+    dropYears = [col for col in digitColumns(df) if col not in keep]
     df.drop(dropYears, axis=1, inplace=True)
     return df
 
-# TBD: simplify using this approach:
+def sumYearColumns(df, yearCols=None, groupCol=None):
+    """
+    Sum the values in each year column of `df`, optionally grouping rows by
+    the values in `groupCol`.
+
+    :param df: (DataFrame) data of the format returned by batch queries
+    :param yearCols: (list of str) the names of the year columns to sum. If
+        None, all year columns are summed.
+    :param groupCol: (str) the column with categorical data to group by
+    :return: (Series or DataFrame) if `groupCol` is None, a Series of totals
+        indexed by year column name; otherwise a DataFrame indexed by the
+        values in `groupCol`, with a column for each year.
+    """
+    yearCols = yearColumns(df) if yearCols is None else list(yearCols)
 
-# def interp(df):
-#     import numpy as np
-#
-#     years = digitColumns(df, asInt=True)
-#     all_years = range(years[0], years[-1] + 1)
-#     interp_yrs = sorted(set(all_years) - set(years))
-#
-#     # create the cols to interpolate and set to NaN for interpolate()
-#     for y in interp_yrs:
-#         df[str(y)] = np.nan
-#
-#     df = df.sort_index(axis=1).interpolate(axis=1)
-#     return df
+    if groupCol:
+        return df.groupby(groupCol)[yearCols].sum()
 
+    return df[yearCols].sum()
 
-def interpolateYears(df, startYear=0, inplace=False):
+def interpolateYears(df, startYear=0, inplace=False, timestep=1):
     """
     Interpolate linearly between each pair of years in the GCAM output. The
     time-step is calculated from the numerical (string) column headings given
@@ -66,42 +98,66 @@ def interpolateYears(df, startYear=0, inplace=False):
     :param df: (DataFrame) Data of the format returned by batch queries
         on the GCAM XML database
     :param startYear: (int) If non-zero, begin interpolation at this year.
+        Values for years prior to `startYear` repeat the value of the prior
+        time-step.
     :param inplace: (bool) If True, modify `df` in place; otherwise modify a copy.
+    :param timestep: (int) Create values for years that are multiples of this
+        value, e.g., 1 (the default) for annual values or 5 to fill in missing
+        5-year time-steps in results with longer time-steps.
     :return: if `inplace` is True, `df` is returned; otherwise a copy
       of `df` with interpolated values is returned.
     """
-    yearCols = digitColumns(df)
+    import numpy as np
+    import pandas as pd
+
+    yearCols = yearColumns(df)
     years = [int(y) for y in yearCols]
+    values = df[yearCols].to_numpy(dtype=float)
+    rows = len(df)
 
-    for i in range(0, len(years)-1):
+    newCols = {}
+    for i in range(len(years) - 1):
         start = years[i]
-        end   = years[i+1]
-        timestep = end - start
+        end   = years[i + 1]
 
-        if timestep == 1:       # don't interpolate annual results if already annual
+        interpYears = [y for y in range(start + 1, end) if y % timestep == 0]
+        if not interpYears:     # nothing to do, e.g., results are already annual
             continue
 
-        startCol = df[str(start)]
-        endCol   = df[str(end)]
-
-        # compute vector of annual deltas for each row
-        delta = (endCol - startCol) / timestep
-
-        # interpolate the whole column -- but don't interpolate before the start year
-        for j in range(1, timestep):
-            nextYear = start + j
-            df[str(nextYear)] = df[str(nextYear-1)] + (0 if nextYear < startYear else delta)
-
-    # get annualized year columns and sort as integers
-    years = digitColumns(df, asInt=True)
-    years.sort()
-    yearCols = [str(y) for y in years]       # convert back to strings, now sorted
+        # vector of annual deltas for each row
+        startVals = values[:, i]
+        delta = (values[:, i + 1] - startVals) / (end - start)
+
+        # Compute all the interpolated columns for this time-step at once. The
+        # increment for each year is the annual delta times the number of years
+        # since the previous one, counting only years from startYear on. The
+        # increments are accumulated (rather than multiplied) so annual results
+        # match the original column-at-a-time implementation exactly.
+        prior = [start] + interpYears[:-1]
+        elapsed = np.array([max(0, y - max(p, startYear - 1)) for p, y in zip(prior, interpYears)])
+        block = np.empty((rows, len(interpYears) + 1))
+        block[:, 0]  = startVals
+        block[:, 1:] = np.where(elapsed, delta[:, np.newaxis] * elapsed, 0.0)
+        block = block.cumsum(axis=1)
+
+        for j, year in enumerate(interpYears):
+            newCols[str(year)] = block[:, j + 1]
+
+    if newCols:
+        newDF = pd.DataFrame(newCols, index=df.index)
+        if inplace:
+            df[list(newDF.columns)] = newDF
+        else:
+            df = pd.concat([df, newDF], axis=1)
 
-    nonYearCols = list(set(df.columns) - set(yearCols))
-    result = df.reindex(nonYearCols + yearCols, axis=1, copy=(not inplace))
+    # put the non-year columns first, followed by all year columns in order
+    yearCols = yearColumns(df)
+    nonYearCols = [col for col in df.columns if not (isinstance(col, string_types) and col.isdigit())]
+    result = df[nonYearCols + yearCols]
     return result
 
-_csvCache = {}
+# Raw data read by readCsv(..., cache=True), bounded by GCAM.CsvCacheSizeMB
+_csvCache = getCache('csv', sizeParam='GCAM.CsvCacheSizeMB')
 
 def readCsv(filename, skiprows=1, years=None, interpolate=False, startYear=0, cache=False):
     """
@@ -119,31 +175,35 @@ def readCsv(filename, skiprows=1, years=None, interpolate=False, startYear=0, ca
     :param cache: (bool) If True, file will be sought in, and saved to, a CSV cache.
        The "raw" file data is cached, so if called with different processing args,
        the same initial DataFrame is used, but it will be processed correctly.
+       The size of the cache is limited by config variable ``GCAM.CsvCacheSizeMB``.
     :return: (DataFrame) the data read in, processed as per arguments
     """
     import pandas as pd
 
-    found = False
+    df = _csvCache.get(filename) if cache else None
 
-    if cache and filename in _csvCache:
+    if df is not None:
         _logger.debug("Found %s in CSV cache", filename)
-        df = _csvCache[filename]
-        found = True
+        df = df.copy()      # the cached data must not be modified below
 
     else:
-        try:
-            _logger.debug("Reading %s", filename)
-            df = pd.read_table(filename, sep=',', skiprows=skiprows, index_col=None)
+        # Use the columnar sidecar file, if any, for standard GCAM CSV files
+        if skiprows == 1 and isinstance(filename, string_types):
+            df = readColumnar(filename)
+
+        if df is None:
+            try:
+                _logger.debug("Reading %s", filename)
+                df = pd.read_table(filename, sep=',', skiprows=skiprows, index_col=None)
 
-        except IOError as e:
-            raise FileMissingError(os.path.abspath(filename), e)
+            except IOError as e:
+                raise FileMissingError(os.path.abspath(filename), e)
 
-        except Exception as e:
-            raise PygcamException('Error reading %s: %s' % (filename, e))
+            except Exception as e:
+                raise PygcamException('Error reading %s: %s' % (filename, e))
 
-    # Cache a copy, unless it was already in the cache
-    if cache and not found:
-        _csvCache[filename] = df.copy()
+        if cache:
+            _csvCache.put(filename, df.copy())
 
     if years:
         limitYears(df, years)
@@ -176,6 +236,137 @@ def writeCsv(df, filename, header='', float_format="%.4f", index=None):
         f.write("%s\n" % header)  # add a header line to match batch-query output format
         f.write(txt)
 
+#
+# Support for optional "sidecar" files holding query and diff results in a binary
+# columnar format (Feather or Parquet), written alongside the CSV files, which
+# remain the interchange format. These are much faster to read than CSV files.
+#
+ColumnarFormats = ('feather', 'parquet')
+
+_columnarDisabled = False   # set if the required package (pyarrow) isn't available
+
+def columnarFormat():
+    """
+    Return the columnar file format given by config variable ``GCAM.ColumnarFormat``,
+    or None if columnar sidecar files are not in use.
+
+    :return: (str or None) 'feather', 'parquet', or None
+    :raises ConfigFileError: if the format is not recognized
+    """
+    fmt = getParam('GCAM.ColumnarFormat', raiseError=False)
+    if not fmt or _columnarDisabled:
+        return None
+
+    fmt = fmt.lower()
+    if fmt not in ColumnarFormats:
+        raise ConfigFileError("GCAM.ColumnarFormat must be one of %s; got '%s'" % (ColumnarFormats, fmt))
+
+    return fmt
+
+def columnarPathname(csvPath, fmt):
+    """
+    Compute the pathname of the columnar sidecar file for the given CSV file.
+
+    :param csvPath: (str) the pathname of a CSV file
+    :param fmt: (str) the columnar format, i.e., 'feather' or 'parquet'
+    :return: (str) the pathname of the sidecar file
+    """
+    root, ext = os.path.splitext(csvPath)
+    return '%s.%s' % (root, fmt)
+
+def writeColumnar(df, csvPath):
+    """
+    Write `df` to a columnar sidecar file for `csvPath`, if ``GCAM.ColumnarFormat``
+    is set. The data should be the same as that read from `csvPath` by
+    :py:func:`readCsv` with the default ``skiprows=1``. Failures are logged but
+    are not otherwise treated as errors, since the CSV file is authoritative.
+
+    :param df: (DataFrame) the data to write
+    :param csvPath: (str) the pathname of the corresponding CSV file
+    :return: (str or None) the pathname of the sidecar file, or None if
+        it wasn't written.
+    """
+    global _columnarDisabled
+
+    fmt = columnarFormat()
+    if not fmt:
+        return None
+
+    path = columnarPathname(csvPath, fmt)
+    _logger.debug("Writing %s", path)
+
+    try:
+        df = df.reset_index(drop=True)      # Feather supports only the default index
+        if fmt == 'feather':
+            df.to_feather(path)
+        else:
+            df.to_parquet(path, index=False)
+
+    except ImportError as e:
+        _logger.warning("Can't write %s files (%s); columnar files are disabled", fmt, e)
+        _columnarDisabled = True
+        return None
+
+    except Exception as e:
+        _logger.warning("Failed to write %s: %s", path, e)
+        deleteFile(path)
+        return None
+
+    return path
+
+def readColumnar(csvPath):
+    """
+    Read the columnar sidecar file for `csvPath`, if ``GCAM.ColumnarFormat`` is
+    set and the sidecar file exists and is not older than the CSV file.
+
+    :param csvPath: (str) the pathname of a CSV file
+    :return: (DataFrame or None) the data, or None if there's no usable sidecar file
+    """
+    import pandas as pd
+
+    fmt = columnarFormat()
+    if not fmt:
+        return None
+
+    path = columnarPathname(csvPath, fmt)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(csvPath):
+            _logger.debug("Ignoring stale file %s", path)
+            return None
+    except OSError:
+        return None     # one or the other file doesn't exist
+
+    try:
+        _logger.debug("Reading %s", path)
+        return pd.read_feather(path) if fmt == 'feather' else pd.read_parquet(path)
+
+    except Exception as e:
+        _logger.warning("Failed to read %s: %s", path, e)
+        return None
+
+def saveColumnarCopy(csvPath, skiprows=1):
+    """
+    Read a CSV file of the form generated by GCAM batch queries and save a
+    columnar sidecar file for it, if ``GCAM.ColumnarFormat`` is set.
+
+    :param csvPath: (str) the pathname of the CSV file
+    :param skiprows: (int) the number of rows to skip before reading the data matrix
+    :return: (str or None) the pathname of the sidecar file, or None if
+        it wasn't written.
+    """
+    import pandas as pd
+
+    if not (columnarFormat() and os.path.exists(csvPath)):
+        return None
+
+    try:
+        df = pd.read_table(csvPath, sep=',', skiprows=skiprows, index_col=None)
+    except Exception as e:
+        _logger.warning("Failed to read %s: %s", csvPath, e)
+        return None
+
+    return writeColumnar(df, csvPath)
+
 # TBD: This belongs with gcamtool. Currently used only by constraints.py
 def  readQueryResult(batchDir, baseline, queryName, years=None, interpolate=False, startYear=0, cache=False):
     """
@@ -353,24 +544,6 @@ def _addRewriteSet(rewriteSetList, rewriteParser, rewriteList, title):
 
     rewriteList.set('append-values', 'true' if appendValues else 'false')
 
-def _findQueryByName(tree, title):
-    """
-    Try the title and variations thereof to locate the query by name
-    """
-    # This Xpath supports both Main_Queries-type files and batch query files
-    xpathPattern = '/queries//queryGroup/*[@title="{title}"]|/queries/aQuery/*[@title="{title}"]'
-
-    patterns = (None, '_', '-', '[-_]')
-
-    for pattern in patterns:
-        altTitle = re.sub(pattern, ' ', title) if pattern else title
-        xpath = xpathPattern.format(title=altTitle)
-        elts = tree.xpath(xpath)  # returns empty list or list of elements found
-        if len(elts) != 0:
-            return elts
-
-    return None
-
 def _findOrCreateQueryFile(title, queryPath, regions, outputDir=None, tmpFiles=True,
                            regionMap=None, rewriteSetList=None, rewriteParser=None,
                            delete=True):
@@ -384,8 +557,6 @@ def _findOrCreateQueryFile(title, queryPath, regions, outputDir=None, tmpFiles=T
     sep = os.path.pathsep           # ';' on Windows, ':' on Unix
     items = queryPath.split(sep)
 
-    parser = ET.XMLParser(remove_blank_text=True)
-
     for item in items:
         if os.path.isdir(item):
             pathname = pathjoin(item, title + '.xml')
@@ -394,11 +565,10 @@ def _findOrCreateQueryFile(title, queryPath, regions, outputDir=None, tmpFiles=T
             else:
                 continue
 
-        # Find the query within an XML query file
-        tree = ET.parse(item, parser=parser)
-        elts = _findQueryByName(tree, title)
+        # Find the query within an XML query file, which is parsed only once
+        queryElt = QueryIndex.getIndex(item).findQuery(title)
 
-        if elts is None or len(elts) == 0:
+        if queryElt is None:
             continue # to next item in QueryPath
 
         _logger.debug("Found query '{}' in {}".format(title, item))
@@ -409,7 +579,6 @@ def _findOrCreateQueryFile(title, queryPath, regions, outputDir=None, tmpFiles=T
         for region in regions:
             aQuery.append(ET.Element('region', name=region))
 
-        queryElt = elts[0]
         aQuery.append(queryElt)
 
         if regionMap or rewriteSetList:
@@ -499,6 +668,30 @@ def _createJavaCommand(batchFile, miLogFile):
 
     return command
 
+def _runWithQueryServer(batchFile, miLogFile):
+    """
+    Run the batch file using the long-lived query server, if one is
+    configured (see GCAM.MI.ServerCommand).
+
+    :return: (bool) True if the batch file was run by the server, False
+       if the caller should fall back to running GCAM.MI.BatchCommand.
+    """
+    server = getQueryServer()
+    if not server:
+        return False
+
+    try:
+        server.runBatchFile(batchFile, miLogFile=miLogFile)
+    except QueryServerError as e:
+        _logger.warning("%s; falling back to GCAM.MI.BatchCommand", e)
+
+        # Don't try to use the server again if it died
+        if not server.isRunning():
+            stopQueryServer(failed=True)
+        return False
+
+    return True
+
 def _copyToLogFile(logFile, filename, msg=''):
     with open(logFile, 'a') as m:
         with open(filename, 'r') as f:
@@ -507,6 +700,35 @@ def _copyToLogFile(logFile, filename, msg=''):
                 m.write(line)
 
 
+def queryCsvFilename(queryName, scenario, saveAs=None):
+    """
+    Compute the name of the CSV file to which the results of a batch query are written.
+
+    :param queryName: (str) the name of a query, possibly with an ".xml" extension
+    :param scenario: (str) the name of the scenario queried
+    :param saveAs: (str) alternative name to use to save the query results as
+    :return: (str) the basename of the CSV file
+    """
+    mainPart, extension = os.path.splitext(os.path.basename(queryName))   # strip extension, if any
+    csvFile = "%s-%s.csv" % (saveAs or mainPart, scenario)
+    return csvFile.replace(' ', '_')        # eliminate spaces for convenience
+
+def _queryNames(queries):
+    """
+    Generate (queryName, saveAs) pairs for a list of query names and/or Query
+    instances, skipping blank and commented-out names.
+    """
+    for obj in queries:
+        # handle both Query instances and simple query name strings
+        if isinstance(obj, Query):
+            queryName, saveAs = obj.name, obj.saveAs
+        else:
+            queryName, saveAs = obj, None
+
+        queryName = queryName.strip()
+        if queryName and queryName[0] != '#':    # ignore blank lines and comments
+            yield queryName, saveAs
+
 def _createBatchCommandElement(scenario, queryName, queryPath, outputDir=None, tmpFiles=True,
                                xmldb='', csvFile=None, regions=None, regionMap=None,
                                rewriters=None, rewriteParser=None, noDelete=False, saveAs=None):
@@ -538,7 +760,6 @@ def _createBatchCommandElement(scenario, queryName, queryPath, outputDir=None, t
     :return: (str) the generated batch command string
     """
     basename = os.path.basename(queryName)
-    mainPart, extension = os.path.splitext(basename)   # strip extension, if any
 
     # set default here so sphinx doc doesn't list all 32 regions
     regions = regions or GCAM_32_REGIONS
@@ -555,8 +776,7 @@ def _createBatchCommandElement(scenario, queryName, queryPath, outputDir=None, t
                               (basename, queryPath))
 
     if not csvFile:
-        csvFile = "%s-%s.csv" % (saveAs or mainPart, scenario)    # compute default filename
-        csvFile = csvFile.replace(' ', '_')                       # eliminate spaces for convenience
+        csvFile = queryCsvFilename(queryName, scenario, saveAs=saveAs)
 
     outputDir = outputDir or getParam('GCAM.OutputDir')
     mkdirs(outputDir)
@@ -784,7 +1004,8 @@ def runModelInterface(scenario, outputDir, csvFile=None, batchFile=None,
         if getParamAsBoolean('GCAM.MI.UseVirtualBuffer'):   # deprecated as of GCAM 4.3
             with Xvfb():
                 subprocess.call(command, shell=True)
-        else:
+
+        elif not _runWithQueryServer(batchFile, miLogFile):
             subprocess.call(command, shell=True)
 
         # The java program always exits with 0 status, but when the query fails,
@@ -852,7 +1073,6 @@ def runBatchQuery(scenario, queryName, queryPath, outputDir, xmldb='',
     :return: (str) the absolute path to the generated .CSV file, or None
     """
     basename = os.path.basename(queryName)
-    mainPart, extension = os.path.splitext(basename)   # strip extension, if any
 
     regions = regions or GCAM_32_REGIONS # set default here so it doesn't mess up doc for this method
 
@@ -866,8 +1086,7 @@ def runBatchQuery(scenario, queryName, queryPath, outputDir, xmldb='',
         raise PygcamException("runBatchQuery: file for query '%s' was not found." % basename)
 
     if not csvFile:
-        csvFile = "%s-%s.csv" % (saveAs or mainPart, scenario)    # compute default filename
-        csvFile = csvFile.replace(' ', '_')                       # eliminate spaces for convenience
+        csvFile = queryCsvFilename(queryName, scenario, saveAs=saveAs)
 
     csvPath = runModelInterface(scenario, filename, outputDir, csvFile, xmldb=xmldb,
                                 miLogFile=miLogFile, noDelete=noDelete, noRun=noRun)
@@ -924,10 +1143,9 @@ def sumYears(files, skiprows=1, interpolate=False):
     for df, fname in zip(dframes, csvFiles):
         root, ext = os.path.splitext(fname)
         outFile = root + '-sum' + ext
-        yearCols = digitColumns(df)
 
         with open(outFile, 'w') as f:
-            sums = df[yearCols].sum()
+            sums = sumYearColumns(df)
             csvText = sums.to_csv(None)
             f.write("%s\n%s\n" % (outFile, csvText))
 
@@ -950,8 +1168,6 @@ def sumYearsByGroup(groupCol, files, skiprows=1, interpolate=False):
     :return: none
     :raises CommandLineError: if the rows in the input file don't all have the same units
     """
-    import numpy as np
-
     csvFiles = [ensureCSV(f) for f in files]
     dframes  = [readCsv(fname, skiprows=skiprows, interpolate=interpolate) for fname in csvFiles]
 
@@ -964,9 +1180,7 @@ def sumYearsByGroup(groupCol, files, skiprows=1, interpolate=False):
         name = groupCol.replace(' ', '_')     # eliminate spaces for general convenience
         outFile = '%s-groupby-%s%s' % (root, name, ext)
 
-        cols = [groupCol] + digitColumns(df)
-        grouped = df[cols].groupby(groupCol)
-        df2 = grouped.aggregate(np.sum)
+        df2 = sumYearColumns(df, groupCol=groupCol)
         df2['Units'] = units[0]         # add these units to all rows
 
         with open(outFile, 'w') as f:
@@ -1137,3 +1351,9 @@ def queryMain(args):
                              queryPath=queryPath, outputDir=outputDir, rewriteParser=rewriteParser,
                              miLogFile=miLogFile, regions=regions, regionMap=regionMap,
                              noRun=args.noRun, noDelete=args.noDelete)
+
+    # Save columnar copies of the results, if so configured, for faster reading by later steps
+    if columnarFormat() and not args.noRun:
+        for queryName, saveAs in _queryNames(queries):
+            csvPath = pathjoin(outputDir, queryCsvFilename(queryName, scenario, saveAs=saveAs))
+            saveColumnarCopy(csvPath)
@@ -3,13 +3,21 @@
 .. Copyright (c) 2016 Richard Plevin
    See the https://opensource.org/licenses/MIT for license details.
 '''
+import hashlib
+import json
+import os
+import re
 from collections import defaultdict
+from lxml import etree as ET
 
 from .config import getParam
 from .error import PygcamException
-from .utils import getBooleanXML, resourceStream
+from .log import getLogger
+from .utils import getBooleanXML, mkdirs, resourceStream
 from .XMLFile import XMLFile
 
+_logger = getLogger(__name__)
+
 #
 # Classes to parse queryFiles and the <queries> element of project.xml
 # (see pygcam/etc/queries-schema.xsd). These are in a separate file
@@ -61,6 +69,148 @@ class QueryFile(object):
         xmlFile = XMLFile(filename, schemaPath='etc/queries-schema.xsd', conditionalXML=True)
         return cls(xmlFile.tree.getroot())
 
+#
+# Index of the query definitions in files named in GCAM.QueryPath, e.g.,
+# Main_queries.xml, so each file is parsed only once per process (or only
+# once per node, if GCAM.QueryIndexDir is set.)
+#
+class QueryIndex(object):
+    # store instances by filename to avoid repeated parsing
+    cache = {}
+
+    # This Xpath supports both Main_Queries-type files and batch query files
+    xpath = '/queries//queryGroup/*[@title]|/queries/aQuery/*[@title]'
+
+    # Variations of the title to try, in order, if the title isn't found as given
+    titlePatterns = (None, '_', '-', '[-_]')
+
+    def __init__(self, filename, mtime, size, queries):
+        """
+        :param filename: (str) the path to the indexed query file
+        :param mtime: (float) the modification time of the file when it was indexed
+        :param size: (int) the size of the file when it was indexed
+        :param queries: (dict) XML text of each query definition, keyed by title
+        """
+        self.filename = filename
+        self.mtime = mtime
+        self.size  = size
+        self.queries = queries
+
+    def isCurrent(self, mtime, size):
+        return self.mtime == mtime and self.size == size
+
+    def findQuery(self, title):
+        """
+        Find a query by title, trying the title as given and then with '_',
+        '-', or both replaced by spaces.
+
+        :param title: (str) the title of a query
+        :return: (lxml.etree.Element or None) a newly-parsed copy of the query
+           element, which the caller can modify, or None if not found.
+        """
+        for pattern in self.titlePatterns:
+            altTitle = re.sub(pattern, ' ', title) if pattern else title
+            text = self.queries.get(altTitle)
+            if text is not None:
+                parser = ET.XMLParser(remove_blank_text=True)
+                return ET.fromstring(text, parser=parser)
+
+        return None
+
+    @classmethod
+    def _indexPath(cls, filename):
+        indexDir = getParam('GCAM.QueryIndexDir', raiseError=False)
+        if not indexDir:
+            return None
+
+        digest = hashlib.md5(os.path.abspath(filename).encode('utf-8')).hexdigest()
+        return os.path.join(indexDir, digest + '.json')
+
+    @classmethod
+    def _parseFile(cls, filename, mtime, size):
+        parser = ET.XMLParser(remove_blank_text=True)
+        tree = ET.parse(filename, parser=parser)
+
+        queries = {}
+        for elt in tree.xpath(cls.xpath):
+            title = elt.get('title')
+            if title not in queries:    # first definition wins, as with an xpath search
+                queries[title] = ET.tostring(elt, encoding='unicode')
+
+        return cls(filename, mtime, size, queries)
+
+    @classmethod
+    def _readIndexFile(cls, indexPath, filename, mtime, size):
+        try:
+            with open(indexPath) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        if data.get('filename') != os.path.abspath(filename):
+            return None
+
+        obj = cls(filename, data.get('mtime'), data.get('size'), data.get('queries', {}))
+        return obj if obj.isCurrent(mtime, size) else None
+
+    def _writeIndexFile(self, indexPath):
+        data = {'filename': os.path.abspath(self.filename),
+                'mtime'   : self.mtime,
+                'size'    : self.size,
+                'queries' : self.queries}
+
+        # Write to a temporary file and rename so readers never see a partial file
+        tmpPath = '%s.%d' % (indexPath, os.getpid())
+        try:
+            mkdirs(os.path.dirname(indexPath))
+            with open(tmpPath, 'w') as f:
+                json.dump(data, f)
+            if os.path.lexists(indexPath):
+                os.remove(indexPath)    # os.rename doesn't overwrite on Windows
+            os.rename(tmpPath, indexPath)
+        except (IOError, OSError) as e:
+            _logger.warning("Failed to write query index '%s': %s", indexPath, e)
+        finally:
+            if os.path.lexists(tmpPath):
+                os.remove(tmpPath)
+
+    @classmethod
+    def getIndex(cls, filename):
+        """
+        Return the index for the given query file, parsing the file only if
+        it hasn't been parsed previously or has changed since it was indexed.
+        If config variable GCAM.QueryIndexDir is set, indices are saved there
+        so other processes on the node can avoid parsing the file.
+
+        :param filename: (str) the path to an XML file in the format of
+           Main_queries.xml or a batch query file
+        :return: (QueryIndex) the index
+        """
+        stat = os.stat(filename)
+        mtime, size = stat.st_mtime, stat.st_size
+
+        obj = cls.cache.get(filename)
+        if obj and obj.isCurrent(mtime, size):
+            return obj
+
+        indexPath = cls._indexPath(filename)
+        obj = indexPath and cls._readIndexFile(indexPath, filename, mtime, size)
+
+        if obj:
+            _logger.debug("Read query index for '%s' from '%s'", filename, indexPath)
+        else:
+            _logger.debug("Indexing queries in '%s'", filename)
+            obj = cls._parseFile(filename, mtime, size)
+            if indexPath:
+                obj._writeIndexFile(indexPath)
+
+        cls.cache[filename] = obj
+        return obj
+
+    @classmethod
+    def decache(cls):
+        cls.cache = {}
+
 #
 # Classes to parse rewriteSets.xml (see pygcam/etc/rewriteSets-schema.xsd)
 #
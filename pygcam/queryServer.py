@@ -0,0 +1,233 @@
+'''
+.. Support for running batch queries through a long-lived ModelInterface
+   process rather than starting a new JVM for each batch file.
+
+.. Copyright (c) 2016 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import atexit
+import os
+import shlex
+import subprocess
+import threading
+import time
+from six.moves.queue import Queue, Empty
+
+from .config import getParam, getParamAsInt
+from .error import PygcamException
+from .log import getLogger
+from .utils import unixPath
+
+_logger = getLogger(__name__)
+
+class QueryServerError(PygcamException):
+    """
+    Raised when the ModelInterface query server fails to start or dies
+    while processing a batch file.
+    """
+    pass
+
+
+class QueryServer(object):
+    """
+    Manages a ModelInterface java subprocess that remains running across
+    multiple batch files (and scenarios), avoiding JVM startup, classpath
+    scanning and related costs for each query batch.
+
+    The protocol is line-oriented over stdin/stdout: for each request, the
+    pathname of a batch file is written as a single line to the server's
+    stdin. The server runs the batch file and replies with any number of
+    lines of diagnostic output, followed by a single status line that starts
+    with ``OK`` (success) or ``ERROR`` (failure, followed by a message).
+    Diagnostic output is appended to the ModelInterface log file, if given.
+    A server that doesn't reply within the timeout is killed. Batch files are
+    sent as absolute pathnames, but relative pathnames within them are
+    interpreted relative to the directory in which the server was started.
+    The server provided with pygcam is ``etc/QueryServer.java``.
+    """
+    OK    = 'OK'
+    ERROR = 'ERROR'
+
+    def __init__(self, command, timeout=0):
+        """
+        Start the query server.
+
+        :param command: (str) the command that starts the server,
+           typically the value of config variable ``GCAM.MI.ServerCommand``.
+        :param timeout: (int) the number of seconds to wait for the server
+           to finish a batch file, or 0 to wait indefinitely.
+        :raises QueryServerError: if the server cannot be started.
+        """
+        self.command = command
+        self.cwd = os.getcwd()
+        self.timeout = timeout or None
+        self.proc = None
+        self.batchCount = 0
+        self.lines = Queue()     # lines of output, followed by None at EOF
+
+        _logger.info("Starting query server: %s", command)
+        try:
+            self.proc = subprocess.Popen(shlex.split(command), bufsize=1,
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.STDOUT, universal_newlines=True)
+        except OSError as e:
+            raise QueryServerError("Failed to start query server '%s': %s" % (command, e))
+
+        # Read the output in a thread so we can stop waiting for a hung server
+        reader = threading.Thread(target=self._readOutput, args=(self.proc.stdout,))
+        reader.daemon = True
+        reader.start()
+
+    def _readOutput(self, stream):
+        for line in iter(stream.readline, ''):
+            self.lines.put(line)
+
+        self.lines.put(None)
+
+    def isRunning(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def runBatchFile(self, batchFile, miLogFile=None):
+        """
+        Submit a batch file to the server and wait for it to complete.
+
+        :param batchFile: (str) the pathname of a ModelInterface batch query file
+        :param miLogFile: (str) optional name of a log file to which to append
+           the server's diagnostic output.
+        :return: none
+        :raises QueryServerError: if the server is not running, dies while
+           processing the request, or reports an error.
+        """
+        if not self.isRunning():
+            raise QueryServerError("Query server is not running")
+
+        _logger.debug("Query server: running batch file '%s'", batchFile)
+
+        try:
+            self.proc.stdin.write(os.path.abspath(batchFile) + '\n')
+            self.proc.stdin.flush()
+        except (IOError, OSError) as e:
+            raise QueryServerError("Failed to write to query server: %s" % e)
+
+        deadline = time.time() + self.timeout if self.timeout else None
+
+        logFile = open(miLogFile, 'a') if miLogFile else None
+        try:
+            while True:
+                try:
+                    line = self.lines.get(timeout=max(deadline - time.time(), 0) if deadline else None)
+                except Empty:
+                    self.stop(kill=True)
+                    raise QueryServerError("Query server didn't finish '%s' within %d seconds" % (batchFile, self.timeout))
+
+                if not line:    # EOF: the server died
+                    raise QueryServerError("Query server exited while running '%s'" % batchFile)
+
+                if line.startswith(self.OK):
+                    break
+
+                if line.startswith(self.ERROR):
+                    raise QueryServerError("Query server failed to run '%s': %s" % (batchFile, line.strip()))
+
+                if logFile:
+                    logFile.write(line)
+        finally:
+            if logFile:
+                logFile.close()
+
+        self.batchCount += 1
+
+    def stop(self, kill=False):
+        """
+        Terminate the server by closing its stdin, killing it if
+        it doesn't exit promptly.
+
+        :param kill: (bool) if True, kill the server without waiting
+        :return: none
+        """
+        if not self.isRunning():
+            return
+
+        _logger.debug("Stopping query server after %d batch files", self.batchCount)
+        try:
+            self.proc.stdin.close()
+        except (IOError, OSError):
+            pass
+
+        # Allow a few seconds for a clean exit before killing the process
+        for _ in range(0 if kill else 50):
+            if self.proc.poll() is not None:
+                break
+            time.sleep(0.1)
+        else:
+            self.proc.kill()
+            self.proc.wait()
+
+        self.proc = None
+
+
+_queryServer = None
+_serverFailed = False
+
+def serverSourcePath():
+    """
+    Return the pathname of the ModelInterface query server distributed with
+    pygcam, which is substituted for "{serverSource}" in ``GCAM.MI.ServerCommand``.
+
+    :return: (str) the pathname of ``QueryServer.java``
+    """
+    return unixPath(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'etc', 'QueryServer.java'))
+
+def getQueryServer():
+    """
+    Return the running query server, starting it if necessary. The server
+    persists for the life of the process, so it's shared by all queries
+    and scenarios run by this process (e.g., by an MCS engine running many
+    trials). The server is restarted if the command or the current directory
+    changes. If ``GCAM.MI.ServerCommand`` is empty, or the server failed to
+    start, died, or timed out previously in this process, None is returned and callers
+    should fall back to running ``GCAM.MI.BatchCommand``.
+
+    :return: (QueryServer or None) the running server, or None
+    """
+    global _queryServer, _serverFailed
+
+    command = getParam('GCAM.MI.ServerCommand', raiseError=False)
+    if not command or _serverFailed:
+        return None
+
+    command = command.format(serverSource=serverSourcePath())
+
+    # Restart the server if the command changed, e.g., for a different project, or if
+    # the current directory changed, since relative pathnames in batch files depend on it.
+    if _queryServer and (_queryServer.command != command or _queryServer.cwd != os.getcwd()
+                         or not _queryServer.isRunning()):
+        stopQueryServer()
+
+    if _queryServer is None:
+        try:
+            _queryServer = QueryServer(command, timeout=getParamAsInt('GCAM.MI.ServerTimeout'))
+        except QueryServerError as e:
+            _logger.warning("%s; falling back to GCAM.MI.BatchCommand", e)
+            _serverFailed = True
+
+    return _queryServer
+
+def stopQueryServer(failed=False):
+    """
+    Stop the query server, if running.
+
+    :param failed: (bool) if True, the server won't be restarted for the
+       remainder of this process.
+    :return: none
+    """
+    global _queryServer, _serverFailed
+
+    if _queryServer:
+        _queryServer.stop()
+        _queryServer = None
+
+    if failed:
+        _serverFailed = True
+
+atexit.register(stopQueryServer)
@@ -0,0 +1,201 @@
+'''
+.. A simple scheduler that runs a directed acyclic graph of commands in
+   local processes, subject to limits on the number of concurrent processes
+   and the total memory they require.
+
+.. Copyright (c) 2016 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import os
+import subprocess
+import time
+
+from .error import PygcamException
+from .log import getLogger
+from .utils import mkdirs
+
+_logger = getLogger(__name__)
+
+TASK_PENDING   = 'pending'
+TASK_RUNNING   = 'running'
+TASK_SUCCEEDED = 'succeeded'
+TASK_FAILED    = 'failed'
+TASK_SKIPPED   = 'skipped'      # not run because a dependency failed or the run was stopped
+
+class SchedulerError(PygcamException):
+    pass
+
+class Task(object):
+    """
+    A command to run after the tasks it depends on have succeeded.
+    """
+    def __init__(self, name, command, dependsOn=None, memory=0, logFile=None, env=None):
+        """
+        :param name: (str) a unique name for the task
+        :param command: (list of str) the command to run
+        :param dependsOn: (list of Task) tasks that must succeed before this one is run
+        :param memory: (float) the memory (in GB) required by the task
+        :param logFile: (str) a file to which the task's output is written. If None,
+            output goes to the scheduler's stdout and stderr.
+        :param env: (dict) the environment for the command, or None to inherit ours
+        """
+        self.name = name
+        self.command = command
+        self.dependsOn = dependsOn or []
+        self.memory = memory
+        self.logFile = logFile
+        self.env = env
+
+        self.status = TASK_PENDING
+        self.proc = None
+        self.stream = None
+
+    def __str__(self):
+        return "<Task %s status=%s>" % (self.name, self.status)
+
+    def isReady(self):
+        return all([task.status == TASK_SUCCEEDED for task in self.dependsOn])
+
+    def isBlocked(self):
+        return any([task.status in (TASK_FAILED, TASK_SKIPPED) for task in self.dependsOn])
+
+    def start(self):
+        _logger.info("Starting %s: %s", self.name, ' '.join(self.command))
+
+        if self.logFile:
+            mkdirs(os.path.dirname(self.logFile))
+            self.stream = open(self.logFile, 'w')
+
+        self.proc = subprocess.Popen(self.command, stdout=self.stream, stderr=subprocess.STDOUT if self.stream else None,
+                                     env=self.env)
+        self.status = TASK_RUNNING
+
+    def poll(self):
+        """
+        Check whether the task's process has exited, and if so, set the task's status.
+
+        :return: (bool) True if the process has exited
+        """
+        exitCode = self.proc.poll()
+        if exitCode is None:
+            return False
+
+        self._finish(exitCode)
+        return True
+
+    def _finish(self, exitCode):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        self.status = TASK_SUCCEEDED if exitCode == 0 else TASK_FAILED
+        log = _logger.info if exitCode == 0 else _logger.error
+        log("Task %s %s (exit status %d)", self.name, self.status, exitCode)
+
+    def kill(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            self._finish(self.proc.wait())
+
+class Scheduler(object):
+    """
+    Runs tasks in local processes as soon as the tasks they depend on have
+    succeeded, subject to limits on the number of tasks running at once and
+    the total memory they require. Tasks are started in the order in which
+    they were added, as the dependencies and limits allow.
+    """
+    def __init__(self, maxProcs=1, maxMemory=0, pollInterval=1.0, env=None):
+        """
+        :param maxProcs: (int) the maximum number of tasks to run at once
+        :param maxMemory: (float) the total memory (GB) available to running
+            tasks. If 0, memory is not considered.
+        :param pollInterval: (float) seconds to wait between checks for
+            completed tasks
+        :param env: (dict) the environment for the tasks' commands, or None
+            to inherit ours
+        """
+        self.maxProcs = max(maxProcs, 1)
+        self.maxMemory = maxMemory
+        self.pollInterval = pollInterval
+        self.env = env
+        self.tasks = []
+        self.taskDict = {}
+
+    def addTask(self, name, command, dependsOn=None, memory=0, logFile=None):
+        """
+        Add a task to the graph. Tasks can depend only on tasks that have already
+        been added, which guarantees that the graph has no cycles.
+
+        :param name: (str) a unique name for the task
+        :param command: (list of str) the command to run
+        :param dependsOn: (list of str) names of tasks that must succeed before
+            this one is run
+        :param memory: (float) the memory (in GB) required by the task
+        :param logFile: (str) a file to which the task's output is written
+        :return: (Task) the new task
+        :raises SchedulerError: if the name is already used or a dependency is unknown
+        """
+        if name in self.taskDict:
+            raise SchedulerError("Task '%s' was already defined" % name)
+
+        try:
+            deps = [self.taskDict[depName] for depName in (dependsOn or [])]
+        except KeyError as e:
+            raise SchedulerError("Task '%s' depends on unknown task %s" % (name, e))
+
+        task = Task(name, command, dependsOn=deps, memory=memory, logFile=logFile, env=self.env)
+        self.tasks.append(task)
+        self.taskDict[name] = task
+        return task
+
+    def _canStart(self, task, running):
+        if len(running) >= self.maxProcs:
+            return False
+
+        # A task requiring more than the total available memory is run by itself
+        memoryInUse = sum([t.memory for t in running])
+        return not (self.maxMemory and running and memoryInUse + task.memory > self.maxMemory)
+
+    def run(self, quitOnError=True):
+        """
+        Run all tasks, returning when all have completed or been skipped.
+
+        :param quitOnError: (bool) if True, stop starting new tasks when any
+            task fails, though running tasks are allowed to finish. If False,
+            only the tasks that depend on a failed task are skipped.
+        :return: (list of Task) the tasks that failed
+        """
+        pending = list(self.tasks)
+        running = []
+        failed  = []
+
+        try:
+            while pending or running:
+                for task in [t for t in running if t.poll()]:
+                    running.remove(task)
+                    if task.status == TASK_FAILED:
+                        failed.append(task)
+
+                for task in [t for t in pending if (failed and quitOnError) or t.isBlocked()]:
+                    _logger.warning("Skipping task %s", task.name)
+                    task.status = TASK_SKIPPED
+                    pending.remove(task)
+
+                for task in [t for t in pending if t.isReady()]:
+                    if not self._canStart(task, running):
+                        break
+                    task.start()
+                    pending.remove(task)
+                    running.append(task)
+
+                if running:
+                    time.sleep(self.pollInterval)
+
+                elif pending:   # can't happen if dependencies are added in order
+                    raise SchedulerError("Tasks cannot be run: %s" % [t.name for t in pending])
+
+        finally:
+            for task in running:    # e.g., upon user interrupt
+                task.kill()
+
+        return failed
@@ -54,3 +54,11 @@ def raiseSignalException(signum, _frame):
 def catchSignals(handler=raiseSignalException):
     for sig in _sigmap:
         signal.signal(sig, handler)
+
+def resetSignals():
+    """
+    Restore the default handlers for the signals caught by catchSignals(),
+    e.g., in a child process that should simply exit when terminated.
+    """
+    for sig in _sigmap:
+        signal.signal(sig, signal.SIG_DFL)
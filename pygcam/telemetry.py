@@ -0,0 +1,177 @@
+'''
+.. Parse GCAM's console output into structured records describing the
+   solution of each model period.
+
+.. Copyright (c) 2016 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+import json
+import os
+import re
+import time
+
+from .config import getParam, pathjoin
+from .log import getLogger
+
+_logger = getLogger(__name__)
+
+TELEMETRY_VERSION = 1
+
+# Status values for periods and runs
+SOLVED    = 'solved'
+UNSOLVED  = 'unsolved'
+RUNNING   = 'running'
+FAILED    = 'failed'
+
+# Messages written by GCAM to the console (main_log)
+_PeriodPattern    = re.compile(r'^\s*Period (\d+): (\d{4})')
+_SolvedPattern    = re.compile(r'Model solved normally\. Iterations period (\d+): (\d+)')
+_UnsolvedPattern  = re.compile(r'Model did not solve')     # any number is the iteration limit
+_MarketPattern    = re.compile(r'unsolved\s+market\w*\s*:\s*(\S.*?)\s*$', re.IGNORECASE)
+
+# After failing to solve a period, GCAM lists the unsolved markets in its solution
+# info format, which begins with the market name, e.g., "USAregional corn, X: 1.2, ..."
+_MarketRowPattern = re.compile(r'^\s*(\S[^,]*?)\s*,\s*X:')
+
+def isPeriodStart(line):
+    """
+    Return True if `line` of GCAM output marks the start of a model period.
+    """
+    return _PeriodPattern.match(line) is not None
+
+def telemetryPathname(exeDir):
+    """
+    Return the pathname of the telemetry file for a run in `exeDir`, based on
+    config variable GCAM.SolverTelemetryFile, or None if that variable is empty.
+    """
+    filename = getParam('GCAM.SolverTelemetryFile', raiseError=False)
+    return pathjoin(exeDir, filename, normpath=True) if filename else None
+
+def readTelemetry(path):
+    """
+    Read a telemetry file written by :py:meth:`SolverTelemetry.write`.
+
+    :param path: (str) pathname of the file
+    :return: (dict) the telemetry data, or None if the file doesn't exist
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        return json.load(f)
+
+class SolverTelemetry(object):
+    """
+    Accumulates a record for each model period from lines of GCAM's console
+    output, including the period's year, the number of solver iterations, the
+    elapsed time, whether it solved, and the names of any unsolved markets.
+    """
+    def __init__(self, path=None):
+        """
+        :param path: (str) if not None, the file to which the records are
+            written as each period completes, so that the progress of a run
+            can be monitored while it runs.
+        """
+        self.path = path
+        self.startTime = time.time()
+        self.periods = []
+        self.current = None
+        self.status = RUNNING
+        self.exitCode = None
+        self.write()        # replace any file from a previous run
+
+    def processLine(self, line):
+        """
+        Update the records based on one line of GCAM output.
+
+        :param line: (str) a line of output
+        :return: none
+        """
+        match = _PeriodPattern.match(line)
+        if match:
+            self._endPeriod()
+            self.current = {'period'     : int(match.group(1)),
+                            'year'       : int(match.group(2)),
+                            'start'      : round(time.time() - self.startTime, 3),
+                            'seconds'    : None,
+                            'iterations' : None,
+                            'status'     : RUNNING,
+                            'unsolvedMarkets' : []}
+            return
+
+        period = self.current
+        if period is None:
+            return
+
+        match = _SolvedPattern.search(line)
+        if match:
+            period['iterations'] = int(match.group(2))
+            period['status'] = SOLVED
+            return
+
+        if _UnsolvedPattern.search(line):
+            period['status'] = UNSOLVED
+            return
+
+        match = _MarketPattern.search(line)
+        if not match and period['status'] == UNSOLVED:
+            match = _MarketRowPattern.match(line)
+
+        if match and match.group(1) not in period['unsolvedMarkets']:
+            period['unsolvedMarkets'].append(match.group(1))
+
+    def _endPeriod(self):
+        period = self.current
+        if period is None:
+            return
+
+        period['seconds'] = round(time.time() - self.startTime - period['start'], 3)
+        if period['status'] == RUNNING:
+            period['status'] = None     # GCAM didn't report the outcome
+        self.periods.append(period)
+        self.current = None
+        self.write()
+
+    def finish(self, exitCode=None, status=None):
+        """
+        Close the final period and write the records.
+
+        :param exitCode: (int) GCAM's exit status, if it exited
+        :param status: (str) the status of the run; if None, the run is deemed
+            SOLVED if GCAM exited normally and no period failed to solve, else FAILED.
+        :return: none
+        """
+        self._endPeriod()
+        self.exitCode = exitCode
+
+        if status is None:
+            solved = exitCode == 0 and not any([p['status'] == UNSOLVED for p in self.periods])
+            status = SOLVED if solved else FAILED
+
+        self.status = status
+        self.write()
+
+    def asDict(self):
+        periods = self.periods + ([self.current] if self.current else [])
+        return {'version'  : TELEMETRY_VERSION,
+                'status'   : self.status,
+                'exitCode' : self.exitCode,
+                'seconds'  : round(time.time() - self.startTime, 3),
+                'periods'  : periods}
+
+    def write(self):
+        """
+        Write the records as JSON to the file given to the constructor, if any.
+        The file is replaced atomically so readers never see a partial file.
+        """
+        if not self.path:
+            return
+
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.asDict(), f, separators=(',', ':'))
+            os.rename(tmp, self.path)
+
+        except (IOError, OSError) as e:
+            _logger.warning("Failed to write solver telemetry to '%s': %s", self.path, e)
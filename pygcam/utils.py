@@ -261,7 +261,9 @@ def symlinkOrCopyFile(src, dst):
 def copyFileOrTree(src, dst):
     """
     Copy src to dst, where the two can both be files or directories.
-    If `src` and `dst` are directories, `dst` must not exist yet.
+    If `src` and `dst` are directories, `dst` must not exist yet. If
+    GCAM.FileStoreDir is set, files are hardlinked or reflinked from
+    the store where possible rather than copied.
 
     :param src: (str) path to a source file or directory
     :param dst: (str) path to a destination file or directory.
@@ -273,11 +275,12 @@ def copyFileOrTree(src, dst):
     if os.path.islink(src):
         src = os.readlink(src)
 
+    from .fileStore import storeCopy
+
     if os.path.isdir(src):
         removeTreeSafely(dst)
-        shutil.copytree(src, dst)
-    else:
-        shutil.copy2(src, dst)
+
+    storeCopy(src, dst)
 
 # used only in gcamtool modules
 # TBD: rename to removeTree
@@ -671,3 +674,64 @@ def chunkify(lst, chunks):
             chunkSize -= 1
         yield lst[i:i + chunkSize]
         i += chunkSize
+
+def getNumWorkers(numWorkers, configVar, numTasks):
+    """
+    Compute the number of processes to use for a set of tasks.
+
+    :param numWorkers: (int or None) the number of processes requested. If
+        None, the value of `configVar` is used. A value of 0 means use one
+        process per CPU.
+    :param configVar: (str) the name of a config variable holding the default
+    :param numTasks: (int) the number of tasks, which limits the number of processes
+    :return: (int) the number of processes to use
+    """
+    from multiprocessing import cpu_count
+
+    if numWorkers is None:
+        numWorkers = int(getParam(configVar) or 0)
+
+    return min(numWorkers or cpu_count(), numTasks)
+
+def _poolArgs():
+    # Pool processes that aren't forked (e.g., on Windows) would otherwise
+    # read and interpolate all the config files again.
+    from .config import configLoaded, getConfigSnapshot
+    return (getConfigSnapshot(),) if configLoaded() else ()
+
+def _initPoolWorker(snapshot=None):
+    # Pool processes inherit the handlers installed by catchSignals(), which
+    # would prevent Pool.terminate() from stopping them.
+    from .signals import resetSignals
+    from .config import configLoaded, setConfigSnapshot
+
+    resetSignals()
+
+    if snapshot and not configLoaded():
+        setConfigSnapshot(snapshot)
+
+def mapInProcessPool(func, argList, numWorkers):
+    """
+    Call `func` on each element of `argList` using a pool of processes.
+    Since exceptions raised in another process may not survive the trip
+    back to this one, `func` should generally catch exceptions and return
+    an indication of success or failure.
+
+    :param func: (callable) a module-level function taking one argument
+    :param argList: (list) the arguments to pass to `func`, one per call
+    :param numWorkers: (int) the number of processes to create
+    :return: (list) the values returned by `func`, in the order of `argList`
+    """
+    from multiprocessing import Pool
+
+    pool = Pool(numWorkers, initializer=_initPoolWorker, initargs=_poolArgs())
+    try:
+        results = pool.map(func, argList, chunksize=1)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    return results
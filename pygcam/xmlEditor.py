@@ -24,22 +24,33 @@ import os
 import re
 import shutil
 import six
+from collections import defaultdict
+from contextlib import contextmanager
 from lxml import etree as ET
 from semver import VersionInfo
 
+from .cache import getCache
 from .config import getParam, getParamAsBoolean, parse_version_info, unixPath, pathjoin
 from .constants import LOCAL_XML_NAME, DYN_XML_NAME, GCAM_32_REGIONS
 from .error import SetupException, PygcamException
+from .fileStore import breakLink, storeCopy
 from .log import getLogger
 from .policy import (policyMarketXml, policyConstraintsXml, DEFAULT_MARKET_TYPE,
                      DEFAULT_POLICY_ELT, DEFAULT_POLICY_TYPE)
 from .utils import (coercible, mkdirs, printSeries, symlinkOrCopyFile, removeTreeSafely)
+from .xmlOutput import writeXmlTree
 
 # Names of key scenario components in reference GCAM 4.3 configuration.xml file
 ENERGY_TRANSFORMATION_TAG = "energy_transformation"
 SOLVER_TAG = "solver"
 
 AttributePattern = re.compile('(.*)/@([-\w]*)$')
+
+# The subset of XPath handled by XPathIndex: '//tag[pred]/tag[pred]/...', where
+# each pred is one or more @attr="value" tests joined by 'and' or by 'or'.
+_StepPattern = re.compile(r'([-\w]+)(?:\[(.*)\])?$')
+_TestPattern = re.compile(r"""\s*@([-\w]+)\s*=\s*(?:"([^"]*)"|'([^']*)')\s*$""")
+
 XmlDirPattern    = re.compile('/[^/]*-xml/')
 
 _logger = getLogger(__name__)
@@ -101,47 +112,318 @@ def copyIfMissing(src, dst, makedirs=False):
         shutil.copy(src, dst)
         os.chmod(dst, 0o644)
 
+def _compileStep(step):
+    """
+    Return a tuple of (tag, conjunction, tests) for one location step, where
+    tests is a list of (attr, value) pairs, or None if the step is not
+    in the subset handled by XPathIndex.
+    """
+    match = _StepPattern.match(step)
+    if not match:
+        return None
+
+    tag, pred = match.groups()
+    if not pred:
+        return (tag, 'and', [])
+
+    for conj in ('and', 'or'):
+        terms = re.split(r'\s+%s\s+' % conj, pred)
+        if len(terms) > 1:
+            break
+    else:
+        conj = 'and'
+
+    tests = []
+    for term in terms:
+        match = _TestPattern.match(term)
+        if not match:
+            return None     # e.g., mixed 'and' and 'or', text(), or an unquoted (numeric) value
+        attr, dquoted, squoted = match.groups()
+        tests.append((attr, squoted if dquoted is None else dquoted))
+
+    return (tag, conj, tests)
+
+_compiledXPaths = {}
+
+def _compileXPath(xpath):
+    """
+    Return the list of compiled steps for `xpath`, or None if it isn't in the
+    subset handled by XPathIndex. Results are cached since editors generate the
+    same few forms of xpath repeatedly.
+    """
+    try:
+        return _compiledXPaths[xpath]
+    except KeyError:
+        pass
+
+    steps = None
+    # Split on '/' outside of predicates; the values in GCAM xpaths don't contain '/'
+    if xpath.startswith('//') and '//' not in xpath[2:]:
+        parts = xpath[2:].split('/')
+        if '' not in parts:
+            steps = [_compileStep(part) for part in parts]
+            if None in steps:
+                steps = None
+
+    _compiledXPaths[xpath] = steps
+    return steps
+
+
+class XPathIndex(object):
+    """
+    Indexes the elements of a parsed XML tree so that xpaths of the form generated
+    by the editors, e.g., ``//region[@name="USA"]/supplysector[@name="refining"]/
+    subsector[@name="biomass liquids"]/stub-technology[@name="corn ethanol"]/
+    period[@year="2020"]/share-weight``, are resolved by dictionary lookups
+    rather than by scanning the whole tree. Elements are indexed by tag in a
+    single pass over the tree, and the children of each element reached are
+    indexed by tag and attribute value the first time they're needed.
+
+    The index must be discarded (see :py:meth:`CachedFile.invalidateIndex`) if
+    elements are added or removed, or if attributes are changed.
+    """
+    def __init__(self, tree):
+        self.byTag = defaultdict(list)
+        for elt in tree.iter():
+            if isinstance(elt.tag, six.string_types):   # skip comments and PIs
+                self.byTag[elt.tag].append(elt)
+
+        self.childMaps = {}     # {elt: {tag: [child, ...]}}
+        self.attrMaps  = {}     # {(elt, tag, attr): {value: [child, ...]}}
+
+    def _children(self, parent, tag):
+        if parent is None:
+            return self.byTag.get(tag, [])
+
+        childMap = self.childMaps.get(parent)
+        if childMap is None:
+            childMap = self.childMaps[parent] = defaultdict(list)
+            for child in parent:
+                if isinstance(child.tag, six.string_types):
+                    childMap[child.tag].append(child)
+
+        return childMap.get(tag, [])
+
+    def _lookup(self, parent, tag, attr, value):
+        key = (parent, tag, attr)
+        attrMap = self.attrMaps.get(key)
+        if attrMap is None:
+            attrMap = self.attrMaps[key] = defaultdict(list)
+            for elt in self._children(parent, tag):
+                attrMap[elt.get(attr)].append(elt)
+
+        return attrMap.get(value, [])
+
+    def _select(self, parent, step):
+        tag, conj, tests = step
+        if not tests:
+            return self._children(parent, tag)
+
+        if conj == 'and':
+            (attr, value), others = tests[0], tests[1:]
+            elts = self._lookup(parent, tag, attr, value)
+            return [elt for elt in elts if all([elt.get(a) == v for a, v in others])] if others else elts
+
+        if len(set([attr for attr, value in tests])) == 1:
+            # e.g., @name="a" or @name="b"; each element matches at most one value
+            elts = []
+            for attr, value in set(tests):
+                elts.extend(self._lookup(parent, tag, attr, value))
+            return elts
+
+        return [elt for elt in self._children(parent, tag)
+                if any([elt.get(a) == v for a, v in tests])]
+
+    def find(self, xpath):
+        """
+        Return the list of elements selected by `xpath`, or None if `xpath`
+        is not in the subset of XPath handled by the index. The elements are
+        not necessarily in document order.
+        """
+        steps = _compileXPath(xpath)
+        if steps is None:
+            return None
+
+        elts = self._select(None, steps[0])
+        for step in steps[1:]:
+            found = []
+            for elt in elts:
+                found.extend(self._select(elt, step))
+            elts = found
+
+        return elts
+
+
+def _evictFile(filename, item):
+    item.decache()      # write any unsaved edits
+
 class CachedFile(object):
     parser = ET.XMLParser(remove_blank_text=True)
 
-    # Store parsed XML trees here and use with xmlSel/xmlEdit if useCache is True
-    cache = {}
+    # Store parsed XML trees here and use with xmlSel/xmlEdit if useCache is True.
+    # The cache is bounded by GCAM.XmlCacheSizeMB, as measured by the size of the
+    # files; least-recently used files are written, if edited, and evicted.
+    cache = getCache('xml', sizeParam='GCAM.XmlCacheSizeMB', onEvict=_evictFile)
+
+    # Files with unsaved or queued edits, which are kept until written even if
+    # evicted from (or too large for) the cache.
+    dirty = {}
+
+    # If True, xmlEdit queues edits rather than applying them. See editSession().
+    deferEdits = False
 
     def __init__(self, filename):
         self.filename = filename
         self.edited = False
+        self.index = None
+        self.pending = []       # queued (pairs, op) tuples
 
         _logger.debug("Reading '%s'", filename)
-        self.tree = ET.parse(filename, self.parser)
-        self.cache[filename] = self
+        self._tree = ET.parse(filename, self.parser)
+        self.cache.put(filename, self, size=os.path.getsize(filename))
+
+    @property
+    def tree(self):
+        """
+        The parsed tree, with any queued edits applied. Since the caller may
+        modify the structure of the tree, the index is discarded.
+        """
+        self.applyEdits()
+        self.invalidateIndex()
+        return self._tree
 
     @classmethod
     def getFile(cls, filename):
-        if filename in cls.cache:
-            #_logger.debug("Found '%s' in cache", filename)
-            item = cls.cache[filename]
-        else:
+        item = cls.dirty.get(filename) or cls.cache.get(filename)
+        if item is None:
             item = CachedFile(filename)
 
         return item
 
     def setEdited(self):
         self.edited = True
+        self.dirty[self.filename] = self
+
+    def getIndex(self):
+        if self.index is None:
+            self.index = XPathIndex(self._tree)
+        return self.index
+
+    def invalidateIndex(self):
+        self.index = None
+
+    def find(self, xpath):
+        """
+        Return the elements selected by `xpath`, using the index if possible.
+        """
+        elts = self.getIndex().find(xpath)
+        return self._tree.xpath(xpath) if elts is None else elts
+
+    def queueEdits(self, pairs, op):
+        self.pending.append((list(pairs), op))
+        self.dirty[self.filename] = self
+
+    def applyEdits(self):
+        """
+        Apply all queued edits, in the order they were queued.
+
+        :return: (bool) True if any element was updated
+        """
+        pending, self.pending = self.pending, []
+
+        updated = False
+        for pairs, op in pending:
+            updated = self.edit(pairs, op) or updated
+
+        if updated:
+            self.setEdited()
+
+        return updated
+
+    def edit(self, pairs, op):
+        """
+        Apply the (xpath, value) `pairs` using operation `op`. See xmlEdit.
+
+        :return: (bool) True if any element was updated
+        """
+        modFunc = _editFunc[op]
+        updated = False
+
+        for xpath, value in pairs:
+            attr = None
+
+            # If it's an attribute update, extract the attribute
+            # and use the rest of the xpath to select the elements.
+            match = re.match(AttributePattern, xpath)
+            if match:
+                attr = match.group(2)
+                xpath = match.group(1)
+
+            elts = self.find(xpath)
+            if len(elts):
+                updated = True
+                if attr:                # conditional outside loop since there may be many elements
+                    value = str(value)
+                    for elt in elts:
+                        elt.set(attr, value)
+                    self.invalidateIndex()
+                else:
+                    for elt in elts:
+                        modFunc(elt, value)
+
+        return updated
 
     def write(self):
+        self.applyEdits()
         _logger.info("Writing '%s'", self.filename)
-        self.tree.write(self.filename, xml_declaration=True, encoding='utf-8', pretty_print=True)
+        breakLink(self.filename)    # don't modify a file shared with the file store
+        writeXmlTree(self._tree, self.filename)
         self.edited = False
+        self.dirty.pop(self.filename, None)
 
     def decache(self):
+        self.applyEdits()
         if self.edited:
             self.write()
+        else:
+            self.dirty.pop(self.filename, None)
 
     @classmethod
     def decacheAll(cls):
-        for item in cls.cache.values():
+        """
+        Write all files with unsaved edits. Unedited files are not rewritten.
+        """
+        for item in list(cls.dirty.values()):
             item.decache()
 
+    @classmethod
+    def applyAllEdits(cls):
+        for item in list(cls.dirty.values()):
+            item.applyEdits()
+
+@contextmanager
+def editSession():
+    """
+    Context manager that defers the edits made by xmlEdit to cached files until
+    the end of the session, when the edits queued for each file are applied
+    together using the file's XPathIndex. Queued edits are also applied before
+    a file's tree is otherwise accessed or written. Usage is
+    ``with editSession(): ...``
+
+    :return: none
+    """
+    if CachedFile.deferEdits:      # already in a session
+        yield
+        return
+
+    CachedFile.deferEdits = True
+    try:
+        yield
+    finally:
+        CachedFile.deferEdits = False
+
+    CachedFile.applyAllEdits()
+
 
 def xmlSel(filename, xpath, asText=False):
     """
@@ -196,41 +478,23 @@ def xmlEdit(filename, pairs, op='set', useCache=True):
     :param useCache: (bool) if True, the etree is sought first in the XmlCache. This
       avoids repeated parsing, but the file is always written (eventually) if updated
       by this function.
-    :return: True on success, else False
+    :return: True on success, else False. If called within an :py:func:`editSession`
+      (and `useCache` is True), the edits are queued and None is returned.
     """
     legalOps = _editFunc.keys()
 
     if op not in legalOps:
         raise PygcamException('xmlEdit: unknown operation "{}". Must be one of {}'.format(op, legalOps))
 
-    modFunc = _editFunc[op]
-
     item = CachedFile.getFile(filename)
-    tree = item.tree
-
-    updated = False
-
-    # if at least one xpath is found, update and write file
-    for xpath, value in pairs:
-        attr = None
-
-        # If it's an attribute update, extract the attribute
-        # and use the rest of the xpath to select the elements.
-        match = re.match(AttributePattern, xpath)
-        if match:
-            attr = match.group(2)
-            xpath = match.group(1)
-
-        elts = tree.xpath(xpath)
-        if len(elts):
-            updated = True
-            if attr:                # conditional outside loop since there may be many elements
-                value = str(value)
-                for elt in elts:
-                    elt.set(attr, value)
-            else:
-                for elt in elts:
-                    modFunc(elt, value)
+
+    if useCache and CachedFile.deferEdits:
+        item.queueEdits(pairs, op)
+        return None
+
+    # Apply any queued edits first to preserve the order of operations
+    updated = item.applyEdits()
+    updated = item.edit(pairs, op) or updated
 
     if updated:
         if useCache:
@@ -298,7 +562,7 @@ def extractStubTechnology(region, srcFile, dstFile, sector, subsector, technolog
 
     _logger.info("Writing '%s'", dstFile)
     newTree = ET.ElementTree(scenarioElt)
-    newTree.write(dstFile, xml_declaration=True, pretty_print=True)
+    writeXmlTree(newTree, dstFile)
 
     return True
 
@@ -576,7 +840,7 @@ class XMLEditor(object):
         if xmlFiles:
             _logger.info("Copy {} static XML files from {} to {}".format(len(xmlFiles), topDir, scenDir))
             for src in xmlFiles:
-                shutil.copy2(src, scenDir)     # copy2 preserves metadata, e.g., timestamp
+                storeCopy(src, scenDir)     # links from the file store, if configured, else copies
         else:
             _logger.info("No XML files to copy in %s", unixPath(topDir, abspath=True))
 
@@ -639,11 +903,13 @@ class XMLEditor(object):
         _logger.debug('Called XMLEditor.setup(%s)', args)
         self.setupArgs = args   # some subclasses/functions might want access to these
 
-        if not args.dynamicOnly:
-            self.setupStatic(args)
+        # Edits made by the scenario's editors are queued and applied per file
+        with editSession():
+            if not args.dynamicOnly:
+                self.setupStatic(args)
 
-        if not args.staticOnly:
-            self.setupDynamic(args)
+            if not args.staticOnly:
+                self.setupDynamic(args)
 
         CachedFile.decacheAll()
 
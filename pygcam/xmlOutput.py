@@ -0,0 +1,136 @@
+'''
+.. Functions for writing the XML files read by GCAM. Whole trees are written
+   compactly unless pretty-printing is requested, and generated files can be
+   written incrementally, without building a tree first.
+
+.. Copyright (c) 2016 Richard Plevin
+   See the https://opensource.org/licenses/MIT for license details.
+'''
+from contextlib import contextmanager
+from io import BytesIO
+from lxml import etree as ET
+
+from .config import getParamAsBoolean
+
+INDENT = '    '
+
+def prettyPrint(pretty=None):
+    """
+    Return `pretty` if it's not None, otherwise the value of config
+    variable ``GCAM.PrettyPrintXml``.
+    """
+    return getParamAsBoolean('GCAM.PrettyPrintXml') if pretty is None else pretty
+
+def writeXmlTree(tree, filename, pretty=None):
+    """
+    Write the ElementTree `tree` to `filename`, with an XML declaration and
+    utf-8 encoding. GCAM doesn't need the whitespace added by pretty-printing,
+    which for large files takes much of the time spent writing.
+
+    :param tree: (lxml.etree.ElementTree) the tree to write
+    :param filename: (str) the pathname of the file to create
+    :param pretty: (bool) whether to pretty-print the XML, or None to use the
+        value of config variable ``GCAM.PrettyPrintXml``
+    :return: none
+    """
+    tree.write(filename, xml_declaration=True, encoding='utf-8', pretty_print=prettyPrint(pretty))
+
+
+class XMLWriter(object):
+    """
+    Writes an XML document incrementally, using lxml's ``xmlfile``. Elements
+    with children are written using :py:meth:`element` as a context manager;
+    elements with only text are written with :py:meth:`leaf`. See
+    :py:func:`xmlWriter` for an example.
+    """
+    def __init__(self, xf, pretty):
+        self.xf = xf
+        self.pretty = pretty
+        self.hasChildren = [False]      # one entry per open element, plus the document
+
+    def _startChild(self):
+        self.hasChildren[-1] = True
+        if self.pretty and len(self.hasChildren) > 1:
+            self.xf.write('\n' + INDENT * (len(self.hasChildren) - 1))
+
+    @contextmanager
+    def element(self, tag, attrib=None, **extra):
+        """
+        Write the start tag of element `tag` and, on exiting the context, the end tag.
+
+        :param tag: (str) the element's tag
+        :param attrib: (dict) the element's attributes, if any, in addition to
+            those passed as keyword arguments.
+        :return: self
+        """
+        self._startChild()
+        with self.xf.element(tag, attrib or {}, **extra):
+            self.hasChildren.append(False)
+            yield self
+
+            if self.hasChildren.pop() and self.pretty:
+                self.xf.write('\n' + INDENT * (len(self.hasChildren) - 1))
+
+    def leaf(self, tag, text=None, attrib=None, **extra):
+        """
+        Write the element `tag` with the given `text` and attributes.
+
+        :param tag: (str) the element's tag
+        :param text: (any) the element's text, converted with str(), or None
+        :param attrib: (dict) the element's attributes, if any, in addition to
+            those passed as keyword arguments.
+        :return: none
+        """
+        elt = ET.Element(tag, attrib or {}, **extra)
+        if text is not None:
+            elt.text = str(text)
+
+        self._startChild()
+        self.xf.write(elt)
+
+    def write(self, elt):
+        """
+        Write the element `elt`, including its children.
+        """
+        if self.pretty:
+            ET.indent(elt, space=INDENT, level=len(self.hasChildren) - 1)
+
+        self._startChild()
+        self.xf.write(elt)
+
+    def comment(self, text):
+        self._startChild()
+        self.xf.write(ET.Comment(text))
+
+@contextmanager
+def xmlWriter(output, pretty=None):
+    """
+    Context manager returning an :py:class:`XMLWriter` that writes an XML
+    document, with an XML declaration and utf-8 encoding, to `output`. Usage is::
+
+        with xmlWriter(filename) as writer:
+            with writer.element('scenario'):
+                with writer.element('world'):
+                    writer.leaf('market', 'global')
+
+    :param output: (str or file) a pathname, or a file object opened for binary writing
+    :param pretty: (bool) whether to indent the XML, or None to use the value
+        of config variable ``GCAM.PrettyPrintXml``
+    :return: (XMLWriter) the writer
+    """
+    with ET.xmlfile(output, encoding='utf-8') as xf:
+        xf.write_declaration()
+        yield XMLWriter(xf, prettyPrint(pretty))
+
+def xmlText(func, *args, **kwargs):
+    """
+    Return as a string the XML document written by ``func(writer, *args, **kwargs)``,
+    where `writer` is an :py:class:`XMLWriter`. The keyword argument `pretty`, if
+    given, is passed to :py:func:`xmlWriter` rather than to `func`.
+    """
+    pretty = kwargs.pop('pretty', None)
+    buf = BytesIO()
+    with xmlWriter(buf, pretty=pretty) as writer:
+        func(writer, *args, **kwargs)
+
+    return buf.getvalue().decode('utf-8')
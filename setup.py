@@ -28,7 +28,7 @@ py3_deps = [
 
 common_deps = [
     'future>=0.16.0',
-    'lxml>=4.2.5',
+    'lxml>=4.5.0',     # for lxml.etree.indent
     'numpy>=1.15.2',
     'pandas>=0.23.3',
     'seaborn>=0.9.0',
@@ -0,0 +1,106 @@
+import sys
+from unittest import TestCase
+
+import pandas as pd
+
+from pygcam.cache import LRUCache, getCache, sizeOf
+from pygcam.config import getParam, setParam
+
+class TestCache(TestCase):
+    def setUp(self):
+        self.names = []
+        self.savedSize = getParam('GCAM.CsvCacheSizeMB')
+
+    def tearDown(self):
+        setParam('GCAM.CsvCacheSizeMB', self.savedSize)
+        for name in self.names:
+            LRUCache.Instances.pop(name, None)
+
+    def newCache(self, name, **kwargs):
+        self.names.append(name)
+        return LRUCache(name, **kwargs)
+
+    def test_evictionOrder(self):
+        evicted = []
+        cache = self.newCache('test-lru', maxBytes=30, onEvict=lambda key, value: evicted.append((key, value)))
+
+        for key in 'abc':
+            cache.put(key, key.upper(), size=10)
+
+        self.assertEqual(cache.get('a'), 'A')   # 'b' is now least recently used
+        cache.put('d', 'D', size=10)
+
+        self.assertEqual(evicted, [('b', 'B')])
+        self.assertEqual(list(cache.entries.keys()), ['c', 'a', 'd'])
+        self.assertIsNone(cache.get('b'))
+
+        # a large entry evicts as many entries as needed, oldest first
+        cache.put('e', 'E', size=25)
+        self.assertEqual(evicted, [('b', 'B'), ('c', 'C'), ('a', 'A'), ('d', 'D')])
+        self.assertEqual(list(cache.entries.keys()), ['e'])
+
+        # values larger than the capacity aren't stored, and evict nothing
+        cache.put('f', 'F', size=31)
+        self.assertNotIn('f', cache)
+        self.assertEqual(len(evicted), 4)
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 1, 4))
+
+    def test_byteAccounting(self):
+        cache = self.newCache('test-bytes', maxBytes=100)
+
+        cache.put('a', 1, size=40)
+        cache.put('b', 2, size=30)
+        self.assertEqual(cache.currentBytes, 70)
+
+        cache.put('a', 3, size=10)      # replacing an entry replaces its size
+        self.assertEqual(cache.currentBytes, 40)
+        self.assertEqual(len(cache), 2)
+
+        cache.remove('b')
+        cache.remove('missing')
+        self.assertEqual(cache.currentBytes, 10)
+
+        # sizes are estimated if not given; a capacity of 0 means no limit
+        df = pd.DataFrame({'x': range(100)})
+        unlimited = self.newCache('test-unlimited', maxBytes=0)
+        unlimited.put('df', df)
+        self.assertEqual(unlimited.currentBytes, df.memory_usage(deep=True).sum())
+
+    def test_lazyMaxBytes(self):
+        setParam('GCAM.CsvCacheSizeMB', '1')
+        cache = self.newCache('test-lazy', sizeParam='GCAM.CsvCacheSizeMB')
+
+        # the capacity is read when the cache is first used, not when created
+        setParam('GCAM.CsvCacheSizeMB', '0.5')
+        self.assertEqual(cache.maxBytes, 512 * 1024)
+
+        setParam('GCAM.CsvCacheSizeMB', '2')
+        self.assertEqual(cache.maxBytes, 512 * 1024)
+
+        setParam('GCAM.CsvCacheSizeMB', '0')
+        unlimited = self.newCache('test-zero', sizeParam='GCAM.CsvCacheSizeMB')
+        self.assertEqual(unlimited.maxBytes, 0)
+        unlimited.put('a', 'A', size=10 ** 12)
+        self.assertIn('a', unlimited)
+
+    def test_getCache(self):
+        self.names.append('test-get')
+        cache = getCache('test-get', sizeParam='GCAM.CsvCacheSizeMB')
+        self.assertIs(getCache('test-get'), cache)
+
+    def test_sizeOf(self):
+        df = pd.DataFrame({'x': range(1000)})
+        dfSize = sizeOf(df)
+
+        self.assertEqual(dfSize, df.memory_usage(deep=True).sum())
+        self.assertEqual(sizeOf(df.values), df.values.nbytes)
+
+        # containers are measured recursively, counting shared objects once
+        values = [df, (df, 'abc')]
+        self.assertGreater(sizeOf(values), dfSize)
+        self.assertLess(sizeOf(values), 2 * dfSize)
+
+        text = 'x' * 10000
+        self.assertGreater(sizeOf({'key': text}), sys.getsizeof(text))
@@ -0,0 +1,91 @@
+import argparse
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pygcam.built_ins.chart_plugin import ChartCommand
+from pygcam.chart import chartJobs, chartMain, renderCharts, plotStackedTimeSeries
+from pygcam.error import PygcamException
+
+CsvData = '''energy results
+region,2010,2015,2020
+USA,10,12,14
+USA,5,6,7
+China,20,25,30
+China,2,3,4
+'''
+
+class TestChart(TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpDir = tempfile.mkdtemp()
+        self.csvFile = os.path.join(self.tmpDir, 'energy.csv')
+        with open(self.csvFile, 'w') as f:
+            f.write(CsvData)
+
+        self.outputDir = os.path.join(self.tmpDir, 'figures')
+
+        parser = argparse.ArgumentParser()
+        subparsers = parser.add_subparsers(dest='subcommand')
+        self.command = ChartCommand(subparsers)
+        self.parser = parser
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def parseArgs(self, *args):
+        return self.parser.parse_args(['chart', '--outputDir', self.outputDir] + list(args))
+
+    def images(self):
+        return sorted(os.listdir(self.outputDir))
+
+    def test_chartJobs(self):
+        jobs = chartJobs(self.parseArgs(self.csvFile))
+        self.assertEqual(len(jobs), 1)
+
+        func, posArgs, kwargs = jobs[0]
+        self.assertIs(func, plotStackedTimeSeries)
+        self.assertEqual(posArgs[0].shape[0], 4)
+        self.assertEqual(kwargs['outFile'], os.path.join(self.outputDir, 'energy.png'))
+
+        # one job per region, in the order the regions appear in the file
+        jobs = chartJobs(self.parseArgs(self.csvFile, '--byRegion', '--title', 'Energy'), num=3)
+        self.assertEqual([kwargs['title'] for _, _, kwargs in jobs], ['Energy (USA)', 'Energy (China)'])
+        self.assertEqual([os.path.basename(kwargs['outFile']) for _, _, kwargs in jobs],
+                         ['3-energy-USA.png', '3-energy-China.png'])
+        self.assertEqual([posArgs[0].shape[0] for _, posArgs, _ in jobs], [2, 2])
+
+        # negation applies to the job's copy of the data, not the cached CSV
+        jobs = chartJobs(self.parseArgs(self.csvFile), negate=True)
+        df = jobs[0][1][0]
+        self.assertEqual(df['2010'].tolist(), [-10, -5, -20, -2])
+        self.assertTrue(jobs[0][2]['outFile'].endswith('energy-negated.png'))
+        self.assertEqual(chartJobs(self.parseArgs(self.csvFile))[0][1][0]['2010'].tolist(), [10, 5, 20, 2])
+
+    def test_renderCharts(self):
+        for numWorkers in (1, 2):
+            shutil.rmtree(self.outputDir, ignore_errors=True)
+            jobs = chartJobs(self.parseArgs(self.csvFile, '--byRegion'))
+            renderCharts(jobs, numWorkers=numWorkers)
+            self.assertEqual(self.images(), ['energy-China.png', 'energy-USA.png'])
+
+        # errors in worker processes are reported
+        jobs = chartJobs(self.parseArgs(self.csvFile, '--byRegion', '--indexCol', 'missing'))
+        self.assertRaises(PygcamException, renderCharts, jobs, numWorkers=2)
+
+    def test_fromFileExit(self):
+        cmdFile = os.path.join(self.tmpDir, 'charts.txt')
+        with open(cmdFile, 'w') as f:
+            f.write('# charts to render\n')
+            f.write('energy.csv --suffix {scenario}.png\n')
+            f.write('exit\n')
+            f.write('energy.csv --suffix never.png\n')
+
+        args = self.parseArgs('--fromFile', cmdFile, '--workingDir', self.tmpDir,
+                              '--scenario', 'base,policy', '--workers', '1')
+        chartMain(args, None, self.command.parser)
+
+        # charts before "exit" are rendered, for the first scenario only
+        self.assertEqual(self.images(), ['energy-base.png'])
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from pygcam.config import getParam, setParam
+from pygcam.error import ConfigFileError
+from pygcam.query import (readCsv, readColumnar, writeColumnar, saveColumnarCopy,
+                          columnarFormat, columnarPathname)
+
+CsvData = '''energy results
+region,Units,2010,2015
+USA,EJ,10.5,20.25
+China,EJ,40.0,50.5
+'''
+
+class TestColumnar(TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.csvPath = os.path.join(self.tmpDir, 'energy-base.csv')
+        with open(self.csvPath, 'w') as f:
+            f.write(CsvData)
+
+        self.savedFormat = getParam('GCAM.ColumnarFormat')
+
+    def tearDown(self):
+        setParam('GCAM.ColumnarFormat', self.savedFormat)
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def setMtime(self, path, offset):
+        mtime = time.time() + offset
+        os.utime(path, (mtime, mtime))
+
+    def roundTrip(self, fmt):
+        setParam('GCAM.ColumnarFormat', fmt)
+        expected = readCsv(self.csvPath)
+
+        sidecar = saveColumnarCopy(self.csvPath)
+        self.assertEqual(sidecar, columnarPathname(self.csvPath, fmt.lower()))
+        self.assertTrue(os.path.exists(sidecar))
+
+        df = readColumnar(self.csvPath)
+        self.assertEqual(df.to_dict('list'), expected.to_dict('list'))
+
+        # readCsv uses the sidecar file in preference to the CSV file
+        changed = expected.copy()
+        changed['2010'] = [1.0, 2.0]
+        writeColumnar(changed, self.csvPath)
+        self.assertEqual(readCsv(self.csvPath)['2010'].tolist(), [1.0, 2.0])
+
+        # ...unless the CSV file is newer, or rows other than one are skipped
+        self.setMtime(sidecar, -10)
+        self.assertIsNone(readColumnar(self.csvPath))
+        self.assertEqual(readCsv(self.csvPath)['2010'].tolist(), [10.5, 40.0])
+
+        self.setMtime(sidecar, 10)
+        self.assertEqual(readCsv(self.csvPath, skiprows=0).shape[0], 3)
+
+    def test_feather(self):
+        self.roundTrip('feather')
+
+    def test_parquet(self):
+        self.roundTrip('Parquet')
+
+    def test_disabled(self):
+        setParam('GCAM.ColumnarFormat', '')
+        self.assertIsNone(columnarFormat())
+        self.assertIsNone(saveColumnarCopy(self.csvPath))
+        self.assertIsNone(readColumnar(self.csvPath))
+        self.assertEqual(os.listdir(self.tmpDir), ['energy-base.csv'])
+
+        setParam('GCAM.ColumnarFormat', 'hdf5')
+        self.assertRaises(ConfigFileError, columnarFormat)
@@ -0,0 +1,58 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pygcam.config import (getConfig, getParam, setParam, getSection, getSections, getConfigSnapshot,
+                           setConfigSnapshot, writeConfigSnapshot, readConfigSnapshot, DEFAULT_SECTION)
+
+class TestConfig(TestCase):
+    def setUp(self):
+        getConfig()
+        self.saved = getConfigSnapshot()
+        self.tmpDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        setConfigSnapshot(self.saved)
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_memo(self):
+        setParam('Test.Dir', '/a', section=DEFAULT_SECTION)
+        setParam('Test.Path', '%(Test.Dir)s/b', section=DEFAULT_SECTION)
+        self.assertEqual(getParam('Test.Path'), '/a/b')
+        self.assertEqual(getParam('Test.Path', raw=True), '%(Test.Dir)s/b')
+
+        # changing a referenced value invalidates the memo
+        setParam('Test.Dir', '/c', section=DEFAULT_SECTION)
+        self.assertEqual(getParam('Test.Path'), '/c/b')
+
+    def test_snapshot(self):
+        setParam('Test.Percent', '100%%', section=DEFAULT_SECTION)
+        setParam('Test.Path', '%(Home)s/x', section=DEFAULT_SECTION)
+        expected = {name: getParam(name) for name in ('Test.Percent', 'Test.Path', 'GCAM.ProjectName', '$HOME')}
+
+        # round-trip through JSON, as for a subprocess
+        snapshot = json.loads(json.dumps(getConfigSnapshot()))
+        getConfig(reload=True)
+        setConfigSnapshot(snapshot)
+
+        self.assertEqual(getSection(), self.saved['section'])
+        self.assertEqual(set(getSections()), set(self.saved['sections']))
+        for name, value in expected.items():
+            self.assertEqual(getParam(name), value)
+
+        self.assertEqual(getParam('Test.Percent'), '100%')
+
+        # the restored config is live: values set later are interpolated
+        setParam('Home', '/elsewhere', section=DEFAULT_SECTION)
+        self.assertEqual(getParam('Test.Path'), '/elsewhere/x')
+
+    def test_snapshotFile(self):
+        filename = os.path.join(self.tmpDir, 'snapshot.json')
+        setParam('Test.Value', '42', section=DEFAULT_SECTION)
+        writeConfigSnapshot(filename)
+
+        setParam('Test.Value', '0', section=DEFAULT_SECTION)
+        readConfigSnapshot(filename)
+        self.assertEqual(getParam('Test.Value'), '42')
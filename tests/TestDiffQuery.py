@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pygcam.diff import computeDifference, diffQuery, diffQueries, diffCsvPathname, queryCsvPathname
+from pygcam.error import PygcamException
+from pygcam.query import readCsv
+from pygcam.utils import mkdirs
+
+# Integer year values, as in some query results
+Results = {
+    'base': [('USA', 'EJ', 10, 20), ('China', 'EJ', 40, 50)],
+    'pol1': [('USA', 'EJ', 15, 30), ('China', 'EJ', 20, 50)],
+    'pol2': [('USA', 'EJ', 10, 10), ('China', 'EJ', 60, 75)],
+}
+
+class TestDiffQuery(TestCase):
+    def setUp(self):
+        self.workingDir = tempfile.mkdtemp()
+        self.queries = ['energy', 'land']
+
+        for query in self.queries:
+            for scenario, rows in Results.items():
+                path = queryCsvPathname(query, scenario, workingDir=self.workingDir)
+                mkdirs(os.path.dirname(path))
+                with open(path, 'w') as f:
+                    f.write('%s results\nregion,Units,2010,2015\n' % query)
+                    for row in rows:
+                        f.write('%s,%s,%d,%d\n' % row)
+
+    def tearDown(self):
+        shutil.rmtree(self.workingDir, ignore_errors=True)
+
+    def readDiff(self, query, policy, asPercentChange=False):
+        path = diffCsvPathname(query, 'base', policy, workingDir=self.workingDir,
+                               asPercentChange=asPercentChange)
+        df = readCsv(path)
+        return df.set_index('region')[['2010', '2015']].to_dict('index')
+
+    def test_percentChange(self):
+        base = readCsv(queryCsvPathname('energy', 'base', workingDir=self.workingDir))
+        pol1 = readCsv(queryCsvPathname('energy', 'pol1', workingDir=self.workingDir))
+
+        diff = computeDifference(base, pol1, asPercentChange=True)
+        self.assertEqual(diff.set_index('region')['2010'].to_dict(), {'USA': 0.5, 'China': -0.5})
+
+    def test_diffQuery(self):
+        outFiles = diffQuery('energy', 'base', ['pol1', 'pol2'], workingDir=self.workingDir)
+        self.assertEqual(len(outFiles), 2)
+
+        self.assertEqual(self.readDiff('energy', 'pol1'),
+                         {'USA': {'2010': 5, '2015': 10}, 'China': {'2010': -20, '2015': 0}})
+        self.assertEqual(self.readDiff('energy', 'pol2'),
+                         {'USA': {'2010': 0, '2015': -10}, 'China': {'2010': 20, '2015': 25}})
+
+    def test_diffQueries(self):
+        diffQueries(self.queries, 'base', ['pol1', 'pol2'], numWorkers=2,
+                    workingDir=self.workingDir, asPercentChange=True)
+
+        for query in self.queries:
+            self.assertEqual(self.readDiff(query, 'pol2', asPercentChange=True),
+                             {'USA': {'2010': 0.0, '2015': -0.5}, 'China': {'2010': 0.5, '2015': 0.5}})
+
+        # errors in worker processes are reported
+        self.assertRaises(PygcamException, diffQueries, ['energy', 'missing'], 'base', ['pol1'],
+                          numWorkers=2, workingDir=self.workingDir)
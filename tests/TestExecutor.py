@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from six.moves.queue import Queue
+
+from pygcam.mcs.executor import LocalExecutor
+
+def record(context, argDict):
+    name, delay = context
+    time.sleep(delay)
+    with open(argDict['logFile'], 'a') as f:
+        f.write(name + '\n')
+
+    if name == 'bad':
+        raise ValueError('bad trial')
+
+    return name
+
+class TestExecutor(TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.argDict = {'logFile': os.path.join(self.tmpDir, 'order.txt')}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_localExecutor(self):
+        executor = LocalExecutor(2)
+        completed = Queue()
+        try:
+            base  = executor.submit(record, ('base', 0.3), self.argDict)
+            pol   = executor.submit(record, ('policy', 0), self.argDict, after=base)
+            other = executor.submit(record, ('bad', 0), self.argDict)
+
+            tasks = [base, pol, other]
+            for task in tasks:
+                task.add_done_callback(completed.put)
+
+            done = [completed.get(timeout=10) for _ in tasks]
+        finally:
+            executor.shutdown()
+
+        self.assertEqual(set([task.msg_ids[0] for task in done]), set([task.msg_ids[0] for task in tasks]))
+        self.assertEqual(base.get(), ['base'])
+        self.assertEqual(pol.get(), ['policy'])
+        self.assertRaises(RuntimeError, other.get)
+
+        with open(self.argDict['logFile']) as f:
+            order = f.read().split()
+
+        # the policy waits for its baseline; the independent task doesn't
+        self.assertEqual(order, ['bad', 'base', 'policy'])
+
+    def test_failedDependency(self):
+        executor = LocalExecutor(1)
+        completed = Queue()
+        try:
+            base = executor.submit(record, ('bad', 0.2), self.argDict)
+            pol  = executor.submit(record, ('policy', 0), self.argDict, after=base)
+            pol.add_done_callback(completed.put)
+            completed.get(timeout=10)
+        finally:
+            executor.shutdown()
+
+        self.assertRaises(RuntimeError, base.get)
+        self.assertRaises(RuntimeError, pol.get)
+
+        with open(self.argDict['logFile']) as f:
+            order = f.read().split()
+
+        # the policy isn't run when its baseline fails
+        self.assertEqual(order, ['bad'])
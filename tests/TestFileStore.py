@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pygcam.fileStore import FileStore, breakLink
+
+class TestFileStore(TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.store = FileStore(os.path.join(self.tmpDir, 'store'))
+
+        self.srcDir = os.path.join(self.tmpDir, 'src')
+        os.makedirs(os.path.join(self.srcDir, 'sub'))
+        for name, text in (('a.xml', 'aaa'), ('b.xml', 'aaa'), ('sub/c.xml', 'ccc')):
+            with open(os.path.join(self.srcDir, name), 'w') as f:
+                f.write(text)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_deduplication(self):
+        objA = self.store.add(os.path.join(self.srcDir, 'a.xml'))
+        objB = self.store.add(os.path.join(self.srcDir, 'b.xml'))
+        self.assertEqual(objA, objB)
+        self.assertEqual(self.read(objA), 'aaa')
+
+    def test_materializeTree(self):
+        dst = os.path.join(self.tmpDir, 'dst')
+        self.store.materializeTree(self.srcDir, dst)
+        self.assertEqual(self.read(os.path.join(dst, 'sub', 'c.xml')), 'ccc')
+
+        # Rewriting a materialized file after breaking the link must not alter the store
+        path = os.path.join(dst, 'a.xml')
+        breakLink(path)
+        with open(path, 'w') as f:
+            f.write('zzz')
+
+        self.assertEqual(self.read(os.path.join(self.tmpDir, 'src', 'b.xml')), 'aaa')
+        dst2 = os.path.join(self.tmpDir, 'dst2')
+        self.store.materialize(os.path.join(self.srcDir, 'b.xml'), dst2)
+        self.assertEqual(self.read(dst2), 'aaa')
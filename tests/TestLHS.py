@@ -0,0 +1,101 @@
+from unittest import TestCase
+
+import numpy as np
+from scipy import stats
+
+from pygcam.mcs.LHS import lhs, rankCorrCoef
+
+class Param(object):
+    '''Stands in for XMLRandomVar'''
+    def __init__(self, rv, distroName='normal'):
+        self.rv = rv
+        self.param = self                   # for param.param.dataSrc.distroName
+        self.dataSrc = self
+        self.distroName = distroName
+
+    def ppf(self, q):
+        return self.rv.ppf(q)
+
+    def getFrozenRV(self):
+        return self.rv
+
+class Grid(object):
+    '''Like distro.GridRV, its ppf consumes random numbers'''
+    def ppf(self, q):
+        values = np.tile(np.linspace(0, 1, 4), len(q))[:len(q)]
+        np.random.shuffle(values)
+        return values
+
+def legacyRankCorrCoef(m):
+    cols = m.shape[1]
+    corrCoef = np.zeros((cols, cols))
+    for i in range(cols):
+        corrCoef[i, i] = 1.
+        for j in range(i + 1, cols):
+            corrCoef[i, j] = corrCoef[j, i] = stats.spearmanr(m[:, i], m[:, j])[0]
+    return corrCoef
+
+def legacyLhs(paramList, trials, corrMat=None):
+    '''The implementation prior to vectorization, used as the reference'''
+    ranks = None
+    if corrMat is not None:
+        params = len(paramList)
+        strata = np.arange(1.0, trials + 1) / (trials + 1)
+        vdwScores = stats.norm().ppf(strata)
+        S = np.zeros((trials, params))
+        for i in range(params):
+            np.random.shuffle(vdwScores)
+            S[:, i] = vdwScores
+
+        P = np.linalg.cholesky(corrMat)
+        Q = np.array(np.linalg.cholesky(legacyRankCorrCoef(S)))
+        final = np.dot(np.dot(S, np.linalg.inv(Q).T), P.T)
+        ranks = np.zeros((trials, params), dtype='i')
+        for i in range(params):
+            ranks[:, i] = stats.rankdata(final[:, i])
+
+    samples = np.zeros((trials, len(paramList)))
+    for i, param in enumerate(paramList):
+        segmentSize = 1. / trials
+        points = stats.uniform.rvs(size=trials) * segmentSize + np.arange(trials) * segmentSize
+        values = param.ppf(points)
+        if corrMat is None:
+            if param.param.dataSrc.distroName != 'sequence':
+                np.random.shuffle(values)
+        else:
+            values = values[ranks[:, i] - 1]
+        samples[:, i] = values
+
+    return samples
+
+class TestLHS(TestCase):
+    def params(self):
+        return [Param(stats.norm(loc=1, scale=0.2)),
+                Param(stats.uniform(loc=0.8, scale=0.4)),
+                Param(stats.norm(loc=5, scale=2)),
+                Param(Grid(), distroName='grid'),
+                Param(stats.triang(0.5, loc=0, scale=2)),
+                Param(stats.uniform(loc=-1, scale=2)),
+                Param(stats.norm(loc=0, scale=1), distroName='sequence')]
+
+    def corrMat(self, n):
+        corrMat = np.identity(n)
+        corrMat[0, 2] = corrMat[2, 0] = 0.6
+        corrMat[1, 4] = corrMat[4, 1] = -0.4
+        return corrMat
+
+    def test_rankCorrCoef(self):
+        np.random.seed(1)
+        m = np.random.random((200, 6))
+        np.testing.assert_allclose(rankCorrCoef(m), legacyRankCorrCoef(m), atol=1e-12)
+
+    def test_identical(self):
+        trials = 500
+        for corrMat in (None, self.corrMat(7)):
+            np.random.seed(42)
+            expected = legacyLhs(self.params(), trials, corrMat=corrMat)
+
+            np.random.seed(42)
+            actual = lhs(self.params(), trials, corrMat=corrMat)
+
+            np.testing.assert_array_equal(actual, expected)
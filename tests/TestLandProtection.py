@@ -1,7 +1,9 @@
 import unittest
 import os
 import subprocess
-from pygcam.landProtection import _makeLandClassXpath, _makeRegionXpath, protectLand, runProtectionScenario
+from lxml import etree as ET
+from pygcam.landProtection import (_makeLandClassXpath, _makeRegionXpath, protectLand,
+                                   runProtectionScenario, LandTree)
 from pygcam.windows import IsWindows
 
 class TestLandProtection(unittest.TestCase):
@@ -39,6 +41,33 @@ class TestLandProtection(unittest.TestCase):
             xpath = _makeLandClassXpath(value)
             self.assertEqual(xpath, expected, 'Expected\n\t%s\ngot\n\t%s' % (expected, xpath))
 
+    def test_landTree(self):
+        def leaf(name, values):
+            # historical allocations, then the calibration-year landAllocations
+            xml = ''.join(['<allocation year="%d">%s</allocation>' % pair for pair in values[:1]] +
+                          ['<landAllocation year="%d">%s</landAllocation>' % pair for pair in values[1:]])
+            return '<UnmanagedLandLeaf name="%s">%s</UnmanagedLandLeaf>' % (name, xml)
+
+        xml = '<world>%s</world>' % ''.join(
+            ['<region name="%s"><LandNode name="All">%s%s%s%s</LandNode></region>' %
+             (reg, leaf('Shrubland_Basin1', [(1950, 6.0), (2010, 10.0)]),
+                   leaf('ProtectedShrubland_Basin1', [(1950, 2.0), (2010, 2.0)]),
+                   leaf('Grassland_Basin2', [(1950, 4.0), (2010, 4.0)]),
+                   leaf('ProtectedGrassland_Basin2', [(1950, 1.0), (2010, 1.0)])) for reg in ('USA', 'China')])
+
+        tree = ET.ElementTree(ET.fromstring(xml))
+        landTree = LandTree(tree)
+        landTree.protect({'USA': [('Shrubland', None, 0.5), ('Grassland', 'Basin2', 0.2)]})
+
+        def values(reg, name):
+            return [float(node.text) for node in landTree.leaf(reg, name).iter('allocation', 'landAllocation')]
+
+        self.assertEqual(values('USA', 'ProtectedShrubland_Basin1'), [4.0, 6.0])
+        self.assertEqual(values('USA', 'Shrubland_Basin1'), [4.0, 6.0])
+        self.assertEqual(values('USA', 'ProtectedGrassland_Basin2'), [1.0, 1.0])
+        self.assertEqual(values('USA', 'Grassland_Basin2'), [4.0, 4.0])
+        self.assertEqual(values('China', 'ProtectedShrubland_Basin1'), [2.0, 2.0])
+
     def test_createProtected_land_2(self):
         protectedFraction = 0.9
         classes = ['UnmanagedPasture', 'UnmanagedForest', 'Shrubland']
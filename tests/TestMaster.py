@@ -0,0 +1,150 @@
+from argparse import Namespace
+from unittest import TestCase
+
+from six.moves.queue import Queue
+
+from pygcam.mcs.Database import RUN_SUCCEEDED, RUN_ABORTED
+from pygcam.mcs.master import Master
+
+class StubContext(object):
+    def __init__(self, trialNum, status=RUN_SUCCEEDED):
+        self.trialNum = trialNum
+        self.status = status
+
+    def __str__(self):
+        return '<StubContext %d>' % self.trialNum
+
+class StubResult(object):
+    def __init__(self, context):
+        self.context = context
+
+class StubAsyncResult(object):
+    """
+    Stands in for an ipyparallel AsyncResult for one or more tasks.
+    """
+    def __init__(self, msgIds):
+        self.msg_ids = msgIds
+        self.callbacks = []
+
+    def add_done_callback(self, func):
+        self.callbacks.append(func)
+
+    def finish(self):
+        for func in self.callbacks:
+            func(self)
+
+class StubTaskResult(object):
+    """
+    Stands in for the AsyncResult returned by Client.get_result for one task.
+    """
+    engine_id = None
+
+    def __init__(self, result):
+        self.result = result
+
+    def ready(self):
+        return True
+
+    def get(self):
+        return [self.result]
+
+class StubClient(object):
+    def __init__(self, results):
+        self.results = results      # worker results keyed by msgId
+        self.purged = []
+
+    def get_result(self, msgId, block=True, owner=True):
+        if msgId not in self.results:
+            raise KeyError(msgId)    # e.g., the engine died
+
+        return StubTaskResult(self.results[msgId])
+
+    def purge_results(self, jobs=None):
+        self.purged.extend(jobs)
+
+def stubTrial(context, argDict):
+    if context.trialNum == 2:
+        raise ValueError('trial failed')
+
+    return StubResult(context)
+
+
+class StubMaster(Master):
+    def __init__(self, args):
+        # Skip the database setup in Master.__init__
+        self.args = args
+        self.client = None
+        self.executor = None
+        self.pending = None
+        self.completed = None
+        self.saved = []
+        self.statuses = {}
+
+    def runTrials(self):
+        return [self.executor.submit(stubTrial, StubContext(trialNum), {}) for trialNum in range(4)]
+
+    def saveResults(self, results):
+        self.saved.extend([result.context.trialNum for result in results])
+
+    def setRunStatus(self, context, status=None, session=None):
+        self.statuses[context.trialNum] = status or context.status
+
+
+class TestMaster(TestCase):
+    def test_runPool(self):
+        master = StubMaster(Namespace(localWorkers=2, waitSecs=0.1))
+        master.runPool()
+
+        self.assertEqual(master.pending, {})
+        self.assertEqual(sorted(master.saved), [0, 1, 3])
+        self.assertEqual(master.statuses, {2: RUN_ABORTED})     # the trial that raised
+
+    def test_watch(self):
+        master = StubMaster(Namespace())
+        master.pending = {}
+        master.completed = Queue()
+        master.client = StubClient({'a': StubResult(StubContext(0)),
+                                    'b': StubResult(StubContext(1)),
+                                    'c': StubResult(StubContext(2))})
+
+        ar1 = StubAsyncResult(['a', 'b'])
+        ar2 = StubAsyncResult(['c'])
+        master.watch(ar1)
+        master.watch(ar2)
+        self.assertEqual(master.pending, {'a': ar1, 'b': ar1, 'c': ar2})
+
+        # completion is posted to the queue, not processed in the callback
+        ar1.finish()
+        self.assertEqual(master.saved, [])
+        self.assertIs(master.completed.get_nowait(), ar1)
+        self.assertTrue(master.completed.empty())
+
+        master.processCompleted([ar1])
+        self.assertEqual(master.pending, {'c': ar2})
+        self.assertEqual(sorted(master.saved), [0, 1])
+
+        # tasks already processed are ignored
+        master.processCompleted([ar1])
+        self.assertEqual(sorted(master.saved), [0, 1])
+
+        ar2.finish()
+        master.processCompleted([master.completed.get_nowait()])
+        self.assertEqual(master.pending, {})
+        self.assertEqual(sorted(master.saved), [0, 1, 2])
+        self.assertEqual(master.client.purged, ['a', 'b', 'c'])     # once retrieved
+
+    def test_processCompletedNoResults(self):
+        master = StubMaster(Namespace())
+        master.pending = {}
+        master.completed = Queue()
+        master.client = StubClient({})
+
+        ar = StubAsyncResult(['a', 'b'])
+        master.watch(ar)
+        ar.finish()
+
+        # tasks whose results can't be retrieved are purged
+        master.processCompleted([master.completed.get_nowait()])
+        self.assertEqual(master.pending, {})
+        self.assertEqual(master.saved, [])
+        self.assertEqual(set(master.client.purged), {'a', 'b'})
@@ -0,0 +1,202 @@
+from argparse import Namespace
+import shutil
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+
+from pygcam.config import getConfig, setParam, setUsingMCS, getConfigSnapshot, setConfigSnapshot
+from pygcam.mcs.Database import GcamDatabase, RUN_SUCCEEDED, RUN_FAILED
+from pygcam.mcs.error import PygcamMcsSystemError
+from pygcam.mcs.master import Master
+from pygcam.mcs.schema import InValue, Input, OutValue, Program
+
+def seriesResult(regionName, values):
+    return {'paramName': 'out1', 'isScalar': False, 'regionName': regionName,
+            'units': 'EJ', 'value': values}
+
+def scalarResult(paramName, value):
+    return {'paramName': paramName, 'isScalar': True, 'regionName': 'global',
+            'units': 'EJ', 'value': value}
+
+class StubResult(object):
+    def __init__(self, runId, status, resultsList):
+        self.context = Namespace(runId=runId, status=status)
+        self.resultsList = resultsList
+
+class StubMaster(Master):
+    def __init__(self):
+        pass    # Skip the ipyparallel setup in Master.__init__
+
+    def setRunStatus(self, context, status=None, session=None):
+        pass
+
+class TestMcsDatabase(TestCase):
+    def setUp(self):
+        getConfig()
+        self.saved = getConfigSnapshot()
+        self.tmpDir = tempfile.mkdtemp()
+
+        setUsingMCS(True)
+        getConfig(reload=True)
+        setParam('MCS.RunDbDir', self.tmpDir)
+        setParam('MCS.LongTimeSeries', 'True')
+
+        self.db = db = GcamDatabase()
+        db.startDb(checkInit=False)
+        db.initDb()
+
+        self.simId = db.createSim(1, 'test')
+        db.createExp('base')
+        db.createOutput('out1', unit='EJ')
+        db.createOutput('out2', unit='EJ')
+
+        with db.sessionScope() as session:
+            run = db.createRun(self.simId, 0, expName='base', status=RUN_SUCCEEDED, session=session)
+            session.flush()
+            self.runId = run.runId
+
+            run = db.createRun(self.simId, 1, expName='base', status=RUN_SUCCEEDED, session=session)
+            session.flush()
+            self.runId2 = run.runId
+
+    def tearDown(self):
+        GcamDatabase.instance = None
+        self.db.engine.dispose()
+        setConfigSnapshot(self.saved)
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def getValues(self):
+        df = self.db.getTimeSeriesDF(self.simId, 'out1', ['base'])
+        return sorted([tuple(row) for row in df[['y2010', 'y2015']].values.tolist()])
+
+    def getOutValues(self):
+        with self.db.sessionScope() as session:
+            rows = session.query(OutValue.runId, OutValue.outputId, OutValue.value).all()
+            return sorted([tuple(row) for row in rows])
+
+    def test_longTimeSeries(self):
+        db = self.db
+        resultList = [seriesResult('USA',   {'y2010': 1.0, 'y2015': 2.0}),
+                      seriesResult('China', {'y2010': 3.0, 'y2015': 4.0})]
+
+        db.saveRunResults([(self.runId, resultList)])
+        self.assertEqual(self.getValues(), [(1.0, 2.0), (3.0, 4.0)])
+
+        # saving again replaces the earlier results
+        resultList[0]['value'] = {'y2010': 5.0, 'y2015': 6.0}
+        db.saveRunResults([(self.runId, resultList)])
+        self.assertEqual(self.getValues(), [(3.0, 4.0), (5.0, 6.0)])
+
+    def test_migrate(self):
+        db = self.db
+        regionIds = [db.getRegionId('USA'), db.getRegionId('China')]
+        outputId = db.getOutputIds(['out1'])[0]
+
+        # Simulate a database created before the long-format table existed
+        db.execute('DROP TABLE timeseriesvalue')
+        db.execute('ALTER TABLE timeseries ADD COLUMN y2010 FLOAT')
+        db.execute('ALTER TABLE timeseries ADD COLUMN y2015 FLOAT')
+        for regionId, (v1, v2) in zip(regionIds, [(1.0, 2.0), (3.0, 4.0)]):
+            db.execute('INSERT INTO timeseries ("runId", "regionId", "outputId", units, y2010, y2015) '
+                       'VALUES (%d, %d, %d, \'EJ\', %s, %s)' % (self.runId, regionId, outputId, v1, v2))
+
+        self.assertIn('timeseriesvalue', db.migrateSchema())
+        self.assertEqual(db.copyTimeSeriesToLong(), 2)
+        self.assertEqual(self.getValues(), [(1.0, 2.0), (3.0, 4.0)])
+
+        # copying again replaces rather than duplicates the values
+        db.copyTimeSeriesToLong()
+        self.assertEqual(self.getValues(), [(1.0, 2.0), (3.0, 4.0)])
+
+    def test_saveRunResults(self):
+        db = self.db
+        out1, out2 = db.getOutputIds(['out1', 'out2'])
+
+        # results for several runs are saved together; the last value saved wins
+        db.saveRunResults([(self.runId,  [scalarResult('out2', 1.0), scalarResult('out2', 2.0),
+                                          seriesResult('USA', {'y2010': 1.0, 'y2015': 2.0})]),
+                           (self.runId2, [scalarResult('out2', 3.0),
+                                          seriesResult('USA', {'y2010': 3.0, 'y2015': 4.0})]),
+                           (99, [])])
+
+        self.assertEqual(self.getOutValues(), [(self.runId, out2, 2.0), (self.runId2, out2, 3.0)])
+        self.assertEqual(self.getValues(), [(1.0, 2.0), (3.0, 4.0)])
+
+        # only the outputs saved are replaced, and only for the runs given
+        db.saveRunResults([(self.runId2, [scalarResult('out2', 5.0)])])
+        self.assertEqual(self.getOutValues(), [(self.runId, out2, 2.0), (self.runId2, out2, 5.0)])
+        self.assertEqual(self.getValues(), [(1.0, 2.0), (3.0, 4.0)])
+
+    def test_getOutputIds(self):
+        db = self.db
+        ids = db.getOutputIds(['out1', 'out2'])
+        self.assertEqual(len(set(ids)), 2)
+
+        # the cache is reloaded when an unknown name is requested
+        db.createOutput('out3', unit='EJ')
+        self.assertNotIn(db.getOutputIds(['out3'])[0], ids)
+        self.assertRaises(PygcamMcsSystemError, db.getOutputIds, ['missing'])
+
+    def test_masterSaveResults(self):
+        GcamDatabase.instance = self.db
+        master = StubMaster()
+
+        resultsList = [scalarResult('out2', 1.0), seriesResult('USA', {'y2010': 1.0, 'y2015': 2.0})]
+        master.saveResults([StubResult(self.runId,  RUN_SUCCEEDED, resultsList),
+                            StubResult(self.runId2, RUN_SUCCEEDED, resultsList)])
+        self.assertEqual(len(self.getOutValues()), 2)
+        self.assertEqual(self.getValues(), [(1.0, 2.0), (1.0, 2.0)])
+
+        # a failed re-run removes the results saved earlier for that run
+        master.saveResults([StubResult(self.runId2, RUN_FAILED, resultsList)])
+        self.assertEqual([row[0] for row in self.getOutValues()], [self.runId])
+        self.assertEqual(self.getValues(), [(1.0, 2.0)])
+
+    def test_parameterMatrix(self):
+        db = self.db
+        db.saveParameterNames([('p1', 'first'), ('p2', 'second')])
+
+        df = pd.DataFrame({'p2': [4.0, 5.0, 6.0], 'p1': [1.0, 2.0, 3.0]})
+        db.saveParameterMatrix(self.simId, df, [('p1', 0), ('p2', 1)], start=10)
+
+        matrix = db.getParameterMatrix(self.simId)
+        self.assertEqual(list(matrix.columns), ['p1', 'p2'])
+        self.assertEqual(list(matrix.index), [10, 11, 12])
+        self.assertEqual(matrix.to_dict('list'), {'p1': [1.0, 2.0, 3.0], 'p2': [4.0, 5.0, 6.0]})
+        self.assertTrue(db.getParameterMatrix(self.simId, program='gcam').equals(matrix))
+        self.assertIsNone(db.getParameterMatrix(self.simId + 1))
+
+    def test_parameterCollision(self):
+        db = self.db
+        db.saveParameterNames([('p1', 'first')])
+        db.saveParameterMatrix(self.simId, pd.DataFrame({'p1': [1.0, 2.0]}), [('p1', 0)])
+
+        # the same parameter name, defined for another program
+        with db.sessionScope() as session:
+            program = Program(name='other')
+            session.add(program)
+            session.flush()
+            param = Input(programId=program.programId, paramName='p1')
+            session.add(param)
+            session.flush()
+            inputId = param.inputId
+
+        db._bulkInsert(InValue, [{'inputId': inputId, 'simId': self.simId, 'trialNum': trialNum,
+                                  'value': 9.0, 'row': 0, 'col': 0} for trialNum in range(2)])
+
+        self.assertRaises(PygcamMcsSystemError, db.getParameterMatrix, self.simId)
+        self.assertEqual(db.getParameterMatrix(self.simId, program='gcam')['p1'].tolist(), [1.0, 2.0])
+        self.assertEqual(db.getParameterMatrix(self.simId, program='other')['p1'].tolist(), [9.0, 9.0])
+
+    def test_bulkInsert(self):
+        db = self.db
+        db.saveParameterNames([('p1', 'first')])
+        inputId = db.getParamId('p1')
+
+        # rows may come from a generator, and are inserted in chunks
+        rows = ({'inputId': inputId, 'simId': self.simId, 'trialNum': trialNum,
+                 'value': float(trialNum), 'row': 0, 'col': 0} for trialNum in range(7))
+        db._bulkInsert(InValue, rows, chunkSize=3)
+
+        self.assertEqual(db.getParameterMatrix(self.simId)['p1'].tolist(), [float(i) for i in range(7)])
@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import time
+from unittest import TestCase
+
+from pygcam.config import getConfig, setParam
+from pygcam.queryFile import QueryIndex
+from pygcam.utils import mkdirs
+
+class TestQueryIndex(TestCase):
+    def setUp(self):
+        getConfig()
+        self.tmpDir = '/tmp/testQueryIndex'
+        self.removeTmpDir()
+        mkdirs(self.tmpDir)
+
+        self.queryFile = os.path.join(self.tmpDir, 'Main_queries.xml')
+        shutil.copy('./data/queries/Main_queries.xml', self.queryFile)
+        QueryIndex.decache()
+
+    def tearDown(self):
+        setParam('GCAM.QueryIndexDir', '')
+        QueryIndex.decache()
+        self.removeTmpDir()
+
+    def removeTmpDir(self):
+        try:
+            shutil.rmtree(self.tmpDir)
+        except:
+            pass
+
+    def test_findQuery(self):
+        index = QueryIndex.getIndex(self.queryFile)
+
+        elt = index.findQuery('Purpose-grown biomass production')
+        self.assertEqual(elt.get('title'), 'Purpose-grown biomass production')
+
+        # name variants with '_' and '-' replaced by spaces
+        elt = index.findQuery('land_allocation')
+        self.assertEqual(elt.get('title'), 'land allocation')
+
+        self.assertIsNone(index.findQuery('no such query'))
+
+        # each call returns a distinct copy that callers can modify
+        self.assertIsNot(index.findQuery('land allocation'), index.findQuery('land allocation'))
+
+    def test_cacheAndInvalidation(self):
+        index = QueryIndex.getIndex(self.queryFile)
+        self.assertIs(QueryIndex.getIndex(self.queryFile), index)
+
+        with open(self.queryFile) as f:
+            text = f.read()
+
+        with open(self.queryFile, 'w') as f:
+            f.write(text.replace('land allocation', 'detailed land allocation'))
+
+        later = time.time() + 10
+        os.utime(self.queryFile, (later, later))
+
+        index2 = QueryIndex.getIndex(self.queryFile)
+        self.assertIsNot(index2, index)
+        self.assertIsNotNone(index2.findQuery('detailed land allocation'))
+
+    def test_indexFile(self):
+        indexDir = os.path.join(self.tmpDir, 'index')
+        setParam('GCAM.QueryIndexDir', indexDir)
+
+        index = QueryIndex.getIndex(self.queryFile)
+        self.assertEqual(len(os.listdir(indexDir)), 1)
+
+        # Simulate another process by clearing the in-memory cache
+        QueryIndex.decache()
+        index2 = QueryIndex.getIndex(self.queryFile)
+        self.assertIsNot(index2, index)
+        self.assertEqual(index2.queries, index.queries)
+
+    def test_rewriteIndexFile(self):
+        indexDir = os.path.join(self.tmpDir, 'index')
+        setParam('GCAM.QueryIndexDir', indexDir)
+
+        index = QueryIndex.getIndex(self.queryFile)
+        indexPath = QueryIndex._indexPath(self.queryFile)
+
+        # an existing index is replaced, leaving no temporary file
+        index.queries = {}
+        index._writeIndexFile(indexPath)
+        self.assertEqual(os.listdir(indexDir), [os.path.basename(indexPath)])
+
+        with open(indexPath) as f:
+            self.assertEqual(json.load(f)['queries'], {})
+
+        # the temporary file is removed if the index can't be replaced
+        os.remove(indexPath)
+        os.mkdir(indexPath)
+        index._writeIndexFile(indexPath)
+        self.assertEqual(os.listdir(indexDir), [os.path.basename(indexPath)])
@@ -0,0 +1,90 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+
+from pygcam.config import getParam, setParam
+from pygcam.query import _runWithQueryServer
+from pygcam.queryServer import (QueryServer, QueryServerError, getQueryServer, stopQueryServer,
+                                serverSourcePath)
+import pygcam.queryServer as queryServer
+
+# A stand-in for ModelInterface that speaks the server's line protocol
+FakeServer = '''
+import sys, time
+for line in iter(sys.stdin.readline, ''):
+    batchFile = line.strip()
+    if 'hang' in batchFile:
+        time.sleep(60)
+    print('running ' + batchFile)
+    print('ERROR no such file' if 'missing' in batchFile else 'OK')
+    sys.stdout.flush()
+'''
+
+class TestQueryServer(TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpDir = tempfile.mkdtemp()
+        script = os.path.join(self.tmpDir, 'server.py')
+        with open(script, 'w') as f:
+            f.write(FakeServer)
+
+        self.command = '"%s" "%s"' % (sys.executable, script)
+        self.logFile = os.path.join(self.tmpDir, 'mi.log')
+        self.saved = [(name, getParam(name)) for name in ('GCAM.MI.ServerCommand', 'GCAM.MI.ServerTimeout')]
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        stopQueryServer()
+        queryServer._serverFailed = False
+        for name, value in self.saved:
+            setParam(name, value)
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_runBatchFile(self):
+        server = QueryServer(self.command, timeout=10)
+        try:
+            server.runBatchFile('a.xml', miLogFile=self.logFile)
+            server.runBatchFile('b.xml', miLogFile=self.logFile)
+            self.assertRaises(QueryServerError, server.runBatchFile, 'missing.xml')
+            self.assertTrue(server.isRunning())
+        finally:
+            server.stop()
+
+        # batch files are sent as absolute pathnames
+        with open(self.logFile) as f:
+            self.assertEqual(f.read(), 'running %s\nrunning %s\n' % (os.path.abspath('a.xml'),
+                                                                    os.path.abspath('b.xml')))
+
+    def test_timeout(self):
+        server = QueryServer(self.command, timeout=1)
+        self.assertRaises(QueryServerError, server.runBatchFile, 'hang.xml')
+        self.assertFalse(server.isRunning())
+
+    def test_fallback(self):
+        setParam('GCAM.MI.ServerCommand', self.command)
+        setParam('GCAM.MI.ServerTimeout', '1')
+
+        self.assertTrue(_runWithQueryServer('a.xml', self.logFile))
+
+        # a hung server is killed, and batch mode is used from then on
+        self.assertFalse(_runWithQueryServer('hang.xml', self.logFile))
+        self.assertIsNone(getQueryServer())
+
+    def test_restart(self):
+        setParam('GCAM.MI.ServerCommand', self.command)
+        server = getQueryServer()
+        self.assertIs(getQueryServer(), server)
+
+        # relative pathnames in batch files depend on the current directory
+        os.chdir(self.tmpDir)
+        newServer = getQueryServer()
+        self.assertIsNot(newServer, server)
+        self.assertFalse(server.isRunning())
+        self.assertTrue(newServer.isRunning())
+
+    def test_defaultCommand(self):
+        # the server distributed with pygcam is substituted into the default command
+        self.assertTrue(os.path.isfile(serverSourcePath()))
+        self.assertIn('{serverSource}', self.saved[0][1])
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+
+from pygcam.config import getConfig, setParam, getConfigSnapshot, setConfigSnapshot
+from pygcam.mcs.XMLConfigFile import XMLConfigFile
+from pygcam.mcs.XMLParameterFile import ResidentParameterModel, XMLParameter, decache
+
+RelPath = '../input/energy.xml'
+
+InputXml = '''<?xml version="1.0" encoding="UTF-8"?>
+<scenario>
+  <world>
+    <region name="USA">
+      <coef year="2020">2.0</coef>
+      <coef year="2025">3.0</coef>
+      <share>0.5</share>
+    </region>
+    <region name="China">
+      <coef year="2020">4.0</coef>
+      <share>0.25</share>
+    </region>
+  </world>
+</scenario>
+'''
+
+ParameterXml = '''<?xml version="1.0" encoding="UTF-8"?>
+<ParameterList>
+  <InputFile name="energy">
+    <Parameter name="coef-factor">
+      <Query>//coef</Query>
+      <Distribution apply="multiply">
+        <Uniform factor="0.2"/>
+      </Distribution>
+    </Parameter>
+    <Parameter name="share-delta">
+      <Query>//share</Query>
+      <Distribution apply="add">
+        <Uniform min="0.0" max="0.1"/>
+      </Distribution>
+    </Parameter>
+  </InputFile>
+</ParameterList>
+'''
+
+class StubContext(object):
+    def __init__(self, trialNum):
+        self.simId = 1
+        self.trialNum = trialNum
+        self.groupName = ''
+        self.scenario = None
+
+    def setVars(self, scenario=None):
+        self.scenario = scenario
+
+class StubConfigFile(object):
+    def getComponentPathname(self, compName):
+        return RelPath
+
+
+class TestResidentModel(TestCase):
+    def setUp(self):
+        getConfig()
+        self.saved = getConfigSnapshot()
+        self.tmpDir = tempfile.mkdtemp()
+
+        simsDir = os.path.join(self.tmpDir, 'sims')
+        setParam('MCS.RunSimsDir', simsDir)
+        setParam('MCS.ResidentParameters', 'True')
+        setParam('MCS.DeltaXml', 'False')
+
+        inputPath = os.path.join(simsDir, 's001', 'input', 'energy.xml')    # RelPath from local-xml
+        os.makedirs(os.path.dirname(inputPath))
+        with open(inputPath, 'w') as f:
+            f.write(InputXml)
+
+        self.paramPath = os.path.join(self.tmpDir, 'parameters.xml')
+        with open(self.paramPath, 'w') as f:
+            f.write(ParameterXml)
+
+        self.trialData = pd.DataFrame({'coef-factor': [1.5, 0.5], 'share-delta': [0.1, 0.05]})
+
+    def tearDown(self):
+        ResidentParameterModel.decache()
+        decache()
+        setConfigSnapshot(self.saved)
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def runTrial(self, trialNum, outDir):
+        """
+        Apply a trial as worker.py does, returning the parameter file used and
+        the contents of the modified XML file written for the trial.
+        """
+        decache()
+        XMLConfigFile.instances[('base', True)] = StubConfigFile()
+
+        context = StubContext(trialNum)
+        paramFile = ResidentParameterModel.getParameterFile(self.paramPath, context, ['base'])
+
+        trialDir = os.path.join(self.tmpDir, outDir)
+        XMLParameter.applyTrial(context.simId, trialNum, self.trialData)
+        paramFile.writeLocalXmlFiles(trialDir)
+
+        with open(os.path.join(trialDir, 'trial-xml', 'input', 'energy.xml')) as f:
+            return paramFile, f.read()
+
+    def test_successiveTrials(self):
+        paramFile0, _ = self.runTrial(0, 'resident-0')
+        paramFile1, resident = self.runTrial(1, 'resident-1')
+        self.assertIs(paramFile1, paramFile0)   # the model was reused
+
+        # the same trial applied to a freshly parsed model
+        ResidentParameterModel.decache()
+        paramFile, fresh = self.runTrial(1, 'fresh-1')
+        self.assertIsNot(paramFile, paramFile0)
+
+        self.assertEqual(resident, fresh)
+        self.assertIn('<coef year="2025">1.5</coef>', fresh)     # 3.0 * 0.5, not compounded
+
+    def test_modifiedInput(self):
+        paramFile0, _ = self.runTrial(0, 'trial-0')
+
+        # a change to an input file forces the model to be rebuilt
+        inputPath = os.path.join(self.tmpDir, 'sims', 's001', 'input', 'energy.xml')
+        mtime = os.path.getmtime(inputPath) + 10
+        os.utime(inputPath, (mtime, mtime))
+
+        paramFile1, _ = self.runTrial(1, 'trial-1')
+        self.assertIsNot(paramFile1, paramFile0)
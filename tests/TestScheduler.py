@@ -0,0 +1,69 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+
+from pygcam.scheduler import Scheduler, SchedulerError, TASK_SUCCEEDED, TASK_FAILED, TASK_SKIPPED
+
+class TestScheduler(TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.logFile = os.path.join(self.tmpDir, 'order.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def command(self, name, exitCode=0):
+        code = "open(%r, 'a').write(%r + '\\n'); raise SystemExit(%d)" % (self.logFile, name, exitCode)
+        return [sys.executable, '-c', code]
+
+    def order(self):
+        with open(self.logFile) as f:
+            return f.read().split()
+
+    def test_dependencies(self):
+        s = Scheduler(maxProcs=3, pollInterval=0.05)
+        s.addTask('base.setup', self.command('base.setup'))
+        s.addTask('base.gcam',  self.command('base.gcam'), dependsOn=['base.setup'])
+        s.addTask('pol.setup',  self.command('pol.setup'), dependsOn=['base.setup'])
+        s.addTask('pol.gcam',   self.command('pol.gcam'),  dependsOn=['pol.setup', 'base.gcam'])
+
+        failed = s.run()
+        self.assertEqual(failed, [])
+
+        order = self.order()
+        self.assertEqual(order[0], 'base.setup')
+        self.assertEqual(order[-1], 'pol.gcam')
+        self.assertTrue(all([t.status == TASK_SUCCEEDED for t in s.tasks]))
+
+    def test_failure(self):
+        s = Scheduler(maxProcs=1, pollInterval=0.05)
+        s.addTask('a', self.command('a', exitCode=1))
+        s.addTask('b', self.command('b'), dependsOn=['a'])
+        s.addTask('c', self.command('c'))
+
+        failed = s.run(quitOnError=False)
+        self.assertEqual([t.name for t in failed], ['a'])
+        self.assertEqual(s.taskDict['b'].status, TASK_SKIPPED)
+        self.assertEqual(s.taskDict['c'].status, TASK_SUCCEEDED)
+
+        s = Scheduler(maxProcs=1, pollInterval=0.05)
+        s.addTask('a', self.command('a', exitCode=1))
+        s.addTask('c', self.command('c'))
+        s.run(quitOnError=True)
+        self.assertEqual(s.taskDict['a'].status, TASK_FAILED)
+        self.assertEqual(s.taskDict['c'].status, TASK_SKIPPED)
+
+    def test_memoryLimit(self):
+        s = Scheduler(maxProcs=4, maxMemory=4, pollInterval=0.05)
+        s.addTask('a', self.command('a'), memory=3)
+        s.addTask('b', self.command('b'), memory=3)
+        s.addTask('c', self.command('c'), memory=10)    # exceeds the limit, so it runs alone
+        s.run()
+        self.assertEqual(len(self.order()), 3)
+
+    def test_unknownDependency(self):
+        s = Scheduler()
+        with self.assertRaises(SchedulerError):
+            s.addTask('a', ['true'], dependsOn=['b'])
@@ -0,0 +1,115 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+from unittest import TestCase
+
+from pygcam.error import GcamSolverError
+import pygcam.gcam as gcam
+from pygcam.gcam import _gcamWrapper
+from pygcam.telemetry import SolverTelemetry, readTelemetry, SOLVED, UNSOLVED
+
+_Output = '''Starting new scenario
+Period 0: 1975
+Period 1: 1990
+Model solved normally. Iterations period 1: 12. Total iterations: 12
+Period 2: 2005
+USAelectricity, X: 1.5, XL: 1.4, XR: 1.6, ED: 0.001
+Model solved normally. Iterations period 2: 40. Total iterations: 52
+'''
+
+_Unsolved = '''Period 3: 2010
+Model did not solve within set iteration 3000
+Unsolved market: USAregional corn
+'''
+
+# GCAM reports the unsolved markets after the "did not solve" message
+_Markets = '''USAregional corn                    , X: 1.2, XL: 1.1, XR: 1.3, ED: 0.52
+Chinabiomass, X: 0.8, XL: 0.7, XR: 0.9, ED: -0.31
+Period 4: 2015
+Model solved normally. Iterations period 4: 20. Total iterations: 72
+'''
+
+# Writes the failure, pauses, then reports the markets and continues with the next period
+_FakeGcam = '''import sys, time
+sys.stdout.write(%r)
+sys.stdout.flush()
+time.sleep(0.5)
+sys.stdout.write(%r)
+sys.stdout.flush()
+time.sleep(30)
+'''
+
+class TestTelemetry(TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpDir, 'telemetry.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_parse(self):
+        telemetry = SolverTelemetry(path=self.path)
+        for line in (_Output + _Unsolved).splitlines():
+            telemetry.processLine(line)
+
+        telemetry.finish(exitCode=1)
+        data = readTelemetry(self.path)
+        periods = data['periods']
+
+        self.assertEqual(data['status'], 'failed')
+        self.assertEqual([p['year'] for p in periods], [1975, 1990, 2005, 2010])
+
+        # the number in "did not solve" is the iteration limit, not the count used
+        self.assertEqual([p['iterations'] for p in periods], [None, 12, 40, None])
+        self.assertEqual(periods[2]['status'], SOLVED)
+        self.assertEqual(periods[3]['status'], UNSOLVED)
+        self.assertEqual(periods[2]['unsolvedMarkets'], [])    # market info for a solved period
+        self.assertEqual(periods[3]['unsolvedMarkets'], ['USAregional corn'])
+
+    def test_wrapper(self):
+        args = [sys.executable, '-c', 'import sys; sys.stdout.write(%r)' % _Output]
+        status = _gcamWrapper(args, telemetryFile=self.path)
+        self.assertEqual(status, 0)
+        self.assertEqual(readTelemetry(self.path)['status'], SOLVED)
+
+        args = [sys.executable, '-c', 'import sys, time; sys.stdout.write(%r); sys.stdout.flush(); time.sleep(5)' % _Unsolved]
+        with self.assertRaises(GcamSolverError):
+            _gcamWrapper(args, telemetryFile=self.path)
+
+        data = readTelemetry(self.path)
+        self.assertEqual(data['status'], UNSOLVED)
+        self.assertEqual(data['periods'][0]['year'], 2010)
+
+    def test_unsolvedMarkets(self):
+        # markets reported after "did not solve" are recorded before GCAM is terminated
+        args = [sys.executable, '-c', _FakeGcam % (_Unsolved, _Markets)]
+        startTime = time.time()
+        with self.assertRaises(GcamSolverError):
+            _gcamWrapper(args, telemetryFile=self.path)
+
+        self.assertLess(time.time() - startTime, gcam.SolverDrainSeconds)   # stopped at the next period
+
+        data = readTelemetry(self.path)
+        periods = data['periods']
+        self.assertEqual(data['status'], UNSOLVED)
+        self.assertEqual([p['year'] for p in periods], [2010])
+        self.assertEqual(periods[0]['unsolvedMarkets'], ['USAregional corn', 'Chinabiomass'])
+        self.assertIsNone(periods[0]['iterations'])
+
+    def test_drainTimeout(self):
+        # GCAM is terminated if it writes nothing more after failing to solve
+        saved = gcam.SolverDrainSeconds
+        gcam.SolverDrainSeconds = 1
+        try:
+            args = [sys.executable, '-c', 'import sys, time; sys.stdout.write(%r); sys.stdout.flush(); time.sleep(30)' % _Unsolved]
+            startTime = time.time()
+            with self.assertRaises(GcamSolverError):
+                _gcamWrapper(args, telemetryFile=self.path)
+
+            self.assertLess(time.time() - startTime, 10)
+        finally:
+            gcam.SolverDrainSeconds = saved
+
+        self.assertEqual(readTelemetry(self.path)['periods'][0]['unsolvedMarkets'], ['USAregional corn'])
@@ -0,0 +1,40 @@
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from pygcam.config import getConfig, getParam, setParam
+from pygcam.mcs.context import getSimDir
+from pygcam.mcs.trialMatrix import TrialMatrix
+
+class TestTrialMatrix(TestCase):
+    def setUp(self):
+        getConfig()
+        self.savedSimsDir = getParam('MCS.RunSimsDir', raiseError=False)
+        self.tmpDir = tempfile.mkdtemp()
+        setParam('MCS.RunSimsDir', self.tmpDir)
+
+    def tearDown(self):
+        setParam('MCS.RunSimsDir', self.savedSimsDir or '')
+        TrialMatrix.decache()
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_readRow(self):
+        simId = 1
+        getSimDir(simId, create=True)
+
+        rng = np.random.RandomState(0)
+        df = pd.DataFrame(rng.uniform(size=(50, 3)), columns=['a', 'b', 'c'])
+        TrialMatrix.write(simId, df, start=100)
+
+        self.assertTrue(TrialMatrix.exists(simId))
+        tm = TrialMatrix.getInstance(simId)
+        self.assertEqual(tm.trialCount(), 50)
+        self.assertTrue((tm.getVector(110) == df.values[10]).all())
+        self.assertEqual(tm.getValue(149, 'c'), df.at[49, 'c'])
+
+        row = tm.getTrialData(120)
+        self.assertEqual(list(row.index), [120])
+        self.assertEqual(row.at[120, 'b'], df.at[20, 'b'])
@@ -0,0 +1,47 @@
+from unittest import TestCase
+from lxml import etree as ET
+
+from pygcam.mcs.XMLDeltaFile import XMLDeltaFile, deltaRelativePath
+
+_Xml = '''<scenario name="ref">
+  <world>
+    <region name="USA">
+      <supplysector name="corn">
+        <period year="2010"><share-weight>1.0</share-weight></period>
+        <period year="2015"><share-weight>1.0</share-weight><other>5</other></period>
+      </supplysector>
+      <supplysector name="wheat">
+        <period year="2010"><share-weight>2.0</share-weight></period>
+      </supplysector>
+    </region>
+  </world>
+</scenario>'''
+
+class TestXMLDeltaFile(TestCase):
+    def setUp(self):
+        self.tree = ET.ElementTree(ET.fromstring(_Xml))
+
+    def test_delta(self):
+        elements = self.tree.xpath('//supplysector[@name="corn"]/period[@year="2015"]/share-weight | '
+                                   '//supplysector[@name="wheat"]/period/share-weight')
+        for elt in elements:
+            elt.text = '3.5'
+
+        delta = XMLDeltaFile(self.tree, elements)
+        self.assertTrue(delta.isExpressible())
+
+        root = delta.getTree().getroot()
+        self.assertEqual(root.get('name'), 'ref')
+        self.assertEqual(len(root.xpath('//share-weight')), 2)
+        self.assertEqual(root.xpath('//supplysector[@name="corn"]/period/@year'), ['2015'])
+        self.assertEqual(root.xpath('//supplysector[@name="wheat"]/period/share-weight/text()'), ['3.5'])
+        self.assertEqual(len(root.xpath('//other')), 0)
+
+    def test_ambiguous(self):
+        region = self.tree.find('world/region')
+        region.append(ET.fromstring('<supplysector name="corn"/>'))
+        elements = self.tree.xpath('//supplysector[@name="corn"]/period/share-weight')
+        self.assertFalse(XMLDeltaFile(self.tree, elements).isExpressible())
+
+    def test_path(self):
+        self.assertEqual(deltaRelativePath('../input/gcamdata/land2.xml'), '../input/gcamdata/land2-delta.xml')
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pygcam.XMLFile import XMLFile
+
+ValuesXML = '''<?xml version="1.0" encoding="UTF-8"?>
+<scenario><world><region name="USA"><values>
+<value name="corn ethanol">%s</value>
+</values></region></world></scenario>
+'''
+
+ConditionalXML = '''<?xml version="1.0" encoding="UTF-8"?>
+<project>
+  <CONDITIONAL>
+    <TEST var="foo" op="=" value="bar"/>
+    <THEN><SomeElement>then</SomeElement></THEN>
+    <ELSE><SomeElement>else</SomeElement></ELSE>
+  </CONDITIONAL>
+</project>
+'''
+
+class TestXMLFile(TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        XMLFile.decache()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpDir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_cachedValidation(self):
+        path = self.write('values.xml', ValuesXML % '0.5')
+        schemaPath = 'etc/mcsValues-schema.xsd'
+        cache = XMLFile.docCache
+
+        first = XMLFile(path, schemaPath=schemaPath)
+        first.getRoot().find('.//value').text = '99'       # changes to a copy aren't cached
+
+        hits = cache.hits
+        second = XMLFile(path, schemaPath=schemaPath)
+        self.assertEqual(cache.hits, hits + 1)
+        self.assertEqual(second.getRoot().find('.//value').text, '0.5')
+        self.assertEqual(list(XMLFile.schemaCache.keys()), [schemaPath])
+
+        # a changed file is read again
+        self.write('values.xml', ValuesXML % '0.75')
+        third = XMLFile(path, schemaPath=schemaPath)
+        self.assertEqual(third.getRoot().find('.//value').text, '0.75')
+
+    def test_conditional(self):
+        path = self.write('cond.xml', ConditionalXML)
+
+        for value, expected in (('bar', 'then'), ('baz', 'else'), ('bar', 'then')):
+            xmlFile = XMLFile(path, conditionalXML=True, varDict={'foo': value})
+            self.assertEqual(xmlFile.getRoot().find('SomeElement').text, expected)
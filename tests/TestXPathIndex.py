@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from lxml import etree as ET
+
+from pygcam.xmlEditor import CachedFile, XPathIndex, editSession, xmlEdit
+
+XML = '''<scenario><world>
+  <region name="USA">
+    <supplysector name="refining">
+      <subsector name="biomass liquids">
+        <share-weight year="2020">1</share-weight>
+        <stub-technology name="corn ethanol"><period year="2020"><share-weight>1</share-weight></period></stub-technology>
+        <stub-technology name="cellulosic ethanol"><period year="2020"><share-weight>0</share-weight></period></stub-technology>
+      </subsector>
+    </supplysector>
+    <energy-final-demand name="cement"><price-elasticity year="2020">-0.1</price-elasticity></energy-final-demand>
+    <energy-final-demand name="industry"><price-elasticity year="2020">-0.2</price-elasticity></energy-final-demand>
+  </region>
+  <region name="China">
+    <energy-final-demand name="cement"><price-elasticity year="2020">-0.3</price-elasticity></energy-final-demand>
+  </region>
+  <global-technology-database>
+    <location-info sector-name="refining" subsector-name="biomass liquids">
+      <technology name="corn ethanol"><period year="2020"><input-cost>5</input-cost></period></technology>
+    </location-info>
+  </global-technology-database>
+</world></scenario>
+'''
+
+class TestXPathIndex(TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpDir, 'test.xml')
+        with open(self.filename, 'w') as f:
+            f.write(XML)
+
+    def tearDown(self):
+        CachedFile.cache.remove(self.filename)
+        CachedFile.dirty.pop(self.filename, None)
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_find(self):
+        tree = ET.ElementTree(ET.fromstring(XML))
+        index = XPathIndex(tree)
+
+        xpaths = ['//region[@name="USA"]/supplysector[@name="refining"]/subsector[@name="biomass liquids"]/stub-technology[@name="corn ethanol"]/period[@year="2020"]/share-weight',
+                  "//region[@name='USA']/supplysector[@name='refining']/subsector[@name='biomass liquids']/share-weight[@year='2020']",
+                  '//region/energy-final-demand[@name="cement" or @name="industry"]/price-elasticity[@year="2020"]',
+                  '//region[@name="USA" or @name="China"]/energy-final-demand[@name="cement"]/price-elasticity',
+                  '//global-technology-database/location-info[@sector-name="refining" and @subsector-name="biomass liquids"]/technology[@name="corn ethanol"]/period[@year="2020"]/input-cost',
+                  '//region[@name="Brazil"]/energy-final-demand']
+
+        for xpath in xpaths:
+            found = index.find(xpath)
+            self.assertIsNotNone(found, xpath)
+            self.assertEqual(set(found), set(tree.xpath(xpath)), xpath)
+
+        # not handled by the index
+        for xpath in ('//region//share-weight', '//period[@year=2020]', '//Value[text()="x"]'):
+            self.assertIsNone(index.find(xpath))
+
+    def test_editSession(self):
+        xpath = '//region[@name="China"]/energy-final-demand[@name="cement"]/price-elasticity[@year="2020"]'
+
+        with editSession():
+            self.assertIsNone(xmlEdit(self.filename, [(xpath, -0.5)]))
+            xmlEdit(self.filename, [(xpath, 2.0)], op='multiply')
+            xmlEdit(self.filename, [('//region[@name="China"]/@name', 'PRC')])
+
+            item = CachedFile.getFile(self.filename)
+            self.assertEqual(len(item.pending), 3)
+
+        self.assertEqual(item.pending, [])
+        self.assertEqual(item.find(xpath), [])
+        self.assertEqual(item.find(xpath.replace('China', 'PRC'))[0].text, '-1.0')
+
+        CachedFile.decacheAll()
+        self.assertEqual(ET.parse(self.filename).xpath('//region[@name="PRC"]//price-elasticity')[0].text, '-1.0')
+
+    def test_eviction(self):
+        other = os.path.join(self.tmpDir, 'other.xml')
+        shutil.copy(self.filename, other)
+
+        cache = CachedFile.cache
+        saved = cache._maxBytes
+        cache._maxBytes = os.path.getsize(self.filename)    # room for one file
+        try:
+            xmlEdit(self.filename, [('//region[@name="China"]/@name', 'PRC')])
+            self.assertIn(self.filename, CachedFile.dirty)
+
+            CachedFile.getFile(other)           # evicts and writes the edited file
+            self.assertNotIn(self.filename, cache)
+            self.assertNotIn(self.filename, CachedFile.dirty)
+            self.assertIn(other, cache)
+            self.assertEqual(len(ET.parse(self.filename).xpath('//region[@name="PRC"]')), 1)
+
+            mtime = os.path.getmtime(other)
+            CachedFile.decacheAll()             # unedited files aren't rewritten
+            self.assertEqual(os.path.getmtime(other), mtime)
+        finally:
+            cache._maxBytes = saved
+            cache.remove(other)
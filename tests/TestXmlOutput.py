@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from lxml import etree as ET
+
+from pygcam.carbonTax import genCarbonTax, genLinkedBioCarbonPolicyFile
+from pygcam.xmlOutput import xmlText
+
+def writeDoc(writer):
+    with writer.element('scenario', name='test'):
+        with writer.element('world'):
+            writer.comment(' generated ')
+            with writer.element('region', name='USA'):
+                writer.leaf('market', 'global')
+                writer.leaf('fixedTax', 1.5, year='2020')
+                writer.write(ET.fromstring('<policyType>tax</policyType>'))
+
+class TestXmlOutput(TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir, ignore_errors=True)
+
+    def test_xmlWriter(self):
+        compact = xmlText(writeDoc, pretty=False)
+        pretty  = xmlText(writeDoc, pretty=True)
+
+        self.assertEqual(len(compact.splitlines()), 2)       # declaration and document
+        self.assertIn('\n        <region name="USA">\n            <market>', pretty)
+
+        parser = ET.XMLParser(remove_blank_text=True)
+        trees = [ET.fromstring(text.split('\n', 1)[1], parser) for text in (compact, pretty)]
+        self.assertEqual(ET.tostring(trees[0]), ET.tostring(trees[1]))
+
+    def test_carbonTax(self):
+        root = ET.fromstring(genCarbonTax(10, [2020, 2030], 0.05, regions=['USA', 'China']).split('\n', 1)[1])
+        taxes = root.xpath('//region[@name="USA"]/ghgpolicy/fixedTax')
+        self.assertEqual([(elt.get('year'), elt.text) for elt in taxes], [('2020', '10.00'), ('2030', '16.29')])
+        self.assertEqual(root.xpath('//region[@name="China"]/ghgpolicy/market/text()'), ['global'])
+
+        filename = os.path.join(self.tmpDir, 'linked.xml')
+        genLinkedBioCarbonPolicyFile(filename, market='global', regions=['USA', 'China'], forTax=True)
+        root = ET.parse(filename).getroot()
+        self.assertEqual(root.xpath('//price-adjust/text()'), ['1.0'])
+        self.assertEqual(len(root.xpath('//linked-ghg-policy')), 2)
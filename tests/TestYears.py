@@ -0,0 +1,83 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from pygcam.query import interpolateYears, limitYears, sumYearColumns, yearColumns
+
+def _interpolateByColumn(df, startYear=0):
+    """
+    The original column-at-a-time implementation, used as a reference.
+    """
+    df = df.copy()
+    years = [int(y) for y in yearColumns(df)]
+
+    for i in range(0, len(years)-1):
+        start = years[i]
+        end   = years[i+1]
+        timestep = end - start
+
+        if timestep == 1:
+            continue
+
+        delta = (df[str(end)] - df[str(start)]) / timestep
+
+        for j in range(1, timestep):
+            nextYear = start + j
+            df[str(nextYear)] = df[str(nextYear-1)] + (0 if nextYear < startYear else delta)
+
+    return df
+
+
+class TestYears(TestCase):
+    def setUp(self):
+        years = [1990, 2005, 2010, 2015, 2020, 2030, 2031, 2050]
+        rng = np.random.RandomState(42)
+        data = {str(y): rng.uniform(0, 100, 20) for y in years}
+        data['region'] = ['USA', 'China', 'Brazil', 'EU-15'] * 5
+        data['Units'] = 'EJ'
+        self.df = pd.DataFrame(data, columns=['region'] + [str(y) for y in years] + ['Units'])
+
+    def test_yearColumns(self):
+        df = self.df
+        self.assertEqual(yearColumns(df), ['1990', '2005', '2010', '2015', '2020', '2030', '2031', '2050'])
+        self.assertEqual(yearColumns(df, years=(2010, '2030')), ['2010', '2015', '2020', '2030'])
+        self.assertEqual(yearColumns(df, years=(2005, 2050), timestep=5),
+                         ['2005', '2010', '2015', '2020', '2030', '2050'])
+
+    def test_interpolate(self):
+        for startYear in (0, 2012, 2033):
+            expected = _interpolateByColumn(self.df, startYear=startYear)
+            result = interpolateYears(self.df, startYear=startYear)
+
+            self.assertEqual(list(result.columns),
+                             ['region', 'Units'] + [str(y) for y in range(1990, 2051)])
+
+            # values must be identical, not merely close
+            for col in yearColumns(expected):
+                self.assertTrue((result[col] == expected[col]).all(), 'mismatch in ' + col)
+
+        self.assertEqual(len(self.df.columns), 10)      # original is unmodified
+
+    def test_interpolateFiveYear(self):
+        result = interpolateYears(self.df, timestep=5)
+        self.assertEqual(yearColumns(result),
+                         ['1990', '1995', '2000', '2005', '2010', '2015', '2020', '2025',
+                          '2030', '2031', '2035', '2040', '2045', '2050'])
+
+        annual = interpolateYears(self.df)
+        for col in ('1995', '2025', '2040'):
+            self.assertTrue(np.allclose(result[col], annual[col]))
+
+    def test_limitYears(self):
+        df = limitYears(self.df.copy(), (2010, 2030))
+        self.assertEqual(list(df.columns), ['region', '2010', '2015', '2020', '2030', 'Units'])
+
+    def test_sumYearColumns(self):
+        df = self.df
+        totals = sumYearColumns(df)
+        self.assertTrue(np.allclose(totals['2015'], df['2015'].sum()))
+
+        byRegion = sumYearColumns(df, yearCols=['2010', '2050'], groupCol='region')
+        self.assertEqual(list(byRegion.columns), ['2010', '2050'])
+        self.assertTrue(np.allclose(byRegion.loc['USA', '2050'], df[df.region == 'USA']['2050'].sum()))